@@ -1,12 +1,16 @@
-from core.llm import call_llm
+from core.llm import run_steps, run_steps_async, stream_steps_async
 from agents.data.prompt import SYSTEM_PROMPT, build_prompt
 from core.schemas import AgentResponse
+from core.prompt_builder import count_tokens
 import json
 import os
 
-def run(task, context=None, constraints=None):
+def _steps(task, context=None, constraints=None):
+    prompt_tokens = 0
     try:
-        raw = call_llm(SYSTEM_PROMPT, build_prompt(task, context, constraints))
+        user_prompt = build_prompt(task, context, constraints)
+        prompt_tokens = count_tokens(SYSTEM_PROMPT) + count_tokens(user_prompt)
+        raw = yield SYSTEM_PROMPT, user_prompt
         parsed = json.loads(raw)
 
         return AgentResponse(
@@ -14,7 +18,7 @@ def run(task, context=None, constraints=None):
             agent="data",
             data=parsed,
             errors=None,
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
 
     except Exception as e:
@@ -23,6 +27,18 @@ def run(task, context=None, constraints=None):
             agent="data",
             data=None,
             errors=[str(e)],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
 
+
+def run(task, context=None, constraints=None):
+    return run_steps(_steps(task, context, constraints), agent="data")
+
+
+async def run_async(task, context=None, constraints=None):
+    return await run_steps_async(_steps(task, context, constraints), agent="data")
+
+
+def run_stream(task, context=None, constraints=None):
+    """Async iterator of ("token", text) events, then ("result", AgentResponse)."""
+    return stream_steps_async(_steps(task, context, constraints), agent="data")
@@ -1,3 +1,5 @@
+from core.prompt_builder import PromptBuilder
+
 SYSTEM_PROMPT = """
 You are a senior data engineer.
 
@@ -13,16 +15,13 @@ Think in systems, not scripts.
 Be explicit about tradeoffs.
 """
 def build_prompt(task, context=None, constraints=None):
-    return f"""
-Task:
-{task}
-
-Context:
-{context or "None"}
-
-Constraints:
-{constraints or "None"}
-
+    """User prompt within the data agent's token budget (context/constraints are trimmed first)."""
+    return (
+        PromptBuilder("data", SYSTEM_PROMPT)
+        .section("Task", task)
+        .context("Context", context)
+        .context("Constraints", constraints)
+        .text("""
 Return JSON with:
 - architecture
 - pipeline_steps
@@ -30,4 +29,6 @@ Return JSON with:
 - code
 - failure_modes
 - optimizations
-"""
+""")
+        .build()
+    )
@@ -1,52 +1,82 @@
 import json
 import os
 import time
+from functools import partial
 
-from core.llm import call_llm
-from core.schemas import AgentResponse
+from core.llm import Offload, run_steps, run_steps_async, stream_steps_async
+from core.schemas import AgentResponse, FinanceModelScaffold
 from agents.finance_v1.prompt import SYSTEM_PROMPT
-from memory.retriever import retrieve
+from memory.retriever import cancel_prefetch, prefetch, retrieve, retrieve_async
+from memory.summaries import find_reusable
 from tools.registry import TOOLS
 from tools.executor import execute_tool
 from core.logging import logger
+from core.prompt_builder import PromptBuilder
 from core.metrics import inc
 from core.eval import record
 
 
-def run(task, context=None):
+def _steps(task, context=None):
     start_time = time.time()
+    prompt_tokens = 0
+    params = {"context": context}
     logger.info(f"[FINANCE] Start | task='{task}'")
 
     try:
         # -----------------------------
-        # 0. RAG — ALWAYS FIRST
-        # -----------------------------
-        docs = retrieve(task)
-        retrieval_context = "\n".join(docs) if docs else "NO_RELEVANT_DOCUMENTS_FOUND"
-
-        # -----------------------------
-        # 1. Build prompt (model-builder)
+        # 0. Reuse a recent, similar scaffold
         # -----------------------------
-        user_prompt = f"""
-Task:
-{task}
+        reused = yield Offload(partial(find_reusable, "finance", task, params))
+        if reused is not None:
+            cancel_prefetch(task)  # the route's prefetch will not be claimed
+            elapsed = round(time.time() - start_time, 3)
+            logger.info(f"[FINANCE] Reused | latency={elapsed}s | summary_id={reused['id']}")
+            inc("finance.reused")
 
-Retrieved Context:
-{retrieval_context}
+            return AgentResponse(
+                status="success",
+                agent="finance",
+                data=reused["result"],
+                errors=None,
+                reused=True,
+                metadata={
+                    "llm_mode": os.getenv("LLM_MODE"),
+                    "prompt_tokens": prompt_tokens,
+                    "reused_from": {key: reused[key] for key in ("id", "task", "similarity", "age_seconds")}
+                }
+            )
 
-Additional Context:
-{context or "None"}
+        # Background retrieval (no-op if the route already started it)
+        prefetch(task)
 
+        # -----------------------------
+        # 1. Build prompt (model-builder, within budget)
+        # -----------------------------
+        builder = (
+            PromptBuilder("finance", SYSTEM_PROMPT)
+            .section("Task", task)
+            .documents("Retrieved Context", None, query=task)
+            .context("Additional Context", context)
+            .text("""
 Rules:
 - Build a valuation MODEL SCAFFOLD.
 - Use placeholders where inputs are missing.
 - Respond ONLY in JSON.
-"""
+""")
+        )
+
+        # -----------------------------
+        # 1b. RAG — ALWAYS BEFORE GENERATION
+        # -----------------------------
+        # Claimed only now, so the prefetch overlaps the sections above
+        docs = yield Offload(partial(retrieve, task), partial(retrieve_async, task))
+        user_prompt = builder.fill_documents("Retrieved Context", docs).build()
+        prompt_tokens += builder.tokens
 
         # -----------------------------
         # 2. First LLM call
         # -----------------------------
-        raw = call_llm(SYSTEM_PROMPT, user_prompt)
+        raw = yield SYSTEM_PROMPT, user_prompt, FinanceModelScaffold
         parsed = json.loads(raw)
 
         # -----------------------------
@@ -63,26 +93,25 @@ Rules:
                     agent="finance",
                     data=None,
                     errors=[f"Tool '{tool}' not registered"],
-                    metadata={"llm_mode": os.getenv("LLM_MODE")}
+                    metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
                 )
 
             tool_result = execute_tool(tool, args)
 
-            followup_prompt = f"""
-Original Task:
-{task}
-
-Tool Used:
-{tool}
-
-Tool Result:
-{tool_result}
-
+            builder = (
+                PromptBuilder("finance", SYSTEM_PROMPT)
+                .section("Original Task", task)
+                .section("Tool Used", tool)
+                .context("Tool Result", tool_result)
+                .text("""
 Now return the FINAL model scaffold.
 Respond ONLY in JSON with action='final'.
-"""
+""")
+            )
+            followup_prompt = builder.build()
+            prompt_tokens += builder.tokens
 
-            raw_final = call_llm(SYSTEM_PROMPT, followup_prompt)
+            raw_final = yield SYSTEM_PROMPT, followup_prompt, FinanceModelScaffold
             final_parsed = json.loads(raw_final)
 
             if final_parsed.get("action") != "final":
@@ -92,20 +121,20 @@ Respond ONLY in JSON with action='final'.
                     agent="finance",
                     data=None,
                     errors=["Finance agent failed to return final scaffold"],
-                    metadata={"llm_mode": os.getenv("LLM_MODE")}
+                    metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
                 )
 
             elapsed = round(time.time() - start_time, 3)
             logger.info(f"[FINANCE] Success | latency={elapsed}s")
             inc("finance.success")
-            record("finance", task, final_parsed.get("result"))
+            record("finance", task, final_parsed.get("result"), params)
 
             return AgentResponse(
                 status="success",
                 agent="finance",
                 data=final_parsed.get("result"),
                 errors=None,
-                metadata={"llm_mode": os.getenv("LLM_MODE")}
+                metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
             )
 
         # -----------------------------
@@ -115,14 +144,14 @@ Respond ONLY in JSON with action='final'.
             elapsed = round(time.time() - start_time, 3)
             logger.info(f"[FINANCE] Success | latency={elapsed}s")
             inc("finance.success")
-            record("finance", task, parsed.get("result"))
+            record("finance", task, parsed.get("result"), params)
 
             return AgentResponse(
                 status="success",
                 agent="finance",
                 data=parsed.get("result"),
                 errors=None,
-                metadata={"llm_mode": os.getenv("LLM_MODE")}
+                metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
             )
 
         # -----------------------------
@@ -134,7 +163,7 @@ Respond ONLY in JSON with action='final'.
             agent="finance",
             data=None,
             errors=["Invalid finance agent action"],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
 
     except Exception as e:
@@ -147,5 +176,18 @@ Respond ONLY in JSON with action='final'.
             agent="finance",
             data=None,
             errors=[str(e)],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
+
+
+def run(task, context=None):
+    return run_steps(_steps(task, context), agent="finance")
+
+
+async def run_async(task, context=None):
+    return await run_steps_async(_steps(task, context), agent="finance")
+
+
+def run_stream(task, context=None):
+    """Async iterator of ("token", text) events, then ("result", AgentResponse)."""
+    return stream_steps_async(_steps(task, context), agent="finance")
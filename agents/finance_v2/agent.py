@@ -2,31 +2,37 @@ import json
 import os
 import time
 
-from core.llm import call_llm
-from core.schemas import AgentResponse
+from core.llm import run_steps, run_steps_async, stream_steps_async
+from core.schemas import AgentResponse, FinanceAnalysis
 from agents.finance_v2.prompt import SYSTEM_PROMPT
 from core.logging import logger
+from core.prompt_builder import PromptBuilder
 from core.metrics import inc
 from core.eval import record
 
 
-def run(model_scaffold: dict):
+def _steps(model_scaffold: dict):
     start_time = time.time()
+    prompt_tokens = 0
     logger.info("[FINANCE_V2] Start | interpreting model scaffold")
 
     try:
-        user_prompt = f"""
-MODEL SCAFFOLD (SOURCE OF TRUTH):
-{json.dumps(model_scaffold, indent=2)}
-
+        # The scaffold is the source of truth: compact, never truncated
+        builder = (
+            PromptBuilder("finance_v2", SYSTEM_PROMPT)
+            .section("MODEL SCAFFOLD (SOURCE OF TRUTH)", model_scaffold)
+            .text("""
 Rules:
 - Use ONLY this scaffold.
 - Do NOT invent or adjust numbers.
 - Produce a finance analysis memo.
 - Respond ONLY in JSON.
-"""
+""")
+        )
+        user_prompt = builder.build()
+        prompt_tokens += builder.tokens
 
-        raw = call_llm(SYSTEM_PROMPT, user_prompt)
+        raw = yield SYSTEM_PROMPT, user_prompt, FinanceAnalysis
         parsed = json.loads(raw)
 
         if parsed.get("action") != "final":
@@ -36,20 +42,20 @@ Rules:
                 agent="finance_v2",
                 data=None,
                 errors=["Finance v2 failed to return final analysis"],
-                metadata={"llm_mode": os.getenv("LLM_MODE")}
+                metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
             )
 
         elapsed = round(time.time() - start_time, 3)
         logger.info(f"[FINANCE_V2] Success | latency={elapsed}s")
         inc("finance_v2.success")
-        record("finance_v2", "interpret_model", parsed.get("result"))
+        record("finance_v2", "interpret_model", parsed.get("result"), {"model_scaffold": model_scaffold})
 
         return AgentResponse(
             status="success",
             agent="finance_v2",
             data=parsed.get("result"),
             errors=None,
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
 
     except Exception as e:
@@ -62,5 +68,18 @@ Rules:
             agent="finance_v2",
             data=None,
             errors=[str(e)],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
+
+
+def run(model_scaffold: dict):
+    return run_steps(_steps(model_scaffold), agent="finance_v2")
+
+
+async def run_async(model_scaffold: dict):
+    return await run_steps_async(_steps(model_scaffold), agent="finance_v2")
+
+
+def run_stream(model_scaffold: dict):
+    """Async iterator of ("token", text) events, then ("result", AgentResponse)."""
+    return stream_steps_async(_steps(model_scaffold), agent="finance_v2")
@@ -1,64 +1,93 @@
 import json
 import os
 import time
+from functools import partial
 
-from core.llm import call_llm
+from core.llm import Offload, run_steps, run_steps_async, stream_steps_async
 from core.schemas import AgentResponse
 from agents.research.prompt import SYSTEM_PROMPT
 from tools.registry import TOOLS
 from tools.executor import execute_tool
-from memory.retriever import retrieve
+from memory.retriever import cancel_prefetch, prefetch, retrieve, retrieve_async
+from memory.summaries import find_reusable
 from core.logging import logger
+from core.prompt_builder import PromptBuilder
 from core.metrics import inc
 from core.eval import record
 
 
-def run(task, context=None, depth="brief"):
+def _steps(task, context=None, depth="brief"):
     """
     Research agent runner with:
     - enforced JSON output
     - explicit tool request handling
     - single tool-call maximum
+    - reuse of a recent, similar prior result (no LLM call)
     - RAG-before-generation
     - structured logging, metrics, and eval hooks
     """
 
     start_time = time.time()
+    prompt_tokens = 0
+    params = {"context": context, "depth": depth}
     logger.info(f"[RESEARCH] Start | task='{task}'")
 
     try:
         # -----------------------------
-        # 0. RAG — ALWAYS FIRST
-        # -----------------------------
-        docs = retrieve(task)
-        retrieval_context = "\n".join(docs) if docs else "NO_RELEVANT_DOCUMENTS_FOUND"
-
-        # -----------------------------
-        # 1. Build user prompt (WITH RAG)
+        # 0. Reuse a recent, similar result
         # -----------------------------
-        user_prompt = f"""
-Task:
-{task}
-
-Retrieved Context:
-{retrieval_context}
+        reused = yield Offload(partial(find_reusable, "research", task, params))
+        if reused is not None:
+            cancel_prefetch(task)  # the route's prefetch will not be claimed
+            elapsed = round(time.time() - start_time, 3)
+            logger.info(f"[RESEARCH] Reused | latency={elapsed}s | summary_id={reused['id']}")
+            inc("research.reused")
 
-Additional Context:
-{context or "None"}
+            return AgentResponse(
+                status="success",
+                agent="research",
+                data=reused["result"],
+                errors=None,
+                reused=True,
+                metadata={
+                    "llm_mode": os.getenv("LLM_MODE"),
+                    "prompt_tokens": prompt_tokens,
+                    "reused_from": {key: reused[key] for key in ("id", "task", "similarity", "age_seconds")}
+                }
+            )
 
-Depth:
-{depth}
+        # Background retrieval (no-op if the route already started it)
+        prefetch(task)
 
+        # -----------------------------
+        # 1. Build user prompt (WITH RAG, within budget)
+        # -----------------------------
+        builder = (
+            PromptBuilder("research", SYSTEM_PROMPT)
+            .section("Task", task)
+            .documents("Retrieved Context", None, query=task)
+            .context("Additional Context", context)
+            .section("Depth", depth)
+            .text("""
 Rules:
 - You MUST ground answers in Retrieved Context.
 - If Retrieved Context is empty, state assumptions explicitly.
 - Respond ONLY in JSON.
-"""
+""")
+        )
+
+        # -----------------------------
+        # 1b. RAG — ALWAYS BEFORE GENERATION
+        # -----------------------------
+        # Claimed only now, so the prefetch overlaps the sections above
+        docs = yield Offload(partial(retrieve, task), partial(retrieve_async, task))
+        user_prompt = builder.fill_documents("Retrieved Context", docs).build()
+        prompt_tokens += builder.tokens
 
         # -----------------------------
         # 2. First LLM call
         # -----------------------------
-        raw = call_llm(SYSTEM_PROMPT, user_prompt)
+        raw = yield SYSTEM_PROMPT, user_prompt
         parsed = json.loads(raw)
 
         # -----------------------------
@@ -78,7 +107,7 @@ Rules:
                     agent="research",
                     data=None,
                     errors=[f"Tool '{tool_name}' is not registered"],
-                    metadata={"llm_mode": os.getenv("LLM_MODE")}
+                    metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
                 )
 
             # Execute tool (platform-controlled)
@@ -87,25 +116,24 @@ Rules:
             # -----------------------------
             # 4. Second (final) LLM call
             # -----------------------------
-            followup_prompt = f"""
-Original Task:
-{task}
-
-Tool Used:
-{tool_name}
-
-Tool Result:
-{tool_result}
-
+            builder = (
+                PromptBuilder("research", SYSTEM_PROMPT)
+                .section("Original Task", task)
+                .section("Tool Used", tool_name)
+                .context("Tool Result", tool_result)
+                .text("""
 Now return the FINAL answer.
 Respond ONLY in JSON with:
-{{
+{
   "action": "final",
-  "result": {{ ... }}
-}}
-"""
+  "result": { ... }
+}
+""")
+            )
+            followup_prompt = builder.build()
+            prompt_tokens += builder.tokens
 
-            raw_final = call_llm(SYSTEM_PROMPT, followup_prompt)
+            raw_final = yield SYSTEM_PROMPT, followup_prompt
             final_parsed = json.loads(raw_final)
 
             if final_parsed.get("action") != "final":
@@ -118,7 +146,7 @@ Respond ONLY in JSON with:
                     agent="research",
                     data=None,
                     errors=["Agent did not return a final answer after tool call"],
-                    metadata={"llm_mode": os.getenv("LLM_MODE")}
+                    metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
                 )
 
             # -----------------------------
@@ -127,14 +155,14 @@ Respond ONLY in JSON with:
             elapsed = round(time.time() - start_time, 3)
             logger.info(f"[RESEARCH] Success | latency={elapsed}s")
             inc("research.success")
-            record("research", task, final_parsed.get("result"))
+            record("research", task, final_parsed.get("result"), params)
 
             return AgentResponse(
                 status="success",
                 agent="research",
                 data=final_parsed.get("result"),
                 errors=None,
-                metadata={"llm_mode": os.getenv("LLM_MODE")}
+                metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
             )
 
         # -----------------------------
@@ -144,14 +172,14 @@ Respond ONLY in JSON with:
             elapsed = round(time.time() - start_time, 3)
             logger.info(f"[RESEARCH] Success | latency={elapsed}s")
             inc("research.success")
-            record("research", task, parsed.get("result"))
+            record("research", task, parsed.get("result"), params)
 
             return AgentResponse(
                 status="success",
                 agent="research",
                 data=parsed.get("result"),
                 errors=None,
-                metadata={"llm_mode": os.getenv("LLM_MODE")}
+                metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
             )
 
         # -----------------------------
@@ -166,7 +194,7 @@ Respond ONLY in JSON with:
             agent="research",
             data=None,
             errors=["Invalid agent action returned"],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
 
     # -----------------------------
@@ -182,5 +210,18 @@ Respond ONLY in JSON with:
             agent="research",
             data=None,
             errors=[str(e)],
-            metadata={"llm_mode": os.getenv("LLM_MODE")}
+            metadata={"llm_mode": os.getenv("LLM_MODE"), "prompt_tokens": prompt_tokens}
         )
+
+
+def run(task, context=None, depth="brief"):
+    return run_steps(_steps(task, context, depth), agent="research")
+
+
+async def run_async(task, context=None, depth="brief"):
+    return await run_steps_async(_steps(task, context, depth), agent="research")
+
+
+def run_stream(task, context=None, depth="brief"):
+    """Async iterator of ("token", text) events, then ("result", AgentResponse)."""
+    return stream_steps_async(_steps(task, context, depth), agent="research")
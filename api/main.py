@@ -1,12 +1,13 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
-from typing import Any, Optional, Union, Dict
-from agents.research.agent import run as run_research
-from agents.data.agent import run as run_data_agent
-from agents.finance_v1.agent import run as run_finance_v1_agent
-from agents.finance_v2.agent import run as run_finance_v2_agent
+from typing import Any, Optional, Union, Dict, List
+from itertools import chain
+from agents.research.agent import run_async as run_research
+from agents.data.agent import run_async as run_data_agent
+from agents.finance_v1.agent import run_async as run_finance_v1_agent
+from agents.finance_v2.agent import run_async as run_finance_v2_agent
 from fastapi.responses import PlainTextResponse
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 
 
 app = FastAPI(title="AI OS")
@@ -25,6 +26,8 @@ class FinancePipelineRequest(BaseModel):
     task: str
     context: Optional[str] = None
     dcf_inputs: Optional[Dict[str, Any]] = None
+    output_format: str = "rows"
+    round_output: bool = True
 
 class FinanceV1Request(BaseModel):
     task: str
@@ -35,27 +38,123 @@ class FinanceV2Request(BaseModel):
 
 class DCFCalculatorRequest(BaseModel):
     inputs: Dict[str, Any]
+    return_gradients: bool = False
+    output_format: str = "rows"
+    round_output: bool = True
+
+class DCFTornadoRequest(BaseModel):
+    inputs: Dict[str, Any]
+    shocks: Optional[Dict[str, float]] = None
+    relative_shock: float = 0.10
+    metric: str = "value_per_share"
+
+class DCFBatchRequest(BaseModel):
+    inputs: List[Dict[str, Any]]
+    include_projections: bool = True
+    output_format: str = "rows"
+    round_output: bool = True
+
+class DCFSolveRequest(BaseModel):
+    inputs: Dict[str, Any]
+    target: float
+    solve_for: str
+    target_metric: str = "value_per_share"
+    bounds: Optional[List[float]] = None
+
+class DCFSolveBatchRequest(BaseModel):
+    inputs: List[Dict[str, Any]]
+    targets: List[float]
+    solve_for: str
+    target_metric: str = "value_per_share"
+    bounds: Optional[List[float]] = None
+
+class UniverseJobRequest(BaseModel):
+    input_path: str
+    output_path: str
+    chunk_rows: int = 10_000
+
+class MemoryIngestRequest(BaseModel):
+    paths: List[str]
+    batch_size: Optional[int] = None
+    chunk_tokens: Optional[int] = None
+    reset: bool = False
+    reindex: bool = True
+
+class CompsRequest(BaseModel):
+    target: Dict[str, Any]
+    peers: Optional[List[Dict[str, Any]]] = None
+    sector: str = "*"
+    percentiles: List[float] = [25, 50, 75]
+
+class CompsPeer(BaseModel):
+    ticker: str
+    sector: str = "*"
+    enterprise_value: Optional[float] = None
+    market_cap: Optional[float] = None
+    net_debt: Optional[float] = None
+    ebitda: Optional[float] = None
+    net_income: Optional[float] = None
+    revenue: Optional[float] = None
+
+class CompsPeersUpdateRequest(BaseModel):
+    upsert: List[CompsPeer] = []
+    remove: List[str] = []
 
 class FinanceExportRequest(BaseModel):
     valuation: Dict[str, Any]
+    gzip: bool = False
 
 class FinanceScenarioRequest(BaseModel):
     base_inputs: Dict[str, Any]
     scenarios: Dict[str, Dict[str, Any]]
+    output_format: str = "rows"
+    round_output: bool = True
+
+class FinanceMonteCarloRequest(BaseModel):
+    base_inputs: Dict[str, Any]
+    distributions: Dict[str, Dict[str, Any]]
+    correlation: Optional[Dict[str, Any]] = None
+    paths: int = 100_000
+    seed: Optional[int] = None
+    percentiles: Optional[List[float]] = None
+    bins: int = 50
+
+class FinanceSensitivityRequest(BaseModel):
+    base_inputs: Dict[str, Any]
+    wacc_values: List[float]
+    terminal_growth_values: List[float]
+
+class FinanceSensitivityExportRequest(FinanceSensitivityRequest):
+    metric: str = "value_per_share"
 
 class FinanceScenarioExportRequest(BaseModel):
-    scenario_result: Dict[str, Dict[str, Any]]
+    scenario_result: Dict[str, Any]
+    gzip: bool = False
+
+
+def _prefetch_retrieval(task: str):
+    """
+    Start retrieval as soon as the request is accepted. With summary reuse
+    on, the agent starts it instead, after its reuse check, so a request
+    answered from the summary store never prefetches.
+    """
+    from memory.retriever import prefetch
+    from memory.summaries import SUMMARY_REUSE_ENABLED, SUMMARY_STORE_ENABLED
+
+    if not (SUMMARY_STORE_ENABLED and SUMMARY_REUSE_ENABLED):
+        prefetch(task)
 
 
 @app.post("/research")
-def research_agent(req: ResearchRequest):
-    result = run_research(req.task, req.context, req.depth)
+async def research_agent(req: ResearchRequest):
+    _prefetch_retrieval(req.task)
+    result = await run_research(req.task, req.context, req.depth)
     return {"result": result}
 
 @app.post("/data-engineer")
-def data_engineer(req: DataAgentRequest):
+async def data_engineer(req: DataAgentRequest):
     try:
-        result = run_data_agent(req.task, req.context, req.constraints)
+        result = await run_data_agent(req.task, req.context, req.constraints)
         return {"result": result}
     except Exception as e:
         return {
@@ -67,19 +166,25 @@ def data_engineer(req: DataAgentRequest):
             }
         }
 @app.post("/finance/v1")
-def run_finance_v1(req: FinanceV1Request):
-    result = run_finance_v1_agent(req.task, req.context)
+async def run_finance_v1(req: FinanceV1Request):
+    _prefetch_retrieval(req.task)
+    result = await run_finance_v1_agent(req.task, req.context)
     return {"result": result}
 
 @app.post("/finance/v2")
-def run_finance_v2(req: FinanceV2Request):
-    result = run_finance_v2_agent(req.model_scaffold)
+async def run_finance_v2(req: FinanceV2Request):
+    result = await run_finance_v2_agent(req.model_scaffold)
     return {"result": result}
 
 @app.post("/finance/dcf")
 def run_dcf_calculator(req: DCFCalculatorRequest):
     from tools.dcf_calculator import calculate_dcf
-    result = calculate_dcf(req.inputs)
+    result = calculate_dcf(
+        req.inputs,
+        return_gradients=req.return_gradients,
+        output_format=req.output_format,
+        round_output=req.round_output
+    )
     return {
         "result": {
             "status": "success",
@@ -88,54 +193,363 @@ def run_dcf_calculator(req: DCFCalculatorRequest):
             "errors": None
         }
     }
-@app.post("/finance/pipeline")
-def run_finance_pipeline(req: FinancePipelineRequest):
-    # ---- Step 1: Finance v1 (model builder)
-    v1 = run_finance_v1_agent(req.task, req.context)
 
-    if v1.status != "success" or not v1.data:
+@app.post("/finance/dcf/batch")
+def run_dcf_batch(req: DCFBatchRequest):
+    from tools.dcf_batch import calculate_dcf_batch
+
+    try:
+        result = calculate_dcf_batch(
+            req.inputs,
+            include_projections=req.include_projections,
+            output_format=req.output_format,
+            round_output=req.round_output
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "dcf_batch",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
         return {
             "result": {
                 "status": "error",
-                "agent": "finance_pipeline",
+                "agent": "dcf_batch",
                 "data": None,
-                "errors": ["Finance v1 failed"],
-                "metadata": v1.metadata,
+                "errors": [str(e)]
             }
         }
 
-    valuation = None
+@app.post("/finance/dcf/tornado")
+def run_dcf_tornado(req: DCFTornadoRequest):
+    from tools.sensitivity import build_tornado
 
-    # ---- Step 2: Optional DCF calculator
-    if req.dcf_inputs:
+    try:
+        result = build_tornado(
+            req.inputs,
+            shocks=req.shocks,
+            relative_shock=req.relative_shock,
+            metric=req.metric
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "dcf_tornado",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "dcf_tornado",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/dcf/solve")
+def run_dcf_solve(req: DCFSolveRequest):
+    from tools.goal_seek import solve_implied_input
+
+    try:
+        result = solve_implied_input(
+            req.inputs,
+            target=req.target,
+            solve_for=req.solve_for,
+            target_metric=req.target_metric,
+            bounds=tuple(req.bounds) if req.bounds else None
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "dcf_solver",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "dcf_solver",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/dcf/solve/batch")
+def run_dcf_solve_batch(req: DCFSolveBatchRequest):
+    from tools.goal_seek import solve_implied_batch
+
+    try:
+        result = solve_implied_batch(
+            req.inputs,
+            targets=req.targets,
+            solve_for=req.solve_for,
+            target_metric=req.target_metric,
+            bounds=tuple(req.bounds) if req.bounds else None
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "dcf_solver",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "dcf_solver",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/universe/run")
+def run_finance_universe(req: UniverseJobRequest):
+    from tools.universe_job import resolve_job_paths, run_universe_job
+
+    try:
+        # Client paths are confined to UNIVERSE_DATA_DIR
+        input_path, output_path = resolve_job_paths(req.input_path, req.output_path)
+        report = run_universe_job(
+            input_path=input_path,
+            output_path=output_path,
+            chunk_rows=req.chunk_rows
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "universe_job",
+                "data": report,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "universe_job",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/memory/ingest")
+def run_memory_ingest(req: MemoryIngestRequest):
+    from memory.ingest import INGEST_BATCH_CHUNKS, INGEST_CHUNK_TOKENS, INGEST_ROOT, run_ingestion
+
+    try:
+        # Client paths are confined to INGEST_ROOT (ingested text is served back by retrieval)
+        report = run_ingestion(
+            paths=req.paths,
+            batch_size=req.batch_size or INGEST_BATCH_CHUNKS,
+            chunk_tokens=req.chunk_tokens or INGEST_CHUNK_TOKENS,
+            reset=req.reset,
+            reindex=req.reindex,
+            root=INGEST_ROOT
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "memory_ingest",
+                "data": report,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "memory_ingest",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/comps")
+def run_finance_comps(req: CompsRequest):
+    from tools.comps_calculator import get_peer_index, run_comps
+
+    try:
+        # Ad-hoc peer list, or the process-wide peer index
+        if req.peers is not None:
+            result = run_comps(req.peers, req.target, req.sector, tuple(req.percentiles))
+        else:
+            result = get_peer_index().implied_valuation(req.target, req.sector, tuple(req.percentiles))
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "comps",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "comps",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/comps/peers")
+def update_finance_comps_peers(req: CompsPeersUpdateRequest):
+    from tools.comps_calculator import get_peer_index
+
+    try:
+        # All-or-nothing: a bad peer leaves the shared index untouched
+        index = get_peer_index()
+        removed = index.update([peer.model_dump() for peer in req.upsert], req.remove)
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "comps",
+                "data": {
+                    "upserted": len(req.upsert),
+                    "removed": removed,
+                    "peers": len(index),
+                    "sectors": index.sectors()
+                },
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "comps",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+def _pipeline_stages(req: FinancePipelineRequest, emit=None):
+    """
+    finance_v1 ─► finance_v2
+    dcf (optional, independent of v1)
+
+    With `emit`, the LLM stages stream and forward their tokens.
+    """
+
+    import asyncio
+    from core.stage_graph import Stage
+    from agents.finance_v1.agent import run_stream as stream_finance_v1_agent
+    from agents.finance_v2.agent import run_stream as stream_finance_v2_agent
+
+    async def run_agent(name, run, stream, *args):
+        if emit is None:
+            return await run(*args)
+
+        response = None
+        async for kind, value in stream(*args):
+            if kind in ("token", "retry"):
+                emit(kind, {"stage": name, "delta" if kind == "token" else "reason": value})
+            else:
+                response = value
+        return response
+
+    # ---- Stage 1: Finance v1 (model builder)
+    async def finance_v1(results):
+        v1 = await run_agent("finance_v1", run_finance_v1_agent, stream_finance_v1_agent, req.task, req.context)
+        if v1.status != "success" or not v1.data:
+            raise RuntimeError("Finance v1 failed")
+        return v1
+
+    # ---- Stage 2: Optional DCF calculator (CPU-bound => worker thread)
+    async def dcf(results):
         from tools.dcf_calculator import calculate_dcf
         try:
-            valuation = calculate_dcf(req.dcf_inputs)
+            return await asyncio.to_thread(
+                calculate_dcf,
+                req.dcf_inputs,
+                output_format=req.output_format,
+                round_output=req.round_output
+            )
         except Exception as e:
-            return {
-                "result": {
-                    "status": "error",
-                    "agent": "finance_pipeline",
-                    "data": None,
-                    "errors": [f"DCF calculator failed: {str(e)}"],
-                    "metadata": v1.metadata,
-                }
-            }
+            raise RuntimeError(f"DCF calculator failed: {str(e)}")
+
+    # ---- Stage 3: Finance v2 (interpreter)
+    async def finance_v2(results):
+        v2 = await run_agent(
+            "finance_v2", run_finance_v2_agent, stream_finance_v2_agent, results["finance_v1"].data
+        )
+        if v2.status != "success" or not v2.data:
+            raise RuntimeError("Finance v2 failed")
+        return v2
+
+    stages = [
+        Stage("finance_v1", finance_v1),
+        Stage("finance_v2", finance_v2, deps=["finance_v1"]),
+    ]
+    if req.dcf_inputs:
+        stages.append(Stage("dcf", dcf))
+    return stages
+
+
+async def _run_pipeline(req: FinancePipelineRequest, emit=None) -> Dict[str, Any]:
+    """
+    Independent stages run concurrently; the first failing stage cancels
+    the rest. Per-stage timings are reported in metadata.stage_timings.
+    """
+
+    import os
+    import time
+    from core.stage_graph import StageFailed, run_stage_graph
+
+    start_time = time.perf_counter()
 
-    # ---- Step 3: Finance v2 (interpreter)
-    v2 = run_finance_v2_agent(v1.data)
+    def on_event(stage, status, elapsed):
+        if emit is not None:
+            emit("stage", {"stage": stage, "status": status, "elapsed": elapsed})
 
-    if v2.status != "success" or not v2.data:
+    try:
+        results, timings = await run_stage_graph(_pipeline_stages(req, emit), on_event)
+
+    except StageFailed as e:
+        e.timings["total"] = round(time.perf_counter() - start_time, 4)
         return {
             "result": {
                 "status": "error",
                 "agent": "finance_pipeline",
                 "data": None,
-                "errors": ["Finance v2 failed"],
-                "metadata": v1.metadata,
+                "errors": [str(e.error)],
+                "metadata": {
+                    "llm_mode": os.getenv("LLM_MODE"),
+                    "failed_stage": e.stage,
+                    "stage_timings": e.timings
+                },
             }
         }
 
+    timings["total"] = round(time.perf_counter() - start_time, 4)
+    v1 = results["finance_v1"]
+
     # ---- Success
     return {
         "result": {
@@ -143,30 +557,164 @@ def run_finance_pipeline(req: FinancePipelineRequest):
             "agent": "finance_pipeline",
             "data": {
                 "model": v1.data,
-                "valuation": valuation,
-                "analysis": v2.data
+                "valuation": results.get("dcf"),
+                "analysis": results["finance_v2"].data
             },
             "errors": None,
             "metadata": {
-                "llm_mode": v1.metadata.get("llm_mode")
+                "llm_mode": v1.metadata.get("llm_mode"),
+                "stage_timings": timings,
+                # Stages answered from a stored prior result instead of the LLM
+                "reused_stages": [name for name in ("finance_v1", "finance_v2") if results[name].reused]
             }
         }
     }
 
-@app.post("/finance/export/csv")
-def export_finance_csv(req: FinanceExportRequest):
-    from tools.exporter import export_dcf_to_csv
 
-    csv_data = export_dcf_to_csv(req.valuation)
+@app.post("/finance/pipeline")
+async def run_finance_pipeline(req: FinancePipelineRequest):
+    _prefetch_retrieval(req.task)
+    return await _run_pipeline(req)
+
+
+# -----------------------------
+# SERVER-SENT EVENTS
+# -----------------------------
+# Streaming variants of the LLM routes. Events:
+#   token  {"agent" | "stage", "delta"}    response text as it is generated
+#   retry  {"agent" | "stage", "reason"}   invalid output abandoned; drop its tokens
+#   stage  {"stage", "status", "elapsed"}  pipeline progress
+#   result {"result": ...}                 same body as the plain route
+#   error  {"result": ...}                 final body when status == "error"
+def _sse(event: str, data: Any) -> str:
+    import json
+    from fastapi.encoders import jsonable_encoder
+
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _final_event(body: Dict[str, Any]) -> str:
+    result = body["result"]
+    status = result.status if hasattr(result, "status") else result.get("status")
+    return _sse("result" if status == "success" else "error", body)
+
+
+async def _agent_events(agent: str, events):
+    try:
+        async for kind, value in events:
+            if kind == "token":
+                yield _sse("token", {"agent": agent, "delta": value})
+            elif kind == "retry":
+                yield _sse("retry", {"agent": agent, "reason": value})
+            else:
+                yield _final_event({"result": value})
+
+    except Exception as e:
+        yield _sse("error", {
+            "result": {"status": "error", "agent": agent, "data": None, "errors": [str(e)]}
+        })
+
+
+@app.post("/research/stream")
+async def research_agent_stream(req: ResearchRequest):
+    from agents.research.agent import run_stream
+
+    # Retrieval starts now, not when the response starts streaming
+    _prefetch_retrieval(req.task)
+    return _sse_response(_agent_events("research", run_stream(req.task, req.context, req.depth)))
+
+@app.post("/finance/v1/stream")
+async def run_finance_v1_stream(req: FinanceV1Request):
+    from agents.finance_v1.agent import run_stream
+
+    _prefetch_retrieval(req.task)
+    return _sse_response(_agent_events("finance", run_stream(req.task, req.context)))
+
+@app.post("/finance/v2/stream")
+async def run_finance_v2_stream(req: FinanceV2Request):
+    from agents.finance_v2.agent import run_stream
+
+    return _sse_response(_agent_events("finance_v2", run_stream(req.model_scaffold)))
+
+@app.post("/finance/pipeline/stream")
+async def run_finance_pipeline_stream(req: FinancePipelineRequest):
+    import asyncio
 
-    return Response(
-        content=csv_data,
-        media_type="text/csv",
+    _prefetch_retrieval(req.task)
+
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit(event, data):
+            queue.put_nowait(_sse(event, data))
+
+        async def run():
+            try:
+                queue.put_nowait(_final_event(await _run_pipeline(req, emit)))
+            except Exception as e:
+                emit("error", {
+                    "result": {"status": "error", "agent": "finance_pipeline", "data": None, "errors": [str(e)]}
+                })
+            finally:
+                queue.put_nowait(None)
+
+        task = asyncio.create_task(run())
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            # Client went away => stop the pipeline
+            task.cancel()
+
+    return _sse_response(events())
+
+def _stream_export(chunks, media_type: str, filename: str) -> StreamingResponse:
+    """
+    Stream an export without building it in memory.
+    The first chunk is produced eagerly so input errors surface
+    before the response starts.
+    """
+
+    chunks = iter(chunks)
+    first = next(chunks, None)
+
+    return StreamingResponse(
+        chain([] if first is None else [first], chunks),
+        media_type=media_type,
         headers={
-            "Content-Disposition": "attachment; filename=valuation.csv"
+            "Content-Disposition": f"attachment; filename={filename}"
         }
     )
 
+def _stream_ndjson(records, filename: str, gzip: bool) -> StreamingResponse:
+    from tools.exporter import iter_gzip, iter_ndjson
+
+    if gzip:
+        return _stream_export(
+            iter_gzip(iter_ndjson(records)), "application/gzip", f"{filename}.ndjson.gz"
+        )
+    return _stream_export(iter_ndjson(records), "application/x-ndjson", f"{filename}.ndjson")
+
+@app.post("/finance/export/csv")
+def export_finance_csv(req: FinanceExportRequest):
+    from tools.exporter import iter_dcf_csv
+
+    return _stream_export(iter_dcf_csv(req.valuation), "text/csv", "valuation.csv")
+
+@app.post("/finance/export/ndjson")
+def export_finance_ndjson(req: FinanceExportRequest):
+    from tools.exporter import iter_dcf_records
+
+    return _stream_ndjson(iter_dcf_records(req.valuation), "valuation", req.gzip)
+
 @app.post("/finance/scenario")
 def run_finance_scenario(req: FinanceScenarioRequest):
     from tools.scenario_analyzer import run_scenario_analysis
@@ -174,7 +722,9 @@ def run_finance_scenario(req: FinanceScenarioRequest):
     try:
         result = run_scenario_analysis(
             base_inputs=req.base_inputs,
-            scenarios=req.scenarios
+            scenarios=req.scenarios,
+            output_format=req.output_format,
+            round_output=req.round_output
         )
 
         return {
@@ -196,20 +746,65 @@ def run_finance_scenario(req: FinanceScenarioRequest):
             }
         }
 
+@app.post("/finance/scenario/monte-carlo")
+def run_finance_monte_carlo(req: FinanceMonteCarloRequest):
+    from tools.monte_carlo import run_monte_carlo
+
+    try:
+        result = run_monte_carlo(
+            base_inputs=req.base_inputs,
+            distributions=req.distributions,
+            paths=req.paths,
+            seed=req.seed,
+            correlation=req.correlation,
+            percentiles=req.percentiles,
+            bins=req.bins
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "monte_carlo",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "monte_carlo",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
 @app.post("/finance/scenario/export/csv")
 def export_finance_scenario_csv(req: FinanceScenarioExportRequest):
-    from tools.scenario_exporter import export_scenario_to_csv
+    from tools.scenario_exporter import iter_scenario_csv
 
     try:
-        csv_data = export_scenario_to_csv(req.scenario_result)
+        return _stream_export(
+            iter_scenario_csv(req.scenario_result), "text/csv", "scenario_analysis.csv"
+        )
 
-        return Response(
-            content=csv_data,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": "attachment; filename=scenario_analysis.csv"
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "scenario_export",
+                "data": None,
+                "errors": [str(e)]
             }
-        )
+        }
+
+@app.post("/finance/scenario/export/ndjson")
+def export_finance_scenario_ndjson(req: FinanceScenarioExportRequest):
+    from tools.scenario_exporter import iter_scenario_records
+
+    try:
+        return _stream_ndjson(iter_scenario_records(req.scenario_result), "scenario_analysis", req.gzip)
 
     except Exception as e:
         return {
@@ -220,3 +815,79 @@ def export_finance_scenario_csv(req: FinanceScenarioExportRequest):
                 "errors": [str(e)]
             }
         }
+
+@app.post("/finance/sensitivity")
+def run_finance_sensitivity(req: FinanceSensitivityRequest):
+    from tools.sensitivity import run_sensitivity_grid
+
+    try:
+        result = run_sensitivity_grid(
+            base_inputs=req.base_inputs,
+            wacc_values=req.wacc_values,
+            terminal_growth_values=req.terminal_growth_values
+        )
+
+        return {
+            "result": {
+                "status": "success",
+                "agent": "sensitivity_analysis",
+                "data": result,
+                "errors": None
+            }
+        }
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "sensitivity_analysis",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+@app.post("/finance/sensitivity/export/csv")
+def export_finance_sensitivity_csv(req: FinanceSensitivityExportRequest):
+    from tools.sensitivity import run_sensitivity_grid
+    from tools.scenario_exporter import iter_sensitivity_csv
+
+    try:
+        result = run_sensitivity_grid(
+            base_inputs=req.base_inputs,
+            wacc_values=req.wacc_values,
+            terminal_growth_values=req.terminal_growth_values
+        )
+        return _stream_export(
+            iter_sensitivity_csv(result, req.metric), "text/csv", "sensitivity_analysis.csv"
+        )
+
+    except Exception as e:
+        return {
+            "result": {
+                "status": "error",
+                "agent": "sensitivity_export",
+                "data": None,
+                "errors": [str(e)]
+            }
+        }
+
+
+@app.get("/metrics")
+def get_metrics():
+    from core.metrics import snapshot
+    from core.llm_cache import LLM_CACHE_ENABLED, get_cache
+    from core.resilience import resilience_stats
+    from memory.keyword_index import get_keyword_index
+    from memory.retriever import retrieval_stats
+    from memory.summaries import SUMMARY_STORE_ENABLED, get_summary_store
+    from memory.vector_index import get_vector_store
+
+    return {
+        "metrics": snapshot(),
+        "llm_cache": get_cache().stats() if LLM_CACHE_ENABLED else None,
+        "llm_resilience": resilience_stats(),
+        "vector_store": get_vector_store().stats(),
+        "keyword_index": get_keyword_index().stats(),
+        "retrieval": retrieval_stats(),
+        "summaries": get_summary_store().stats() if SUMMARY_STORE_ENABLED else None
+    }
@@ -0,0 +1,396 @@
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from openai import APITimeoutError, RateLimitError
+
+from core.llm_cache import cache_key
+from core.logging import logger
+from core.metrics import inc
+from core.prompt_builder import count_tokens
+
+load_dotenv()
+
+# LLM_MODE=CASSETTE routes every LLM call through a cassette:
+#   record: real OpenAI calls, each request/response appended to the cassette
+#   replay: no network; recorded responses served with simulated latency/errors
+# The LLM response cache is bypassed in this mode, so every call reaches the cassette.
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "replay").lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "memory/llm_cassette.jsonl")
+
+# recorded | none | fixed:S | uniform:A,B | normal:MEAN,STD | lognormal:MEDIAN,SIGMA
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded")
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv("LLM_CASSETTE_LATENCY_SCALE", "1.0"))
+
+# Injected failures (fractions of replayed calls)
+LLM_CASSETTE_RATE_LIMIT_RATE = float(os.getenv("LLM_CASSETTE_RATE_LIMIT_RATE", "0"))
+LLM_CASSETTE_TIMEOUT_RATE = float(os.getenv("LLM_CASSETTE_TIMEOUT_RATE", "0"))
+LLM_CASSETTE_RETRY_AFTER_SECONDS = float(os.getenv("LLM_CASSETTE_RETRY_AFTER_SECONDS", "1"))
+
+# Unrecorded request: "mock" (keyword mock response) or "error"
+LLM_CASSETTE_ON_MISS = os.getenv("LLM_CASSETTE_ON_MISS", "mock").lower()
+LLM_CASSETTE_SEED = int(os.getenv("LLM_CASSETTE_SEED", "0"))
+
+# Fallback latency when nothing was recorded for a request
+DEFAULT_LATENCY_SECONDS = 1.0
+
+# Share of the latency spent before the first streamed token (when not recorded)
+DEFAULT_TTFT_FRACTION = 0.3
+
+STREAM_CHUNK_CHARS = 8
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request (LLM_CASSETTE_ON_MISS=error)."""
+
+
+def request_key(kwargs: Dict[str, Any]) -> str:
+    messages = kwargs.get("messages", [])
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user_prompt = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return cache_key(kwargs.get("model", ""), system_prompt, user_prompt, kwargs.get("temperature"))
+
+
+# -----------------------------
+# CASSETTE FILE (JSONL)
+# -----------------------------
+class Cassette:
+    """
+    One JSON line per recorded call:
+    {"key", "model", "user_prompt", "response", "latency_seconds",
+     "ttft_seconds", "prompt_tokens", "completion_tokens", "recorded_at"}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._latencies: List[float] = []
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, entry: Dict[str, Any]):
+        self._entries.setdefault(entry["key"], []).append(entry)
+        self._latencies.append(entry["latency_seconds"])
+
+    def __len__(self) -> int:
+        return len(self._latencies)
+
+    def lookup(self, key: str, occurrence: int) -> Optional[Dict[str, Any]]:
+        """Recordings of one request are replayed round-robin."""
+        entries = self._entries.get(key)
+        return entries[occurrence % len(entries)] if entries else None
+
+    def any_latency(self, rng: random.Random) -> float:
+        """A recorded latency of any request (used for unrecorded ones)."""
+        return rng.choice(self._latencies) if self._latencies else DEFAULT_LATENCY_SECONDS
+
+    def record(self, entry: Dict[str, Any]):
+        with self._lock:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index(entry)
+        inc("cassette.recorded")
+
+
+_CASSETTE: Optional[Cassette] = None
+_CASSETTE_LOCK = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    global _CASSETTE
+    with _CASSETTE_LOCK:
+        if _CASSETTE is None:
+            _CASSETTE = Cassette(LLM_CASSETTE_PATH)
+        return _CASSETTE
+
+
+# -----------------------------
+# LATENCY MODEL
+# -----------------------------
+def sample_latency(rng: random.Random, recorded: float, spec: str = LLM_CASSETTE_LATENCY) -> float:
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+
+    if kind == "none":
+        latency = 0.0
+    elif kind == "fixed":
+        latency = values[0]
+    elif kind == "uniform":
+        latency = rng.uniform(values[0], values[1])
+    elif kind == "normal":
+        latency = rng.gauss(values[0], values[1])
+    elif kind == "lognormal":
+        latency = rng.lognormvariate(math.log(values[0]), values[1])
+    elif kind == "recorded":
+        latency = recorded
+    else:
+        raise ValueError(f"Unknown LLM_CASSETTE_LATENCY: {spec}")
+
+    return max(latency, 0.0) * LLM_CASSETTE_LATENCY_SCALE
+
+
+# -----------------------------
+# REPLAY
+# -----------------------------
+def _response(content: str, model: str) -> Any:
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        model=model,
+    )
+
+
+def _chunk(delta: str) -> Any:
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+
+def _http_response(status_code: int, headers: Dict[str, str]) -> Any:
+    # Duck-typed stand-in for the SDK's HTTP response
+    return SimpleNamespace(
+        status_code=status_code,
+        headers=headers,
+        request=SimpleNamespace(method="POST", url="cassette://chat/completions"),
+    )
+
+
+class CassettePlayer:
+    """
+    Stands in for the OpenAI client in replay mode. Responses come from the
+    cassette; latency and injected 429s / timeouts are drawn from an RNG
+    seeded by (LLM_CASSETTE_SEED, request, occurrence), so a replay run is
+    deterministic regardless of scheduling. Errors are real SDK exception
+    types, so the client's retry/backoff path is exercised.
+    """
+
+    def __init__(self, cassette: Cassette, timeout: float):
+        self.cassette = cassette
+        self.timeout = timeout
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _plan(self, kwargs: Dict[str, Any]) -> Tuple[Optional[str], str, float, float]:
+        """(error kind or None, content, latency, time to first token)"""
+
+        timeout = kwargs.get("timeout") or self.timeout
+        error, content, latency, ttft = self._draw(kwargs, timeout)
+
+        # Like the SDK's read timeout: a response slower than the timeout
+        # (to its first byte when streaming) fails instead
+        first_byte = ttft if kwargs.get("stream") else latency
+        if error is None and first_byte > timeout:
+            inc("cassette.timed_out")
+            return "timeout", "", timeout, 0.0
+        return error, content, latency, ttft
+
+    def _draw(self, kwargs: Dict[str, Any], timeout: float) -> Tuple[Optional[str], str, float, float]:
+        key = request_key(kwargs)
+        with self._lock:
+            occurrence = self._seen.get(key, 0)
+            self._seen[key] = occurrence + 1
+
+        rng = random.Random(f"{LLM_CASSETTE_SEED}|{key}|{occurrence}")
+        roll = rng.random()
+        if roll < LLM_CASSETTE_RATE_LIMIT_RATE:
+            inc("cassette.injected_429")
+            return "rate_limit", "", min(0.05, timeout), 0.0
+        if roll < LLM_CASSETTE_RATE_LIMIT_RATE + LLM_CASSETTE_TIMEOUT_RATE:
+            inc("cassette.injected_timeout")
+            return "timeout", "", timeout, 0.0
+
+        entry = self.cassette.lookup(key, occurrence)
+        if entry is None:
+            inc("cassette.miss")
+            if LLM_CASSETTE_ON_MISS == "error":
+                raise CassetteMiss(f"No cassette recording for request {key[:12]}")
+
+            from core.llm import _mock_response  # core.llm imports this module
+            user_prompt = next(
+                (m["content"] for m in reversed(kwargs.get("messages", [])) if m["role"] == "user"), ""
+            )
+            latency = sample_latency(rng, self.cassette.any_latency(rng))
+            return None, _mock_response(user_prompt), latency, latency * DEFAULT_TTFT_FRACTION
+
+        inc("cassette.replayed")
+        latency = sample_latency(rng, entry["latency_seconds"])
+        ttft_share = (
+            entry["ttft_seconds"] / entry["latency_seconds"]
+            if entry.get("ttft_seconds") is not None and entry["latency_seconds"] > 0
+            else DEFAULT_TTFT_FRACTION
+        )
+        return None, entry["response"], latency, latency * ttft_share
+
+    def _raise(self, error: str):
+        if error == "rate_limit":
+            raise RateLimitError(
+                "Rate limit reached (cassette)",
+                response=_http_response(429, {"retry-after": str(LLM_CASSETTE_RETRY_AFTER_SECONDS)}),
+                body=None
+            )
+        raise APITimeoutError(request=_http_response(408, {}).request)
+
+    # ---- sync client surface
+    def create(self, **kwargs: Any) -> Any:
+        error, content, latency, ttft = self._plan(kwargs)
+        if error:
+            time.sleep(latency)
+            self._raise(error)
+
+        if kwargs.get("stream"):
+            return self._stream(content, ttft, latency)
+
+        time.sleep(latency)
+        return _response(content, kwargs.get("model", ""))
+
+    def _stream(self, content: str, ttft: float, latency: float) -> Iterator[Any]:
+        pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        gap = (latency - ttft) / max(len(pieces), 1)
+        time.sleep(ttft)
+        for piece in pieces:
+            yield _chunk(piece)
+            time.sleep(gap)
+
+    # ---- async client surface
+    async def acreate(self, **kwargs: Any) -> Any:
+        error, content, latency, ttft = self._plan(kwargs)
+        if error:
+            await asyncio.sleep(latency)
+            self._raise(error)
+
+        if kwargs.get("stream"):
+            await asyncio.sleep(ttft)
+            return _AsyncReplayStream(content, latency - ttft)
+
+        await asyncio.sleep(latency)
+        return _response(content, kwargs.get("model", ""))
+
+
+class _AsyncReplayStream:
+    def __init__(self, content: str, duration: float):
+        self._pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+        self._gap = duration / max(len(self._pieces), 1)
+        self._closed = False
+
+    async def __aiter__(self):
+        for piece in self._pieces:
+            if self._closed:
+                return
+            yield _chunk(piece)
+            await asyncio.sleep(self._gap)
+
+    async def close(self):
+        self._closed = True
+
+
+# -----------------------------
+# RECORD
+# -----------------------------
+class CassetteRecorder:
+    """Wraps a real OpenAI / AsyncOpenAI client and records every success."""
+
+    def __init__(self, client: Any, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def _record(self, kwargs: Dict[str, Any], content: str, latency: float,
+                ttft: Optional[float] = None, usage: Any = None):
+        user_prompt = next((m["content"] for m in reversed(kwargs["messages"]) if m["role"] == "user"), "")
+        self.cassette.record({
+            "key": request_key(kwargs),
+            "model": kwargs.get("model"),
+            "user_prompt": user_prompt,
+            "response": content,
+            "latency_seconds": round(latency, 4),
+            "ttft_seconds": None if ttft is None else round(ttft, 4),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None)
+                or sum(count_tokens(m["content"]) for m in kwargs["messages"]),
+            "completion_tokens": getattr(usage, "completion_tokens", None) or count_tokens(content),
+            "recorded_at": time.time(),
+        })
+
+    def create(self, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        response = self.client.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(kwargs, response, start)
+        self._record(kwargs, response.choices[0].message.content, time.perf_counter() - start,
+                     usage=getattr(response, "usage", None))
+        return response
+
+    def _record_stream(self, kwargs, response, start):
+        parts, ttft = [], None
+        for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                ttft = ttft if ttft is not None else time.perf_counter() - start
+                parts.append(delta)
+            yield chunk
+        self._record(kwargs, "".join(parts), time.perf_counter() - start, ttft)
+
+    async def acreate(self, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return _AsyncRecordingStream(self, kwargs, response, start)
+        # The cassette append is file I/O: keep it off the event loop
+        await asyncio.to_thread(
+            self._record, kwargs, response.choices[0].message.content, time.perf_counter() - start,
+            usage=getattr(response, "usage", None)
+        )
+        return response
+
+
+class _AsyncRecordingStream:
+    def __init__(self, recorder: CassetteRecorder, kwargs, response, start: float):
+        self._recorder = recorder
+        self._kwargs = kwargs
+        self._response = response
+        self._start = start
+
+    async def __aiter__(self):
+        parts, ttft = [], None
+        async for chunk in self._response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                ttft = ttft if ttft is not None else time.perf_counter() - self._start
+                parts.append(delta)
+            yield chunk
+        # Only complete generations are recorded
+        await asyncio.to_thread(
+            self._recorder._record, self._kwargs, "".join(parts), time.perf_counter() - self._start, ttft
+        )
+
+    async def close(self):
+        await self._response.close()
+
+
+def cassette_client(is_async: bool, client_factory, timeout: float) -> Any:
+    """
+    Object with the `.chat.completions.create` surface the LLM client uses,
+    backed by the cassette (LLM_CASSETTE_MODE=record | replay).
+    """
+
+    cassette = get_cassette()
+
+    if LLM_CASSETTE_MODE == "record":
+        backend = CassetteRecorder(client_factory(), cassette)
+    elif LLM_CASSETTE_MODE == "replay":
+        backend = CassettePlayer(cassette, timeout)
+        logger.info(f"[CASSETTE] Replaying {len(cassette)} recordings from {cassette.path}")
+    else:
+        raise ValueError(f"Unknown LLM_CASSETTE_MODE: {LLM_CASSETTE_MODE}")
+
+    create = backend.acreate if is_async else backend.create
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
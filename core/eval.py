@@ -1,6 +1,24 @@
-def record(agent: str, task: str, output: dict):
+from typing import Any, Dict, Optional
+
+from core.logging import logger
+from core.metrics import inc
+
+
+def record(agent: str, task: str, output: dict, params: Optional[Dict[str, Any]] = None):
     """
     Evaluation hook.
+    - successful results are queued for the summary store
+      (memory/summaries.db), written off the request path and reused
+      for similar tasks; params = the other inputs (context, depth, ...)
     Later: human scoring, regression tests, LLM-as-judge.
     """
-    pass
+    from memory.summaries import SUMMARY_STORE_ENABLED, get_summary_store
+
+    if output is None or not SUMMARY_STORE_ENABLED:
+        return
+
+    try:
+        get_summary_store().put(agent, task, output, params)
+    except Exception as e:
+        logger.error(f"[EVAL] Summary store unavailable | agent={agent} | error={e}")
+        inc("summaries.error")
@@ -0,0 +1,175 @@
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from core.llm import _mock_response
+
+STREAM_CHUNK_CHARS = 8
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class FakeOpenAIServer:
+    """
+    Local OpenAI-compatible /chat/completions server for load testing
+    the LLM client (point OPENAI_BASE_URL at http://127.0.0.1:<port>/v1).
+
+    - answers with the MOCK-mode responses
+    - latency_seconds: added to every request (time to first token)
+    - token_delay_seconds: gap between streamed chunks (stream=true)
+    - rate_limit_every: every Nth request gets a 429 with Retry-After
+    """
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency_seconds: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after_seconds: float = 1.0,
+        token_delay_seconds: float = 0.0
+    ):
+        self.latency_seconds = latency_seconds
+        self.token_delay_seconds = token_delay_seconds
+        self.rate_limit_every = rate_limit_every
+        self.retry_after_seconds = retry_after_seconds
+        self.requests = 0
+        self.rate_limited = 0
+        self.aborted_streams = 0
+        self._counter = itertools.count(1)
+        self._server = _Server(("127.0.0.1", port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: Optional[dict] = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream(self, number: int, model: str, content: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+
+                for start in range(0, len(content), STREAM_CHUNK_CHARS):
+                    chunk = {
+                        "id": f"chatcmpl-fake-{number}",
+                        "object": "chat.completion.chunk",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": content[start:start + STREAM_CHUNK_CHARS]},
+                            "finish_reason": None,
+                        }],
+                    }
+                    try:
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        server.aborted_streams += 1
+                        return
+                    time.sleep(server.token_delay_seconds)
+
+                self.wfile.write(b"data: [DONE]\n\n")
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                number = next(server._counter)
+                server.requests += 1
+
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "Not found"}})
+                    return
+
+                if server.rate_limit_every and number % server.rate_limit_every == 0:
+                    server.rate_limited += 1
+                    self._send(
+                        429,
+                        {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                        {"Retry-After": str(server.retry_after_seconds)}
+                    )
+                    return
+
+                time.sleep(server.latency_seconds)
+
+                user_prompt = next(
+                    (m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), ""
+                )
+                content = _mock_response(user_prompt)
+
+                if body.get("stream"):
+                    self._stream(number, body.get("model", "fake"), content)
+                    return
+
+                self._send(200, {
+                    "id": f"chatcmpl-fake-{number}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for LLM load tests")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        args.port, args.latency, args.rate_limit_every, args.retry_after, args.token_delay
+    ).start()
+    print(f"Fake OpenAI server on {server.base_url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, stores assume a single writer process
+    fcntl = None
+
+
+class FileLock:
+    """
+    Advisory lock shared by every process that opens the same store
+    (fcntl.flock on a lock file).
+
+    - exclusive(): writers; shared(): readers reloading on-disk state
+    - each acquisition opens its own descriptor, so threads of one
+      process never share (and silently convert) a lock; callers still
+      serialize their own threads with a threading.Lock
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _hold(self, mode: int) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield
+        finally:
+            os.close(fd)  # releases the lock
+
+    def exclusive(self):
+        return self._hold(fcntl.LOCK_EX if fcntl else 0)
+
+    def shared(self):
+        return self._hold(fcntl.LOCK_SH if fcntl else 0)
+
+
+def pid_alive(pid: int) -> bool:
+    """True if a process with this pid exists (it may belong to another user)."""
+    if os.name == "nt":
+        return True  # os.kill would terminate it; assume alive
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def file_signature(path: str):
+    """(inode, size, mtime) of a file that is replaced atomically, or None if missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
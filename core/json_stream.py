@@ -0,0 +1,341 @@
+import json
+import os
+import types
+from typing import Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError
+
+# Repair attempts after an invalid response (0 disables repair)
+LLM_REPAIR_ATTEMPTS = int(os.getenv("LLM_REPAIR_ATTEMPTS", "1"))
+
+AGENT_ACTIONS = ("final", "tool_call")
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_CHARS = set("0123456789+-.eEtrufalsn")
+
+
+class StreamValidationError(ValueError):
+    """The (partial) LLM output can no longer become a valid response."""
+
+
+# -----------------------------
+# SCHEMA SPECS
+# -----------------------------
+# A spec is a small dict describing which JSON shapes are still acceptable:
+#   {"kinds": {...JSON kinds...}, "fields": {...}, "required": {...},
+#    "items": spec, "values": spec, "enum": {...}}
+# A missing spec (None) accepts anything.
+_ANY = None
+
+
+def _merge(specs: List[Optional[dict]]) -> Optional[dict]:
+    if any(spec is None for spec in specs):
+        return _ANY
+    merged: Dict[str, Any] = {"kinds": set()}
+    for spec in specs:
+        merged["kinds"] |= spec["kinds"]
+        for part in ("fields", "required", "items", "values", "enum"):
+            if part in spec and part not in merged:
+                merged[part] = spec[part]
+    return merged
+
+
+def spec_for(annotation: Any) -> Optional[dict]:
+    """JSON-shape spec for a type annotation (lenient where pydantic coerces)."""
+
+    origin = get_origin(annotation)
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {
+            "kinds": {"object"},
+            "fields": {name: spec_for(field.annotation) for name, field in annotation.model_fields.items()},
+            "required": {name for name, field in annotation.model_fields.items() if field.is_required()},
+        }
+    if origin in (Union, types.UnionType):
+        return _merge([spec_for(arg) for arg in get_args(annotation)])
+    if annotation is str:
+        return {"kinds": {"string"}}
+    if annotation in (int, float):
+        # pydantic (lax mode) also accepts numeric strings and bools
+        return {"kinds": {"number", "string", "boolean"}}
+    if annotation is bool:
+        return {"kinds": {"boolean", "number", "string"}}
+    if annotation is type(None):
+        return {"kinds": {"null"}}
+    if annotation is list or origin is list:
+        args = get_args(annotation)
+        return {"kinds": {"array"}, "items": spec_for(args[0]) if args else _ANY}
+    if annotation is dict or origin is dict:
+        args = get_args(annotation)
+        return {"kinds": {"object"}, "values": spec_for(args[1]) if args else _ANY}
+    return _ANY
+
+
+def agent_response_spec(result_model: Optional[Type[BaseModel]] = None) -> dict:
+    """Top-level agent envelope: {"action": ..., "result" | "tool" + "args"}."""
+    return {
+        "kinds": {"object"},
+        "fields": {
+            "action": {"kinds": {"string"}, "enum": set(AGENT_ACTIONS)},
+            "result": spec_for(result_model) if result_model else _ANY,
+            "tool": {"kinds": {"string"}},
+            "args": {"kinds": {"object"}},
+        },
+        "required": {"action"},
+    }
+
+
+def _child(spec: Optional[dict], container: str, key: Optional[str]) -> Optional[dict]:
+    if spec is None:
+        return _ANY
+    if container == "array":
+        return spec.get("items")
+    if "fields" in spec:
+        return spec["fields"].get(key)  # extra keys are ignored, like pydantic
+    return spec.get("values")
+
+
+# -----------------------------
+# INCREMENTAL VALIDATOR
+# -----------------------------
+class StreamingJSONValidator:
+    """
+    Push parser for one JSON object arriving in chunks.
+
+    feed() raises StreamValidationError as soon as the text seen so far
+    cannot be completed into a valid response: broken syntax, a value of
+    the wrong JSON kind for its field, an unknown action, or an object
+    closing with required fields missing. close() parses the full text
+    and runs the pydantic model over `result` for the final word.
+    """
+
+    def __init__(self, result_model: Optional[Type[BaseModel]] = None):
+        self.result_model = result_model
+        self.spec = agent_response_spec(result_model)
+        self.text: List[str] = []
+
+        # frames: [container, spec, expect, key, seen_keys, path]
+        self._stack: List[list] = []
+        self._done = False
+        self._token: Optional[str] = None     # "string" | "scalar"
+        self._buffer: List[str] = []
+        self._escape = False
+        self._token_is_key = False
+        self._token_spec: Optional[dict] = None
+        self._token_path: Tuple = ()
+
+    # -----------------------------
+    # PUBLIC
+    # -----------------------------
+    def feed(self, chunk: str):
+        self.text.append(chunk)
+        for char in chunk:
+            self._char(char)
+
+    def close(self) -> Dict[str, Any]:
+        if self._token == "scalar":
+            self._end_scalar()
+        if not self._done:
+            raise StreamValidationError("Response ended before the JSON object was complete")
+
+        try:
+            parsed = json.loads("".join(self.text))
+        except ValueError as e:
+            raise StreamValidationError(f"Invalid JSON: {e}")
+
+        if parsed.get("action") == "final":
+            if "result" not in parsed:
+                raise StreamValidationError("Final response is missing 'result'")
+            if self.result_model is not None:
+                try:
+                    self.result_model.model_validate(parsed["result"])
+                except ValidationError as e:
+                    raise StreamValidationError(f"result does not match {self.result_model.__name__}: {e}")
+        return parsed
+
+    # -----------------------------
+    # TOKENS
+    # -----------------------------
+    def _fail(self, reason: str):
+        raise StreamValidationError(reason)
+
+    def _where(self, path: Tuple) -> str:
+        return ".".join(str(part) for part in path) or "<root>"
+
+    def _begin_value(self, kind: str) -> Tuple[Optional[dict], Tuple]:
+        """Check a value of `kind` may start here; returns (spec, path)."""
+
+        if self._done:
+            self._fail("Unexpected data after the JSON object")
+
+        if not self._stack:
+            spec, path = self.spec, ()
+        else:
+            frame = self._stack[-1]
+            container, parent_spec, expect, key, _, parent_path = frame
+            if expect != "value":
+                self._fail(f"Unexpected value at {self._where(parent_path)}")
+            spec = _child(parent_spec, container, key)
+            path = parent_path + ((key,) if container == "object" else ("[]",))
+            frame[2] = "comma_or_end"
+
+        if spec is not None and kind not in spec["kinds"]:
+            self._fail(f"{self._where(path)} must be {'/'.join(sorted(spec['kinds']))}, got {kind}")
+        return spec, path
+
+    def _end_value(self):
+        if not self._stack:
+            self._done = True
+
+    def _end_string(self):
+        self._token = None
+        spec = self._token_spec
+
+        # Only keys and enum values need decoding
+        if not self._token_is_key and (spec is None or "enum" not in spec):
+            self._end_value()
+            return
+
+        try:
+            value = json.loads('"' + "".join(self._buffer) + '"')
+        except ValueError:
+            self._fail("Invalid JSON string")
+
+        if self._token_is_key:
+            frame = self._stack[-1]
+            frame[3] = value
+            frame[4].add(value)
+            frame[2] = "colon"
+            return
+
+        if "enum" in spec and value not in spec["enum"]:
+            self._fail(f"{self._where(self._token_path)} must be one of {sorted(spec['enum'])}, got '{value}'")
+        self._end_value()
+
+    def _end_scalar(self):
+        literal = "".join(self._buffer)
+        self._token = None
+
+        try:
+            value = json.loads(literal)
+        except ValueError:
+            self._fail(f"Invalid JSON literal '{literal[:20]}'")
+
+        kind = "null" if value is None else ("boolean" if isinstance(value, bool) else "number")
+        self._begin_value(kind)
+        self._end_value()
+
+    # -----------------------------
+    # CHARACTER STATE MACHINE
+    # -----------------------------
+    def _char(self, char: str):
+        if self._token == "string":
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._end_string()
+                return
+            self._buffer.append(char)
+            return
+
+        if self._token == "scalar":
+            if char in _SCALAR_CHARS:
+                self._buffer.append(char)
+                return
+            self._end_scalar()
+
+        if char in _WHITESPACE:
+            return
+
+        frame = self._stack[-1] if self._stack else None
+        expect = frame[2] if frame else None
+
+        # ---- Object keys
+        if frame and frame[0] == "object" and expect in ("key_or_end", "key"):
+            if char == '"':
+                self._start_string(is_key=True)
+            elif char == "}" and expect == "key_or_end":
+                self._close_container("object")
+            else:
+                self._fail(f"Expected an object key at {self._where(frame[5])}")
+            return
+
+        if frame and expect == "colon":
+            if char != ":":
+                self._fail(f"Expected ':' at {self._where(frame[5])}")
+            frame[2] = "value"
+            return
+
+        if frame and expect == "comma_or_end":
+            if char == ",":
+                frame[2] = "key" if frame[0] == "object" else "value"
+            elif char == ("}" if frame[0] == "object" else "]"):
+                self._close_container(frame[0])
+            else:
+                self._fail(f"Expected ',' at {self._where(frame[5])}")
+            return
+
+        if frame and frame[0] == "array" and expect == "value_or_end" and char == "]":
+            self._close_container("array")
+            return
+
+        if frame and expect == "value_or_end":
+            frame[2] = "value"
+
+        # ---- Values
+        if char == "{":
+            spec, path = self._begin_value("object")
+            self._stack.append(["object", spec, "key_or_end", None, set(), path])
+        elif char == "[":
+            spec, path = self._begin_value("array")
+            self._stack.append(["array", spec, "value_or_end", None, set(), path])
+        elif char == '"':
+            self._token_spec, self._token_path = self._begin_value("string")
+            self._start_string(is_key=False)
+        elif char in _SCALAR_CHARS:
+            if not self._stack:
+                self._fail("Response must be a JSON object")
+            self._token = "scalar"
+            self._buffer = [char]
+        else:
+            self._fail(f"Unexpected character {char!r}")
+
+    def _start_string(self, is_key: bool):
+        self._token = "string"
+        self._token_is_key = is_key
+        self._buffer = []
+        self._escape = False
+
+    def _close_container(self, container: str):
+        frame = self._stack.pop()
+        spec, seen, path = frame[1], frame[4], frame[5]
+
+        if container == "object" and spec is not None:
+            missing = spec.get("required", set()) - seen
+            if missing:
+                self._fail(f"{self._where(path)} is missing required fields: {sorted(missing)}")
+        self._end_value()
+
+
+def validate_response(raw: str, result_model: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+    """Validate a complete response (non-streaming path)."""
+
+    validator = StreamingJSONValidator(result_model)
+    validator.feed(raw or "")
+    return validator.close()
+
+
+def repair_prompt(user_prompt: str, previous: str, reason: str) -> str:
+    """Follow-up prompt asking the model to fix an invalid response."""
+
+    return f"""{user_prompt}
+
+Your previous response was rejected: {reason}
+
+Previous (invalid) response:
+{previous[:2000]}
+
+Respond again with ONLY valid JSON that fixes this problem.
+"""
@@ -1,42 +1,480 @@
+import asyncio
 import os
 import json
+import time
 from dotenv import load_dotenv
-from openai import OpenAI
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Generator, Iterator, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+from core.json_stream import (
+    LLM_REPAIR_ATTEMPTS, StreamValidationError, StreamingJSONValidator, repair_prompt, validate_response
+)
+from core.llm_cache import cache_enabled_for, cache_key, get_cache
+from core.llm_client import get_async_llm_client, get_llm_client
+from core.logging import logger
+from core.metrics import inc
+from core.resilience import (
+    LLM_BREAKER, LLM_DEADLINE_SECONDS, LLM_LATENCIES, CircuitOpenError, deadline, hedge_delay, hedged,
+    is_provider_failure, within_deadline
+)
+from core.singleflight import AsyncSingleFlight, SingleFlight
 
 load_dotenv()
 
 LLM_MODE = os.getenv("LLM_MODE", "MOCK")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Coalesce identical concurrent requests (counter: llm.coalesced)
+_FLIGHTS = SingleFlight("llm")
+_ASYNC_FLIGHTS = AsyncSingleFlight("llm")
+
+JSON_INSTRUCTIONS = """
+You MUST respond ONLY with valid JSON.
+You MUST include an "action" field.
+"""
 
 
-def call_llm(system_prompt: str, user_prompt: str, temperature: float = 0.3) -> str:
+def call_llm(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    agent: Optional[str] = None
+) -> str:
     """
     Single public LLM entrypoint used by all agents.
     Must return a JSON string.
+
+    Real responses are cached by content (see core.llm_cache) and
+    identical concurrent calls are coalesced into one request;
+    `agent` lets LLM_CACHE_DISABLED_AGENTS opt individual agents out.
+
+    Each call has a deadline (LLM_DEADLINE_SECONDS) and goes through the
+    circuit breaker (see core.resilience); when the provider is failing
+    an expired cache entry is served if there is one.
+    """
+
+    if LLM_MODE == "MOCK":
+        return _mock_response(user_prompt)
+
+    cache, key, cached = _cache_lookup(system_prompt, user_prompt, temperature, agent)
+    if cached is not None:
+        return cached
+
+    # REAL / PROD MODE (identical in-flight calls share one request)
+    def complete() -> str:
+        if not LLM_BREAKER.allow():
+            return _fallback(cache, key, CircuitOpenError("LLM provider unavailable (circuit open)"))
+
+        start = time.monotonic()
+        try:
+            content = get_llm_client().complete(
+                model=OPENAI_MODEL,
+                messages=_messages(system_prompt, user_prompt),
+                temperature=temperature,
+                deadline=deadline(),
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            return _fallback(cache, key, e)
+
+        LLM_BREAKER.record_success()
+        LLM_LATENCIES.add(time.monotonic() - start)
+        _cache_store(cache, key, content)
+        return content
+
+    return _FLIGHTS.do(key, complete)
+
+
+async def call_llm_async(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    agent: Optional[str] = None
+) -> str:
+    """
+    asyncio twin of call_llm (same cache, same limits, same breaker).
+    Awaiting it does not hold a worker thread while the request is in flight.
+    With LLM_HEDGE_ENABLED, a request slower than the recent p95 gets a
+    duplicate and the first answer wins.
     """
 
     if LLM_MODE == "MOCK":
         return _mock_response(user_prompt)
 
+    cache, key, cached = await asyncio.to_thread(_cache_lookup, system_prompt, user_prompt, temperature, agent)
+    if cached is not None:
+        return cached
+
+    # REAL / PROD MODE (identical in-flight calls share one request)
+    async def complete() -> str:
+        if not LLM_BREAKER.allow():
+            return await _fallback_async(cache, key, CircuitOpenError("LLM provider unavailable (circuit open)"))
+
+        client = get_async_llm_client()
+        call_deadline = deadline()
+
+        def attempt():
+            return client.complete(
+                model=OPENAI_MODEL,
+                messages=_messages(system_prompt, user_prompt),
+                temperature=temperature,
+                deadline=call_deadline,
+                response_format={"type": "json_object"}
+            )
+
+        start = time.monotonic()
+        try:
+            content = await within_deadline(hedged(attempt, hedge_delay(LLM_LATENCIES)), LLM_DEADLINE_SECONDS)
+        except asyncio.CancelledError:
+            LLM_BREAKER.release()
+            raise
+        except Exception as e:
+            LLM_BREAKER.record_failure(e)
+            return await _fallback_async(cache, key, e)
+
+        LLM_BREAKER.record_success()
+        LLM_LATENCIES.add(time.monotonic() - start)
+        await asyncio.to_thread(_cache_store, cache, key, content)
+        return content
+
+    return await _ASYNC_FLIGHTS.do(key, complete)
+
+
+async def stream_llm_async(
+    system_prompt: str,
+    user_prompt: str,
+    temperature: float = 0.3,
+    agent: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming twin of call_llm_async: yields the response text as it is
+    generated. Cache hits (and MOCK mode) are replayed in chunks. Streams
+    are not coalesced; each caller gets its own generation.
+    """
+
+    if LLM_MODE == "MOCK":
+        for chunk in _chunks(_mock_response(user_prompt)):
+            yield chunk
+        return
+
+    cache, key, cached = await asyncio.to_thread(_cache_lookup, system_prompt, user_prompt, temperature, agent)
+    if cached is not None:
+        for chunk in _chunks(cached):
+            yield chunk
+        return
+
     # REAL / PROD MODE
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": system_prompt + """
-You MUST respond ONLY with valid JSON.
-You MUST include an "action" field.
-"""
-            },
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=temperature,
-        response_format={"type": "json_object"}
-    )
-
-    return response.choices[0].message.content
+    if not LLM_BREAKER.allow():
+        stale = await _fallback_async(cache, key, CircuitOpenError("LLM provider unavailable (circuit open)"))
+        for chunk in _chunks(stale):
+            yield chunk
+        return
+
+    parts = []
+    error = None
+    try:
+        async for delta in get_async_llm_client().stream(
+            model=OPENAI_MODEL,
+            messages=_messages(system_prompt, user_prompt),
+            temperature=temperature,
+            deadline=deadline(),
+            response_format={"type": "json_object"}
+        ):
+            parts.append(delta)
+            yield delta
+    except Exception as e:
+        LLM_BREAKER.record_failure(e)
+        if parts:
+            raise  # part of the answer is already out
+        error = e
+    except BaseException:
+        # Closed early by the consumer: the provider did answer if it sent anything
+        if parts:
+            LLM_BREAKER.record_success()
+        else:
+            LLM_BREAKER.release()
+        raise
+
+    if error is not None:
+        for chunk in _chunks(await _fallback_async(cache, key, error)):
+            yield chunk
+        return
+
+    LLM_BREAKER.record_success()
+    await asyncio.to_thread(_cache_store, cache, key, "".join(parts))
+
+
+# -----------------------------
+# AGENT STEP DRIVERS
+# -----------------------------
+# Agents are written as generators that yield (system_prompt, user_prompt)
+# and receive the raw LLM response back; an LLM failure is thrown into
+# the generator so the agent's own error handling applies. The generator's
+# return value is the AgentResponse. The same agent code therefore runs
+# under a blocking driver (run_steps) or an asyncio one (run_steps_async).
+#
+# A request may carry a third element, the pydantic model of the expected
+# `result` (see core.json_stream). Such responses are validated - while
+# streaming on the async paths, so a bad generation is cut short - and
+# retried with a repair prompt.
+#
+# A step may also yield an Offload: blocking non-LLM work (retrieval, store
+# lookups) whose return value is sent back. The async drivers await it off
+# the event loop, so concurrent requests do not queue behind it.
+LLMRequest = Union[Tuple[str, str], Tuple[str, str, Optional[Type[BaseModel]]]]
+
+
+class Offload:
+    """
+    Blocking work yielded by an agent step.
+    - run: called inline by run_steps, in a worker thread by the async drivers
+    - run_async: optional awaitable variant the async drivers use instead
+      (e.g. to await a future that is already running)
+    """
+
+    def __init__(self, run: Callable[[], Any], run_async: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.run = run
+        self.run_async = run_async
+
+    async def run_off_loop(self) -> Any:
+        if self.run_async is not None:
+            return await self.run_async()
+        return await asyncio.to_thread(self.run)
+
+
+AgentSteps = Generator[Union[LLMRequest, Offload], Any, Any]
+
+
+def _call_checked(request: LLMRequest, agent: Optional[str], temperature: float = 0.3) -> str:
+    system_prompt, user_prompt, schema = (tuple(request) + (None,))[:3]
+    raw = call_llm(system_prompt, user_prompt, temperature, agent)
+    if schema is None:
+        return raw
+
+    prompt = user_prompt
+    for attempt in range(LLM_REPAIR_ATTEMPTS + 1):
+        try:
+            validate_response(raw, schema)
+            return raw
+        except StreamValidationError as e:
+            inc("llm.invalid")
+            # call_llm cached it as JSON; do not replay an answer that fails the schema
+            _cache_evict(system_prompt, prompt, temperature, agent)
+            if attempt == LLM_REPAIR_ATTEMPTS:
+                raise
+            prompt = repair_prompt(user_prompt, raw, str(e))
+            raw = call_llm(system_prompt, prompt, temperature, agent)
+
+
+async def _stream_checked(
+    request: LLMRequest,
+    agent: Optional[str],
+    temperature: float = 0.3
+) -> AsyncIterator[Tuple[str, str]]:
+    """("token", text) events; ("retry", reason) when a response is abandoned."""
+
+    system_prompt, user_prompt, schema = (tuple(request) + (None,))[:3]
+    if schema is None:
+        async for delta in stream_llm_async(system_prompt, user_prompt, temperature, agent):
+            yield "token", delta
+        return
+
+    prompt = user_prompt
+    for attempt in range(LLM_REPAIR_ATTEMPTS + 1):
+        validator = StreamingJSONValidator(schema)
+        stream = stream_llm_async(system_prompt, prompt, temperature, agent)
+
+        try:
+            async for delta in stream:
+                validator.feed(delta)  # raises as soon as the output is provably invalid
+                yield "token", delta
+            validator.close()
+            return
+
+        except StreamValidationError as e:
+            inc("llm.invalid")
+            # A complete (or replayed) response was cached before close() rejected it
+            await asyncio.to_thread(_cache_evict, system_prompt, prompt, temperature, agent)
+            if attempt == LLM_REPAIR_ATTEMPTS:
+                raise
+            yield "retry", str(e)
+            prompt = repair_prompt(user_prompt, "".join(validator.text), str(e))
+
+        finally:
+            # Stops the generation when validation failed mid-stream
+            await stream.aclose()
+
+
+async def _call_checked_async(request: LLMRequest, agent: Optional[str], temperature: float = 0.3) -> str:
+    system_prompt, user_prompt, schema = (tuple(request) + (None,))[:3]
+    if schema is None:
+        return await call_llm_async(system_prompt, user_prompt, temperature, agent)
+
+    async def complete() -> str:
+        parts = []
+        async for kind, value in _stream_checked(request, agent, temperature):
+            if kind == "retry":
+                parts = []
+            else:
+                parts.append(value)
+        return "".join(parts)
+
+    key = (schema.__name__, cache_key(OPENAI_MODEL, system_prompt, user_prompt, temperature))
+    return await _ASYNC_FLIGHTS.do(key, complete)
+
+
+def run_steps(steps: AgentSteps, agent: Optional[str] = None) -> Any:
+    raw, error = None, None
+
+    while True:
+        try:
+            request = steps.throw(error) if error else steps.send(raw)
+        except StopIteration as done:
+            return done.value
+
+        try:
+            if isinstance(request, Offload):
+                raw, error = request.run(), None
+            else:
+                raw, error = _call_checked(request, agent), None
+        except Exception as e:
+            raw, error = None, e
+
+
+async def run_steps_async(steps: AgentSteps, agent: Optional[str] = None) -> Any:
+    raw, error = None, None
+
+    while True:
+        try:
+            request = steps.throw(error) if error else steps.send(raw)
+        except StopIteration as done:
+            return done.value
+
+        try:
+            if isinstance(request, Offload):
+                raw, error = await request.run_off_loop(), None
+            else:
+                raw, error = await _call_checked_async(request, agent), None
+        except Exception as e:
+            raw, error = None, e
+
+
+async def stream_steps_async(steps: AgentSteps, agent: Optional[str] = None) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streaming driver: yields ("token", text) while each LLM response is
+    generated, ("retry", reason) when an invalid response was abandoned
+    (discard its tokens), then ("result", <agent return value>).
+    """
+
+    raw, error = None, None
+
+    while True:
+        try:
+            request = steps.throw(error) if error else steps.send(raw)
+        except StopIteration as done:
+            yield "result", done.value
+            return
+
+        if isinstance(request, Offload):
+            try:
+                raw, error = await request.run_off_loop(), None
+            except Exception as e:
+                raw, error = None, e
+            continue
+
+        parts = []
+        try:
+            async for kind, value in _stream_checked(request, agent):
+                if kind == "retry":
+                    parts = []
+                else:
+                    parts.append(value)
+                yield kind, value
+            raw, error = "".join(parts), None
+        except Exception as e:
+            raw, error = None, e
+
+
+# -----------------------------
+# PRIVATE HELPERS
+# -----------------------------
+STREAM_REPLAY_CHARS = 16
+
+
+def _chunks(content: str) -> Iterator[str]:
+    for start in range(0, len(content), STREAM_REPLAY_CHARS):
+        yield content[start:start + STREAM_REPLAY_CHARS]
+
+
+def _messages(system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": system_prompt + JSON_INSTRUCTIONS
+        },
+        {"role": "user", "content": user_prompt}
+    ]
+
+
+def _cache_active(agent: Optional[str]) -> bool:
+    # CASSETTE calls must reach the cassette: a cache hit would skip the
+    # replayed latency / injected errors, or the recording
+    return LLM_MODE not in ("MOCK", "CASSETTE") and cache_enabled_for(agent)
+
+
+def _cache_lookup(system_prompt: str, user_prompt: str, temperature: float, agent: Optional[str]):
+    """(cache or None, key, cached response or None)"""
+
+    cache = get_cache() if _cache_active(agent) else None
+    key = cache_key(OPENAI_MODEL, system_prompt, user_prompt, temperature)
+
+    if cache is None:
+        return None, key, None
+
+    cached = cache.get(key)
+    inc("llm_cache.hit" if cached is not None else "llm_cache.miss")
+    return cache, key, cached
+
+
+def _fallback(cache, key: str, error: Exception) -> str:
+    """Expired cached response for a call the provider could not answer, else re-raise."""
+
+    if isinstance(error, CircuitOpenError) or is_provider_failure(error):
+        stale = cache.get(key, allow_stale=True) if cache is not None else None
+        if stale is not None:
+            inc("llm.stale_served")
+            logger.warning(f"[LLM] Serving stale cached response | error={type(error).__name__}")
+            return stale
+    raise error
+
+
+async def _fallback_async(cache, key: str, error: Exception) -> str:
+    """_fallback with the sqlite read kept off the event loop."""
+
+    if cache is None:
+        return _fallback(None, key, error)
+    return await asyncio.to_thread(_fallback, cache, key, error)
+
+
+def _cache_evict(system_prompt: str, user_prompt: str, temperature: float, agent: Optional[str]):
+    if _cache_active(agent):
+        get_cache().delete(cache_key(OPENAI_MODEL, system_prompt, user_prompt, temperature))
+
+
+def _cache_store(cache, key: str, content: Optional[str]):
+    # Only well-formed JSON is worth replaying
+    if cache is not None and _is_json(content):
+        cache.put(key, content)
+
+
+def _is_json(content: Optional[str]) -> bool:
+    try:
+        json.loads(content)
+        return True
+    except (TypeError, ValueError):
+        return False
 
 
 # -----------------------------
@@ -0,0 +1,199 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+from core.metrics import inc
+
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "memory/llm_cache.db")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# How long past the TTL an entry is kept as a fallback while the provider is down
+LLM_CACHE_STALE_SECONDS = float(os.getenv("LLM_CACHE_STALE_SECONDS", "604800"))
+
+# Hits only update last_access in memory; they are written in one batch at most this often
+LLM_CACHE_ACCESS_FLUSH_SECONDS = float(os.getenv("LLM_CACHE_ACCESS_FLUSH_SECONDS", "30"))
+
+# Comma-separated agent names that never read or write the cache
+LLM_CACHE_DISABLED_AGENTS = {
+    name.strip()
+    for name in os.getenv("LLM_CACHE_DISABLED_AGENTS", "").split(",")
+    if name.strip()
+}
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, temperature: float) -> str:
+    """Content address of one LLM request."""
+    payload = json.dumps([model, system_prompt, user_prompt, temperature], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Persistent LLM response cache (SQLite).
+
+    - keyed on cache_key(model, system, user, temperature)
+    - entries older than ttl_seconds are treated as misses, but stay
+      readable with allow_stale for another stale_seconds, then are dropped
+    - once above max_entries, least-recently-used entries are evicted
+    - reads do not write: last_access is kept in memory and flushed in
+      one transaction every access_flush_seconds (and before eviction)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float,
+        max_entries: int,
+        stale_seconds: float = 0.0,
+        access_flush_seconds: float = LLM_CACHE_ACCESS_FLUSH_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.access_flush_seconds = access_flush_seconds
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._flushed_at = time.monotonic()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, allow_stale: bool = False) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            response, created_at = row
+            age = now - created_at
+            if age > self.ttl_seconds + self.stale_seconds:
+                self._touched.pop(key, None)
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            if age > self.ttl_seconds and not allow_stale:
+                return None
+
+            self._touched[key] = now
+            if time.monotonic() - self._flushed_at >= self.access_flush_seconds:
+                self._flush_access()
+                self._conn.commit()
+            return response
+
+    def put(self, key: str, response: str):
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+
+            self._touched.pop(key, None)
+
+            # LRU eviction down to max_entries (on up-to-date access times)
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                self._flush_access()
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                inc("llm_cache.evicted")
+
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._touched.pop(key, None)
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def flush(self):
+        """Write pending last_access updates now."""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return {
+            "entries": count,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+        }
+
+    def _flush_access(self):
+        # Caller holds self._lock and commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()]
+            )
+            self._touched.clear()
+        self._flushed_at = time.monotonic()
+
+
+_CACHE: Optional[LLMCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Process-wide cache, opened on first use."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache(
+                LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_STALE_SECONDS
+            )
+            atexit.register(_CACHE.flush)
+        return _CACHE
+
+
+def cache_enabled_for(agent: Optional[str]) -> bool:
+    """Global switch + per-agent opt-out."""
+    return LLM_CACHE_ENABLED and agent not in LLM_CACHE_DISABLED_AGENTS
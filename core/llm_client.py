@@ -0,0 +1,408 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from openai import OpenAI, AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+from core.logging import logger
+from core.metrics import inc
+from core.prompt_builder import count_tokens
+
+load_dotenv()
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "10"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))
+
+# Client-side limits (keep at or below the account's OpenAI limits)
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "200000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+# Retry policy
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The call's overall deadline (all attempts + waits) ran out."""
+
+
+# -----------------------------
+# RATE LIMITING
+# -----------------------------
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity per minute.
+
+    reserve() takes the tokens immediately (the balance may go negative)
+    and returns how long the caller must wait before sending, so waiters
+    queue up fairly instead of racing for the refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        # A single request larger than the bucket must still go through
+        amount = min(float(amount), self.capacity)
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+_BUCKETS: Optional[Tuple[TokenBucket, TokenBucket]] = None
+_BUCKETS_LOCK = threading.Lock()
+
+
+def shared_buckets() -> Tuple[TokenBucket, TokenBucket]:
+    """(requests, tokens) buckets shared by the sync and async clients."""
+    global _BUCKETS
+    with _BUCKETS_LOCK:
+        if _BUCKETS is None:
+            _BUCKETS = (TokenBucket(LLM_RPM_LIMIT), TokenBucket(LLM_TPM_LIMIT))
+        return _BUCKETS
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """TPM charge: local prompt token count + the completion cap."""
+    return sum(count_tokens(message["content"]) for message in messages) + max_tokens
+
+
+# -----------------------------
+# RETRY POLICY
+# -----------------------------
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-requested delay from retry-after-ms / Retry-After headers."""
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    # HTTP-date form
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Delay before retry number `attempt` (0-based).
+    Honors Retry-After when given; otherwise full-jitter exponential backoff.
+    """
+
+    if retry_after is not None:
+        return min(retry_after, LLM_BACKOFF_MAX_SECONDS) + random.uniform(0, LLM_BACKOFF_BASE_SECONDS)
+
+    ceiling = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+# -----------------------------
+# CLIENT MANAGER
+# -----------------------------
+def _openai_client(client_class, api_key: Optional[str], base_url: Optional[str], timeout: float) -> Any:
+    """SDK client, or its cassette stand-in when LLM_MODE=CASSETTE."""
+
+    def build():
+        return client_class(
+            api_key=api_key or os.getenv("OPENAI_API_KEY"),
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0
+        )
+
+    if os.getenv("LLM_MODE", "MOCK") == "CASSETTE":
+        from core.cassette import cassette_client
+        return cassette_client(client_class is AsyncOpenAI, build, timeout)
+    return build()
+
+
+class LLMClient:
+    """
+    Long-lived OpenAI client shared by every call_llm.
+
+    - one OpenAI instance => pooled HTTP connections / TLS sessions
+    - request + token buckets (LLM_RPM_LIMIT / LLM_TPM_LIMIT)
+    - at most LLM_MAX_CONCURRENCY requests in flight
+    - retries 429 / 5xx / timeouts with jittered backoff, honoring Retry-After
+      (the SDK's own retries are disabled so there is one policy)
+    - optional per-call deadline (time.monotonic() value) bounding all
+      attempts: each attempt's timeout shrinks to what is left, and a
+      retry that cannot start in time is not attempted
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = OPENAI_BASE_URL,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        buckets: Optional[Tuple[TokenBucket, TokenBucket]] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.requests, self.tokens = buckets or shared_buckets()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._client = _openai_client(OpenAI, api_key, base_url, timeout)
+
+    def _throttle(self, tokens: int) -> float:
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            inc("llm.throttled")
+        return wait
+
+    def _attempt_timeout(self, deadline: Optional[float], wait: float) -> Dict[str, float]:
+        """timeout kwarg for an attempt starting after `wait` seconds."""
+
+        if deadline is None:
+            return {}
+
+        remaining = deadline - time.monotonic() - wait
+        if remaining <= 0:
+            inc("llm.deadline_exceeded")
+            raise DeadlineExceeded("LLM call deadline exceeded")
+        return {"timeout": min(self.timeout, remaining)}
+
+    def _retry_delay(self, attempt: int, error: Exception, deadline: Optional[float] = None) -> Optional[float]:
+        """Backoff before the next attempt, or None when `error` is final."""
+
+        if not is_retryable(error) or attempt == self.max_retries:
+            inc("llm.error")
+            return None
+
+        delay = backoff_delay(attempt, retry_after_seconds(error))
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            inc("llm.error")
+            inc("llm.deadline_exceeded")
+            return None
+
+        inc("llm.retry")
+        logger.warning(
+            f"[LLM] Retry {attempt + 1}/{self.max_retries} in {delay:.2f}s | error={type(error).__name__}"
+        )
+        return delay
+
+    def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int = LLM_MAX_TOKENS,
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ) -> str:
+        tokens = estimate_tokens(messages, max_tokens)
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._throttle(tokens)
+            self._attempt_timeout(deadline, wait)  # fail now if the wait alone overruns
+            time.sleep(wait)
+
+            try:
+                with self._semaphore:
+                    timeout = self._attempt_timeout(deadline, 0.0)
+                    response = self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **timeout,
+                        **kwargs
+                    )
+                inc("llm.request")
+                return response.choices[0].message.content
+
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+
+class AsyncLLMClient(LLMClient):
+    """
+    asyncio twin of LLMClient (AsyncOpenAI, asyncio.Semaphore).
+    Shares the process-wide rate-limit buckets with the sync client.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = OPENAI_BASE_URL,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        buckets: Optional[Tuple[TokenBucket, TokenBucket]] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES
+    ):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.requests, self.tokens = buckets or shared_buckets()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = _openai_client(AsyncOpenAI, api_key, base_url, timeout)
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int = LLM_MAX_TOKENS,
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ) -> str:
+        tokens = estimate_tokens(messages, max_tokens)
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._throttle(tokens)
+            self._attempt_timeout(deadline, wait)  # fail now if the wait alone overruns
+            await asyncio.sleep(wait)
+
+            try:
+                async with self._semaphore:
+                    timeout = self._attempt_timeout(deadline, 0.0)
+                    response = await self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **timeout,
+                        **kwargs
+                    )
+                inc("llm.request")
+                return response.choices[0].message.content
+
+            except Exception as e:
+                delay = self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: int = LLM_MAX_TOKENS,
+        deadline: Optional[float] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """
+        Yield content deltas as they arrive.
+        Retries only until the first delta; closing the iterator early
+        closes the HTTP stream (stops generation).
+        """
+
+        tokens = estimate_tokens(messages, max_tokens)
+
+        for attempt in range(self.max_retries + 1):
+            wait = self._throttle(tokens)
+            self._attempt_timeout(deadline, wait)
+            await asyncio.sleep(wait)
+            started = False
+
+            try:
+                async with self._semaphore:
+                    timeout = self._attempt_timeout(deadline, 0.0)
+                    response = await self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        **timeout,
+                        **kwargs
+                    )
+                    try:
+                        async for chunk in response:
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                started = True
+                                yield delta
+                    finally:
+                        await response.close()
+                inc("llm.request")
+                return
+
+            except Exception as e:
+                delay = None if started else self._retry_delay(attempt, e, deadline)
+                if delay is None:
+                    if started:
+                        inc("llm.error")
+                    raise
+                await asyncio.sleep(delay)
+
+
+_CLIENT: Optional[LLMClient] = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Process-wide client, created on first real LLM call."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = LLMClient()
+        return _CLIENT
+
+
+# AsyncOpenAI connections and asyncio.Semaphore belong to one event loop
+_ASYNC_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncLLMClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_llm_client() -> AsyncLLMClient:
+    """Async client for the running event loop (one per loop, shared buckets)."""
+    loop = asyncio.get_running_loop()
+    with _CLIENT_LOCK:
+        client = _ASYNC_CLIENTS.get(loop)
+        if client is None:
+            client = _ASYNC_CLIENTS[loop] = AsyncLLMClient()
+        return client
@@ -6,6 +6,10 @@ def inc(metric_name: str):
     """Increment a metric counter."""
     _METRICS[metric_name] += 1
 
+def set_gauge(metric_name: str, value: float):
+    """Set a metric to the current value of something (state, level, ratio)."""
+    _METRICS[metric_name] = value
+
 def snapshot():
     """Return current metrics snapshot."""
     return dict(_METRICS)
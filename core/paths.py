@@ -0,0 +1,16 @@
+import os
+
+
+def resolve_under(root: str, path: str) -> str:
+    """
+    Real path of `path` (relative paths are taken from `root`).
+    Raises ValueError if it resolves outside `root` (absolute paths
+    elsewhere, `..`, or symlinks pointing out). For paths supplied
+    by API clients; CLIs take any path.
+    """
+
+    base = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, resolved]) != base:
+        raise ValueError(f"Path is outside the allowed directory ({root}): {path}")
+    return resolved
@@ -0,0 +1,203 @@
+import json
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+# Per-agent prompt budgets in tokens (system + user prompt);
+# override with PROMPT_TOKEN_BUDGET_<AGENT>, e.g. PROMPT_TOKEN_BUDGET_FINANCE=8000
+DEFAULT_PROMPT_BUDGETS = {
+    "research": 6000,
+    "finance": 6000,
+    "finance_v2": 4000,
+    "data": 4000,
+}
+DEFAULT_PROMPT_BUDGET = 4000
+
+TRUNCATION_MARKER = " …[truncated]"
+
+# Sections smaller than this are dropped rather than truncated
+MIN_SECTION_TOKENS = 16
+
+# Word pieces of up to 4 characters or single punctuation marks:
+# within ~10-15% of BPE token counts for English / JSON, no tokenizer needed
+_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def count_tokens(text: str) -> int:
+    """Local approximation of the model's token count."""
+    return len(_TOKEN_PATTERN.findall(text or ""))
+
+
+def compact_json(value: Any) -> str:
+    """Structured context without indentation or padding."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def to_text(value: Any) -> str:
+    if value is None:
+        return "None"
+    if isinstance(value, (dict, list, tuple)):
+        return compact_json(value)
+    return str(value)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` within max_tokens (marker included)."""
+
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    limit = max_tokens - count_tokens(TRUNCATION_MARKER)
+    if limit <= 0:
+        return ""
+
+    matches = list(_TOKEN_PATTERN.finditer(text))
+    return text[:matches[limit - 1].end()] + TRUNCATION_MARKER
+
+
+def prompt_budget(agent: str) -> int:
+    default = DEFAULT_PROMPT_BUDGETS.get(agent, DEFAULT_PROMPT_BUDGET)
+    return int(os.getenv(f"PROMPT_TOKEN_BUDGET_{agent.upper()}", default))
+
+
+def rank_documents(query: str, docs: List[str]) -> List[str]:
+    """
+    Order docs by query-term overlap (length-normalized); ties keep the
+    retriever's order.
+    """
+
+    terms = {term.lower() for term in _WORD_PATTERN.findall(query)}
+    if not terms:
+        return list(docs)
+
+    def score(doc: str) -> float:
+        words = [word.lower() for word in _WORD_PATTERN.findall(doc)]
+        if not words:
+            return 0.0
+        return sum(1 for word in words if word in terms) / math.sqrt(len(words))
+
+    ranked = sorted(enumerate(docs), key=lambda item: (-score(item[1]), item[0]))
+    return [doc for _, doc in ranked]
+
+
+def fit_documents(docs: List[str], max_tokens: int, separator: str = "\n") -> str:
+    """Whole docs while they fit, then a truncated one; the rest is dropped."""
+
+    parts: List[str] = []
+    remaining = max_tokens
+
+    for doc in docs:
+        cost = count_tokens(doc) + (count_tokens(separator) if parts else 0)
+        if cost <= remaining:
+            parts.append(doc)
+            remaining -= cost
+            continue
+        if remaining >= MIN_SECTION_TOKENS:
+            parts.append(truncate_to_tokens(doc, remaining))
+        break
+
+    return separator.join(parts)
+
+
+class PromptBuilder:
+    """
+    Assembles "Title:\\nbody" sections within an agent's token budget.
+
+    - section(): fixed text, always kept whole (task, rules, ...)
+    - context(): free text / structured values, truncated to fit
+    - documents(): retrieved docs, ranked against a query, then fitted
+      (can be reserved first and filled later, once retrieval returns)
+    Flexible sections share the space left after fixed ones (each gets
+    an equal share; space a small section does not need is passed on).
+    """
+
+    def __init__(self, agent: str, system_prompt: str = "", budget: Optional[int] = None):
+        self.agent = agent
+        self.budget = prompt_budget(agent) if budget is None else budget
+        self.system_tokens = count_tokens(system_prompt)
+        self.tokens: Optional[int] = None
+        self._sections: List[Dict[str, Any]] = []
+
+    def section(self, title: str, value: Any) -> "PromptBuilder":
+        self._sections.append({"title": title, "text": to_text(value)})
+        return self
+
+    def context(self, title: str, value: Any, empty: str = "None") -> "PromptBuilder":
+        text = to_text(value) if value not in (None, "") else empty
+        self._sections.append({"title": title, "text": text, "flexible": True})
+        return self
+
+    def documents(
+        self,
+        title: str,
+        docs: Optional[List[str]],
+        query: str,
+        empty: str = "NO_RELEVANT_DOCUMENTS_FOUND"
+    ) -> "PromptBuilder":
+        """docs=None reserves the section's place; fill it with fill_documents() before build()."""
+        self._sections.append({"title": title, "pending": (query, empty)})
+        if docs is not None:
+            self.fill_documents(title, docs)
+        return self
+
+    def fill_documents(self, title: str, docs: List[str]) -> "PromptBuilder":
+        for i, section in enumerate(self._sections):
+            if section["title"] == title and "pending" in section:
+                query, empty = section["pending"]
+                if docs:
+                    self._sections[i] = {"title": title, "docs": rank_documents(query, docs), "flexible": True}
+                else:
+                    self._sections[i] = {"title": title, "text": empty}
+                return self
+        raise ValueError(f"No pending documents section: {title}")
+
+    def text(self, value: str) -> "PromptBuilder":
+        """Untitled fixed block (e.g. trailing rules)."""
+        self._sections.append({"title": None, "text": value.strip("\n")})
+        return self
+
+    def _render(self, section: Dict[str, Any], body: str) -> str:
+        return f"{section['title']}:\n{body}" if section["title"] else body
+
+    def build(self) -> str:
+        pending = [section["title"] for section in self._sections if "pending" in section]
+        if pending:
+            raise ValueError(f"Documents not filled: {', '.join(pending)}")
+
+        # ---- Fixed sections
+        bodies: Dict[int, str] = {}
+        used = self.system_tokens
+        flexible = []
+
+        for i, section in enumerate(self._sections):
+            if section.get("flexible"):
+                full = section["text"] if "text" in section else "\n".join(section["docs"])
+                flexible.append((count_tokens(full), i))
+                used += count_tokens(self._render(section, ""))
+            else:
+                bodies[i] = section["text"]
+                used += count_tokens(self._render(section, section["text"]))
+
+        # ---- Flexible sections: water-fill the remaining budget
+        remaining = max(self.budget - used, 0)
+        flexible.sort()
+
+        for position, (size, i) in enumerate(flexible):
+            section = self._sections[i]
+            share = remaining // (len(flexible) - position)
+
+            if "docs" in section:
+                body = fit_documents(section["docs"], share) if size > share else "\n".join(section["docs"])
+            else:
+                body = truncate_to_tokens(section["text"], share) if size > share else section["text"]
+
+            bodies[i] = body or "[omitted: prompt budget]"
+            remaining -= min(size, share)
+
+        prompt = "\n" + "\n\n".join(
+            self._render(section, bodies[i]) for i, section in enumerate(self._sections)
+        ) + "\n"
+        self.tokens = self.system_tokens + count_tokens(prompt)
+        return prompt
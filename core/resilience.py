@@ -0,0 +1,244 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from core.llm_client import DeadlineExceeded, is_retryable
+from core.logging import logger
+from core.metrics import inc, set_gauge, snapshot
+
+load_dotenv()
+
+# Overall budget of one LLM call (attempts, retries and waits included)
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+
+# Hedging: after the LLM_HEDGE_PERCENTILE latency, fire a duplicate request
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.5"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Circuit breaker
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+LATENCY_WINDOW = 200
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider is failing; the call was not attempted."""
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Errors that say the provider is unhealthy (not that our request is bad)."""
+    return isinstance(error, (DeadlineExceeded, asyncio.TimeoutError)) or (
+        isinstance(error, Exception) and is_retryable(error)
+    )
+
+
+# -----------------------------
+# LATENCY TRACKING
+# -----------------------------
+class LatencyTracker:
+    """Recent successful call latencies (sliding window) and their percentiles."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(pct / 100 * len(samples)) - 1))
+        return samples[index]
+
+
+# -----------------------------
+# CIRCUIT BREAKER
+# -----------------------------
+class CircuitBreaker:
+    """
+    Stops calling a provider that keeps failing.
+
+    - closed: calls go through; failure_threshold consecutive provider
+      failures open the circuit
+    - open: calls are refused (CircuitOpenError) for cooldown_seconds
+    - half_open: one probe call goes through; success closes the
+      circuit, failure opens it for another cooldown
+    State is published as the gauge `{name}.state` (0 closed, 1 half-open, 2 open).
+    """
+
+    def __init__(
+        self,
+        name: str = "llm.breaker",
+        failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+        cooldown_seconds: float = LLM_BREAKER_COOLDOWN_SECONDS
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.failures = 0
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        set_gauge(f"{name}.state", BREAKER_STATES["closed"])
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self._set("half_open")
+            return self._state
+
+    def _set(self, state: str):
+        if state != self._state:
+            logger.warning(f"[LLM] Circuit {self._state} -> {state}")
+            inc(f"{self.name}.{state}")
+        self._state = state
+        set_gauge(f"{self.name}.state", BREAKER_STATES[state])
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe when half-open)."""
+
+        state = self.state
+        with self._lock:
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+        inc(f"{self.name}.rejected")
+        return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set("closed")
+
+    def record_failure(self, error: BaseException):
+        """Count `error` if it is the provider's fault; others just end a probe."""
+
+        with self._lock:
+            probe = self._probing
+            self._probing = False
+
+            if not is_provider_failure(error):
+                if probe:
+                    self._set("closed")  # the provider answered
+                return
+
+            self.failures += 1
+            if probe or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set("open")
+
+    def release(self):
+        """A call that ended without an outcome (cancelled) gives back the probe."""
+        with self._lock:
+            self._probing = False
+
+
+# -----------------------------
+# HEDGING
+# -----------------------------
+def hedge_delay(latencies: LatencyTracker) -> Optional[float]:
+    """When to fire the duplicate, or None (disabled / not enough data)."""
+
+    if not LLM_HEDGE_ENABLED or len(latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return max(latencies.percentile(LLM_HEDGE_PERCENTILE), LLM_HEDGE_MIN_DELAY_SECONDS)
+
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: Optional[float], name: str = "llm.hedge") -> Any:
+    """
+    Run call(); if it has not answered after `delay` seconds, run a second
+    copy and return whichever answers first (the other is cancelled).
+    A copy that fails does not end the race while the other is running.
+    """
+
+    primary = asyncio.ensure_future(call())
+    tasks = {primary}
+    backup = None
+
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                inc(f"{name}.fired")
+                backup = asyncio.ensure_future(call())
+                tasks.add(backup)
+
+        error: Optional[BaseException] = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is backup:
+                        inc(f"{name}.won")
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def within_deadline(awaitable: Awaitable[Any], seconds: float) -> Any:
+    """asyncio.wait_for that reports a blown deadline as DeadlineExceeded."""
+
+    try:
+        return await asyncio.wait_for(awaitable, seconds)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        inc("llm.deadline_exceeded")
+        raise DeadlineExceeded(f"LLM call exceeded its {seconds:g}s deadline") from None
+
+
+# -----------------------------
+# SHARED STATE
+# -----------------------------
+LLM_BREAKER = CircuitBreaker()
+LLM_LATENCIES = LatencyTracker()
+
+
+def deadline() -> float:
+    """Absolute (time.monotonic) deadline for a call starting now."""
+    return time.monotonic() + LLM_DEADLINE_SECONDS
+
+
+def resilience_stats() -> Dict[str, Any]:
+    metrics = snapshot()
+    fired = metrics.get("llm.hedge.fired", 0)
+    won = metrics.get("llm.hedge.won", 0)
+    p95 = LLM_LATENCIES.percentile(95)
+
+    return {
+        "breaker_state": LLM_BREAKER.state,
+        "breaker_failures": LLM_BREAKER.failures,
+        "deadline_seconds": LLM_DEADLINE_SECONDS,
+        "latency_p95_seconds": round(p95, 4) if p95 is not None else None,
+        "hedge_delay_seconds": hedge_delay(LLM_LATENCIES),
+        "hedges_fired": fired,
+        "hedges_won": won,
+        "hedge_win_rate": round(won / fired, 4) if fired else None,
+    }
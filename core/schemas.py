@@ -7,6 +7,7 @@ class AgentResponse(BaseModel):
     data: Optional[Dict[str, Any]]
     errors: Optional[List[str]]
     metadata: Dict[str, Any]
+    reused: bool = False         # data is a stored prior result (see metadata.reused_from)
 
 class FinanceModelScaffold(BaseModel):
     thesis: str
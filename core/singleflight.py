@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from core.metrics import inc
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls (threads).
+
+    The first caller for a key runs fn; callers arriving while it is in
+    flight wait and share its result or exception. Nothing is kept once
+    the call finishes, so this is not a cache.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            inc(f"{self.name}.coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    asyncio version of SingleFlight.
+
+    The shared call runs as its own task and every caller awaits it through
+    asyncio.shield, so one caller being cancelled (e.g. a failed pipeline)
+    does not cancel the call for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        tasks = self._tasks.setdefault(loop, {})
+        task = tasks.get(key)
+
+        if task is None:
+            task = tasks[key] = loop.create_task(fn())
+
+            def forget(done: asyncio.Task):
+                if tasks.get(key) is done:
+                    del tasks[key]
+                if not done.cancelled():
+                    done.exception()  # mark retrieved when every caller went away
+
+            task.add_done_callback(forget)
+        else:
+            inc(f"{self.name}.coalesced")
+
+        return await asyncio.shield(task)
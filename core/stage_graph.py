@@ -0,0 +1,113 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+StageFn = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# on_event(stage, "started" | "done" | "failed", elapsed_seconds or None)
+StageEventFn = Callable[[str, str, Optional[float]], None]
+
+
+class Stage:
+    """
+    One node of a stage graph.
+
+    - fn: async callable receiving the results of completed stages
+    - deps: names of stages that must finish first
+    - required: if it fails, the whole graph fails (and is cancelled);
+      an optional stage that fails just yields None
+    """
+
+    def __init__(self, name: str, fn: StageFn, deps: Iterable[str] = (), required: bool = True):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.required = required
+
+
+class StageFailed(Exception):
+    """A required stage raised; carries the timings gathered so far."""
+
+    def __init__(self, stage: str, error: Exception, timings: Dict[str, float]):
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+        self.timings = timings
+
+
+async def _timed(stage: Stage, results: Dict[str, Any]) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    try:
+        return await stage.fn(results), time.perf_counter() - start
+    except Exception as e:
+        e.stage_elapsed = time.perf_counter() - start
+        raise
+
+
+async def run_stage_graph(
+    stages: List[Stage],
+    on_event: Optional[StageEventFn] = None
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run stages as soon as their dependencies are done, independent
+    stages concurrently.
+
+    Returns (results by stage name, seconds by stage name).
+    The first required stage to fail cancels everything still running
+    and raises StageFailed. on_event, if given, is told when each stage
+    starts and finishes (used for progress streaming).
+    """
+
+    def notify(name: str, status: str, elapsed: Optional[float] = None):
+        if on_event is not None:
+            on_event(name, status, elapsed)
+
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in names]
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {unknown}")
+
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    pending = {stage.name: stage for stage in stages}
+    running: Dict[asyncio.Task, Stage] = {}
+
+    try:
+        while pending or running:
+            # ---- Launch every stage whose dependencies are satisfied
+            for name, stage in list(pending.items()):
+                if all(dep in results for dep in stage.deps):
+                    del pending[name]
+                    running[asyncio.create_task(_timed(stage, results))] = stage
+                    notify(name, "started")
+
+            if not running:
+                raise ValueError(f"Stage graph has a dependency cycle: {sorted(pending)}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                stage = running.pop(task)
+                error: Optional[Exception] = task.exception()
+
+                if error is None:
+                    results[stage.name], elapsed = task.result()
+                    timings[stage.name] = round(elapsed, 4)
+                    notify(stage.name, "done", timings[stage.name])
+                    continue
+
+                timings[stage.name] = round(getattr(error, "stage_elapsed", 0.0), 4)
+                notify(stage.name, "failed", timings[stage.name])
+                if stage.required:
+                    raise StageFailed(stage.name, error, timings)
+                results[stage.name] = None
+
+    finally:
+        # Fail fast: nothing outlives the graph
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    return results, timings
@@ -0,0 +1,57 @@
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import List, Sequence
+
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens (shared by the embedder and keyword search)."""
+    return _WORD_PATTERN.findall((text or "").lower())
+
+
+@lru_cache(maxsize=65536)
+def _feature(feature: str, dim: int):
+    # Stable across processes, unlike hash()
+    digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    return digest % dim, 1.0 if (digest >> 63) else -1.0
+
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder (no model, no network).
+
+    - features: words + word bigrams, hashed into `dim` signed buckets
+    - weights: 1 + log(tf); rows are L2-normalized, so dot product = cosine
+    Lexical rather than semantic similarity, but stable run to run, which
+    keeps retrieval testable offline. Anything with the same
+    name / dim / embed() signature can replace it.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-v1-{dim}"
+
+    def _features(self, text: str) -> Counter:
+        words = tokenize(text)
+        return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for feature, tf in self._features(text).items():
+                index, sign = _feature(feature, self.dim)
+                vectors[row, index] += sign * (1.0 + math.log(tf))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def embed_one(self, text: str) -> np.ndarray:
+        return self.embed([text])[0]
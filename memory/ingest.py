@@ -0,0 +1,535 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import resource
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from core.logging import logger
+from core.metrics import inc
+from core.paths import resolve_under
+from core.prompt_builder import count_tokens
+from memory.keyword_index import get_keyword_index
+from memory.retriever import index_chunks
+from memory.vector_index import VECTOR_EXACT_THRESHOLD, get_vector_store
+
+load_dotenv()
+
+INGEST_STATE_PATH = os.getenv("INGEST_STATE_PATH", "memory/ingest_state.db")
+INGEST_CHUNK_TOKENS = int(os.getenv("INGEST_CHUNK_TOKENS", "300"))
+INGEST_BATCH_CHUNKS = int(os.getenv("INGEST_BATCH_CHUNKS", "256"))
+
+# Rebuild the IVF index after a run once this share of rows is unindexed
+INGEST_REINDEX_FRACTION = float(os.getenv("INGEST_REINDEX_FRACTION", "0.2"))
+
+# Directory that paths sent to POST /memory/ingest are confined to
+INGEST_ROOT = os.getenv("INGEST_ROOT", "data/filings")
+
+TEXT_EXTENSIONS = {".txt", ".md", ".text"}
+CSV_EXTENSIONS = {".csv", ".tsv"}
+JSONL_EXTENSIONS = {".jsonl", ".ndjson"}
+
+# Longest line read at once (longer lines are split), keeps memory flat
+MAX_LINE_BYTES = 1 << 20
+
+CSV_ROWS_PER_UNIT = 20
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+
+
+class Unit:
+    """A piece of a source (paragraph, CSV rows, JSONL record) and where it ends."""
+
+    def __init__(self, text: str, start: int, end: int):
+        self.text = text
+        self.start = start
+        self.end = end
+
+
+class Chunk:
+    """
+    Indexable text. `resume` is the byte offset to restart the source
+    from once this chunk (and everything before it) is indexed; a `done`
+    chunk carries no text and marks the end of its source.
+    """
+
+    def __init__(self, source: str, text: str, start: int, resume: int, done: bool = False):
+        self.source = source
+        self.text = text
+        self.start = start
+        self.resume = resume
+        self.done = done
+        self.duplicate = False
+        normalized = " ".join(text.split())
+        self.digest = hashlib.sha256(normalized.encode("utf-8")).digest()
+
+
+# -----------------------------
+# CHECKPOINT STATE (SQLite)
+# -----------------------------
+class IngestState:
+    """
+    Resume + dedup state, committed once per indexed batch.
+
+    - chunk_hashes: sha256 of every indexed chunk (dedup across runs)
+    - sources: per file size / mtime / resume offset / done
+    - marks: vector store + keyword index sizes at the last commit, used
+      to recover a batch that was indexed but not yet checkpointed
+    """
+
+    def __init__(self, path: str = INGEST_STATE_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_hashes (hash BLOB PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sources (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                offset INTEGER NOT NULL,
+                done INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS marks (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        self._conn.commit()
+
+    def reset(self):
+        self._conn.executescript("DELETE FROM chunk_hashes; DELETE FROM sources; DELETE FROM marks;")
+        self._conn.commit()
+
+    def mark(self, name: str) -> int:
+        row = self._conn.execute("SELECT value FROM marks WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def seen(self, digest: bytes) -> bool:
+        return self._conn.execute("SELECT 1 FROM chunk_hashes WHERE hash = ?", (digest,)).fetchone() is not None
+
+    def source(self, path: str) -> Optional[Tuple[int, float, int, int]]:
+        return self._conn.execute(
+            "SELECT size, mtime, offset, done FROM sources WHERE path = ?", (path,)
+        ).fetchone()
+
+    def commit(
+        self,
+        digests: Iterable[bytes],
+        sources: Dict[str, Tuple[int, float, int, int]],
+        marks: Dict[str, int]
+    ):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunk_hashes (hash) VALUES (?)", ((d,) for d in digests)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sources (path, size, mtime, offset, done) VALUES (?, ?, ?, ?, ?)",
+                ((path,) + values for path, values in sources.items())
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO marks (name, value) VALUES (?, ?)", marks.items()
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+def _index_marks() -> Dict[str, int]:
+    return {
+        "chunks_bytes": get_vector_store().meta["chunks_bytes"],
+        "keyword_docs": len(get_keyword_index()),
+    }
+
+
+def _recover(state: IngestState) -> int:
+    """
+    Reconcile state with the indexes after a crash; returns recovered chunks.
+
+    Chunks appended to the vector store after the last checkpoint are
+    marked as seen (and added to the keyword index if the crash came
+    before that); a store that shrank (deleted / rebuilt) resets the state.
+    """
+
+    store = get_vector_store()
+    saved = state.mark("chunks_bytes")
+    actual = store.meta["chunks_bytes"]
+
+    if actual < saved:
+        logger.warning("[INGEST] Vector store is smaller than at the last checkpoint; resetting ingest state")
+        state.reset()
+        saved = 0
+        if actual == 0:
+            return 0
+
+    if actual == saved:
+        return 0
+
+    keys, texts, digests = [], [], []
+    for key, record in store.iter_chunks(saved):
+        keys.append(key)
+        texts.append(record["text"])
+        digests.append(hashlib.sha256(" ".join(record["text"].split()).encode("utf-8")).digest())
+
+    keywords = get_keyword_index()
+    if len(keywords) == state.mark("keyword_docs"):
+        keywords.add(keys, texts)
+
+    state.commit(digests, {}, _index_marks())
+    logger.info(f"[INGEST] Recovered {len(keys)} chunks indexed after the last checkpoint")
+    return len(keys)
+
+
+# -----------------------------
+# STAGE 1: SOURCES
+# -----------------------------
+def _iter_sources(paths: Iterable[str], root: Optional[str] = None) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for walk_root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    source = os.path.abspath(os.path.join(walk_root, name))
+                    if root is not None:
+                        resolve_under(root, source)  # a symlink must not lead out of root
+                    yield source
+        elif os.path.exists(path):
+            yield os.path.abspath(path)
+        else:
+            raise FileNotFoundError(f"Ingest path not found: {path}")
+
+
+def _kind(path: str) -> Optional[str]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+    if extension in CSV_EXTENSIONS:
+        return "csv"
+    if extension in JSONL_EXTENSIONS:
+        return "jsonl"
+    return None
+
+
+# -----------------------------
+# STAGE 2: UNITS (streamed from disk)
+# -----------------------------
+def _iter_lines(f, offset: int) -> Iterator[Tuple[bytes, int, int]]:
+    """(line, start, end) from byte `offset`, at most MAX_LINE_BYTES at a time."""
+
+    f.seek(offset)
+    while True:
+        start = f.tell()
+        line = f.readline(MAX_LINE_BYTES)
+        if not line:
+            return
+        yield line, start, f.tell()
+
+
+def _text_units(f, offset: int) -> Iterator[Unit]:
+    """Paragraphs (blank-line separated)."""
+
+    lines: List[str] = []
+    start = offset
+    size = 0
+
+    for line, line_start, line_end in _iter_lines(f, offset):
+        text = line.decode("utf-8", errors="replace").strip()
+        if text:
+            if not lines:
+                start = line_start
+            lines.append(text)
+            size += len(line)
+        if lines and (not text or size >= MAX_LINE_BYTES):
+            yield Unit("\n".join(lines), start, line_end)
+            lines, size = [], 0
+
+    if lines:
+        yield Unit("\n".join(lines), start, f.tell())
+
+
+def _csv_units(f, offset: int, delimiter: str) -> Iterator[Unit]:
+    """Groups of CSV_ROWS_PER_UNIT rows rendered as `column: value` lines."""
+
+    f.seek(0)
+    header_line = f.readline(MAX_LINE_BYTES)
+    header = next(csv.reader([header_line.decode("utf-8", errors="replace")], delimiter=delimiter), [])
+    rows: List[str] = []
+    start = max(offset, len(header_line))
+
+    for line, line_start, line_end in _iter_lines(f, max(offset, len(header_line))):
+        values = next(csv.reader([line.decode("utf-8", errors="replace")], delimiter=delimiter), [])
+        if not any(value.strip() for value in values):
+            continue
+        if not rows:
+            start = line_start
+        rows.append(" | ".join(f"{name}: {value}" for name, value in zip(header, values) if value.strip()))
+        if len(rows) >= CSV_ROWS_PER_UNIT:
+            yield Unit("\n".join(rows), start, line_end)
+            rows = []
+
+    if rows:
+        yield Unit("\n".join(rows), start, f.tell())
+
+
+def _jsonl_units(f, offset: int) -> Iterator[Unit]:
+    """One unit per record with a `text` (or `content`) field."""
+
+    for line, start, end in _iter_lines(f, offset):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            inc("ingest.bad_record")
+            continue
+        text = record.get("text") or record.get("content") if isinstance(record, dict) else None
+        if text:
+            title = record.get("title")
+            yield Unit(f"{title}\n{text}" if title else str(text), start, end)
+
+
+def _iter_units(f, kind: str, offset: int, path: str) -> Iterator[Unit]:
+    if kind == "csv":
+        return _csv_units(f, offset, "\t" if path.lower().endswith(".tsv") else ",")
+    if kind == "jsonl":
+        return _jsonl_units(f, offset)
+    return _text_units(f, offset)
+
+
+# -----------------------------
+# STAGE 3: CHUNKING
+# -----------------------------
+def _split_long(text: str, max_tokens: int) -> Iterator[str]:
+    """Sentence-packed pieces of a unit larger than max_tokens (words as a last resort)."""
+
+    piece: List[str] = []
+    tokens = 0
+    for sentence in _SENTENCE_END.split(text):
+        words = [sentence] if count_tokens(sentence) <= max_tokens else sentence.split()
+        for part in words:
+            cost = count_tokens(part)
+            if piece and tokens + cost > max_tokens:
+                yield " ".join(piece)
+                piece, tokens = [], 0
+            piece.append(part)
+            tokens += cost
+    if piece:
+        yield " ".join(piece)
+
+
+def _chunks(units: Iterable[Unit], source: str, max_tokens: int) -> Iterator[Chunk]:
+    """Pack consecutive units into chunks of up to max_tokens."""
+
+    parts: List[str] = []
+    tokens = 0
+    start = 0
+    resume = 0
+
+    for unit in units:
+        cost = count_tokens(unit.text)
+
+        if parts and tokens + cost > max_tokens:
+            yield Chunk(source, "\n\n".join(parts), start, resume)
+            parts, tokens = [], 0
+
+        if cost > max_tokens:
+            # Restarting mid-unit re-reads the whole unit; dedup drops the repeats
+            for piece in _split_long(unit.text, max_tokens):
+                yield Chunk(source, piece, unit.start, unit.start)
+            resume = unit.end
+            continue
+
+        if not parts:
+            start = unit.start
+        parts.append(unit.text)
+        tokens += cost
+        resume = unit.end
+
+    if parts:
+        yield Chunk(source, "\n\n".join(parts), start, resume)
+
+
+# -----------------------------
+# STAGE 4: DEDUP + BATCHING
+# -----------------------------
+def _batches(chunks: Iterable[Chunk], state: IngestState, batch_size: int, report: Dict[str, Any]) -> Iterator[List[Chunk]]:
+    batch: List[Chunk] = []
+    pending = set()
+
+    for chunk in chunks:
+        if not chunk.done:
+            report["chunks"] += 1
+            if chunk.digest in pending or state.seen(chunk.digest):
+                chunk.duplicate = True  # not indexed, but still advances the checkpoint
+                report["duplicates"] += 1
+                inc("ingest.duplicate")
+            else:
+                pending.add(chunk.digest)
+        batch.append(chunk)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch, pending = [], set()
+
+    if batch:
+        yield batch
+
+
+def _documents(
+    paths: Iterable[str],
+    state: IngestState,
+    report: Dict[str, Any],
+    max_tokens: int,
+    root: Optional[str] = None
+) -> Iterator[Chunk]:
+    """Chunks of every supported, not yet ingested source, resuming where each stopped."""
+
+    for path in _iter_sources(paths, root):
+        kind = _kind(path)
+        if kind is None:
+            report["unsupported"] += 1
+            continue
+
+        stat = os.stat(path)
+        saved = state.source(path)
+        offset = 0
+        if saved is not None and saved[0] == stat.st_size and saved[1] == stat.st_mtime:
+            if saved[3]:
+                report["skipped"] += 1
+                continue
+            offset = saved[2]
+            report["resumed"] += 1
+
+        with open(path, "rb") as f:
+            yield from _chunks(_iter_units(f, kind, offset, path), path, max_tokens)
+
+        report["documents"] += 1
+        report["bytes"] += stat.st_size - offset
+        yield Chunk(path, "", stat.st_size, stat.st_size, done=True)
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+def run_ingestion(
+    paths: List[str],
+    batch_size: int = INGEST_BATCH_CHUNKS,
+    chunk_tokens: int = INGEST_CHUNK_TOKENS,
+    reset: bool = False,
+    reindex: bool = True,
+    state_path: str = INGEST_STATE_PATH,
+    root: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Stream files into memory (vector store + keyword index).
+
+    - paths: files or directories (.txt / .md, .csv / .tsv, .jsonl / .ndjson)
+    - stages are generators: sources -> units -> chunks -> dedup/batches
+      -> embed + append, so memory depends on batch_size, not file size
+    - chunks are deduplicated by content hash (across runs)
+    - progress is checkpointed after every batch; re-running the same
+      command after a crash resumes each file where it stopped
+    - reset: forget checkpoints and hashes (indexes are left as they are)
+    - root: when set, paths are resolved under it and anything outside
+      (including via symlinks) is rejected with ValueError
+    Returns a throughput report.
+    """
+
+    if batch_size < 1 or chunk_tokens < 1:
+        raise ValueError("batch_size and chunk_tokens must be positive")
+    if root is not None:
+        paths = [resolve_under(root, path) for path in paths]
+
+    start_time = time.time()
+    state = IngestState(state_path)
+    if reset:
+        state.reset()
+
+    report: Dict[str, Any] = {
+        "documents": 0, "skipped": 0, "resumed": 0, "unsupported": 0,
+        "chunks": 0, "indexed": 0, "duplicates": 0, "bytes": 0, "batches": 0,
+    }
+
+    try:
+        report["recovered"] = _recover(state)
+        chunks = _documents(paths, state, report, chunk_tokens, root)
+
+        for batch in _batches(chunks, state, batch_size, report):
+            fresh = [chunk for chunk in batch if not chunk.done and not chunk.duplicate]
+
+            if fresh:
+                index_chunks(
+                    [chunk.text for chunk in fresh],
+                    ids=[chunk.digest.hex() for chunk in fresh],
+                    metadata=[{"source": chunk.source, "offset": chunk.start} for chunk in fresh]
+                )
+
+            # Checkpoint: last resume point (or done) of every source in the batch
+            last = {chunk.source: chunk for chunk in batch}
+            sources: Dict[str, Tuple[int, float, int, int]] = {}
+            for path, chunk in last.items():
+                stat = os.stat(path)
+                sources[path] = (stat.st_size, stat.st_mtime, chunk.resume, int(chunk.done))
+            state.commit((chunk.digest for chunk in fresh), sources, _index_marks())
+
+            report["indexed"] += len(fresh)
+            report["batches"] += 1
+            inc("ingest.batch")
+
+    finally:
+        state.close()
+
+    # -----------------------------
+    # IVF INDEX REFRESH
+    # -----------------------------
+    store = get_vector_store()
+    stats = store.stats()
+    unindexed = stats["rows"] - stats["indexed_rows"]
+    report["reindexed"] = False
+    if reindex and stats["rows"] >= VECTOR_EXACT_THRESHOLD and unindexed > INGEST_REINDEX_FRACTION * stats["rows"]:
+        store.build_index()
+        report["reindexed"] = True
+
+    # -----------------------------
+    # THROUGHPUT REPORT
+    # -----------------------------
+    elapsed = time.time() - start_time
+    report.update({
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_second": round(report["documents"] / elapsed, 2) if elapsed > 0 else None,
+        "chunks_per_second": round(report["indexed"] / elapsed, 1) if elapsed > 0 else None,
+        "mb_per_second": round(report["bytes"] / 1e6 / elapsed, 2) if elapsed > 0 else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "vector_rows": len(store),
+    })
+
+    logger.info(
+        f"[INGEST] Done | documents={report['documents']} | chunks={report['indexed']} | "
+        f"duplicates={report['duplicates']} | latency={report['elapsed_seconds']}s | "
+        f"chunks_per_second={report['chunks_per_second']}"
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Ingest documents into memory (vector + keyword index)")
+    parser.add_argument("paths", nargs="+", help="files or directories (.txt/.md, .csv/.tsv, .jsonl/.ndjson)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_CHUNKS)
+    parser.add_argument("--chunk-tokens", type=int, default=INGEST_CHUNK_TOKENS)
+    parser.add_argument("--reset", action="store_true", help="forget checkpoints and content hashes")
+    parser.add_argument("--no-reindex", action="store_true", help="skip the IVF index refresh")
+    parser.add_argument("--state", default=INGEST_STATE_PATH)
+    args = parser.parse_args(argv)
+
+    report = run_ingestion(
+        args.paths, args.batch_size, args.chunk_tokens, args.reset, not args.no_reindex, args.state
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
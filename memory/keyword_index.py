@@ -0,0 +1,692 @@
+import argparse
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.file_lock import FileLock, file_signature, pid_alive
+from core.logging import logger
+from core.metrics import inc
+
+load_dotenv()
+
+KEYWORD_INDEX_PATH = os.getenv("KEYWORD_INDEX_PATH", "memory/keyword_index")
+
+# BM25 parameters
+KEYWORD_BM25_K1 = float(os.getenv("KEYWORD_BM25_K1", "1.2"))
+KEYWORD_BM25_B = float(os.getenv("KEYWORD_BM25_B", "0.75"))
+
+# Tiered merging: this many segments of the same size tier are merged into one
+KEYWORD_MERGE_FACTOR = int(os.getenv("KEYWORD_MERGE_FACTOR", "8"))
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+SEGMENT_SUFFIX = ".seg"
+
+# seg_<number>_<writer pid>.seg: a segment still being written by a live process is never cleaned up
+_SEGMENT_PID = re.compile(r"^seg_\d+_(\d+)\.seg")
+
+# Keeps tickers / filings / figures whole: "10-k", "fy2024", "s&p", "3.5", "brk.b"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.&'/][a-z0-9]+)*")
+
+
+def keyword_tokens(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall((text or "").lower())
+
+
+# -----------------------------
+# POSTINGS COMPRESSION
+# -----------------------------
+# Postings of a term: (doc gap, term frequency) pairs, each number a
+# LEB128 varint (7 bits per byte, high bit = more bytes follow).
+# Both directions are vectorized with numpy.
+def _varint_sizes(values: np.ndarray) -> np.ndarray:
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= np.uint64(1 << shift)
+    return sizes
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b""
+
+    sizes = _varint_sizes(values)
+    owner = np.repeat(np.arange(len(values)), sizes)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    position = np.arange(len(owner)) - np.repeat(starts, sizes)
+
+    out = ((values[owner] >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)).astype(np.uint8)
+    out[position < sizes[owner] - 1] |= 0x80
+    return out.tobytes()
+
+
+def decode_varints(data) -> np.ndarray:
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if len(raw) == 0:
+        return np.zeros(0, dtype=np.uint64)
+
+    ends = np.flatnonzero(raw < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(raw)) - np.repeat(starts, ends - starts + 1)
+    parts = (raw & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, starts)
+
+
+def encode_postings(docs: np.ndarray, tfs: np.ndarray) -> bytes:
+    gaps = np.diff(np.asarray(docs, dtype=np.int64), prepend=0)
+    return encode_varints(np.column_stack((gaps, tfs)).ravel())
+
+
+def decode_postings(data) -> Tuple[np.ndarray, np.ndarray]:
+    pairs = decode_varints(data).astype(np.int64).reshape(-1, 2)
+    return np.cumsum(pairs[:, 0]), pairs[:, 1]
+
+
+# -----------------------------
+# SEGMENTS
+# -----------------------------
+# One immutable file per segment:
+#   [u64 header length][JSON header, padded][keys u64][lengths u32][postings][term info u64 x3][terms]
+# keys: the caller's document key per local doc number (chunk keys of the
+# vector store); term info: (postings offset, postings bytes, df) per term;
+# terms: the sorted vocabulary, newline-separated. Sections start 8-byte
+# aligned so the numeric ones can be viewed in place.
+HEADER_BYTES = 1024
+
+# Postings decoded at once while merging (bounds merge memory)
+MERGE_BATCH_POSTINGS = 4_000_000
+
+
+def _encode_terms(term_ids: np.ndarray, docs: np.ndarray, tfs: np.ndarray, n_terms: int) -> Tuple[bytes, np.ndarray]:
+    """
+    Postings of many terms in one pass; input sorted by (term, doc).
+    Returns (postings bytes, term info rows relative to the start of those bytes).
+    """
+
+    df = np.bincount(term_ids, minlength=n_terms)
+    gaps = np.diff(docs, prepend=0)
+    firsts = np.concatenate(([0], np.cumsum(df)[:-1]))[df > 0]
+    gaps[firsts] = docs[firsts]  # each term's list starts from doc 0
+
+    values = np.column_stack((gaps, tfs)).ravel()
+    blob = encode_varints(values)
+
+    sizes = _varint_sizes(values.astype(np.uint64)).reshape(-1, 2).sum(axis=1)
+    term_bytes = np.bincount(term_ids, weights=sizes, minlength=n_terms).astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(term_bytes)[:-1]))
+    return blob, np.column_stack((offsets, term_bytes, df)).astype(np.uint64)
+
+
+def _write_segment(
+    path: str,
+    keys: np.ndarray,
+    lengths: np.ndarray,
+    terms: List[str],
+    postings: Iterator[Tuple[bytes, np.ndarray]]
+):
+    """postings: (bytes, term info) batches covering `terms` in order."""
+
+    tmp = path + ".tmp"
+    sections: Dict[str, List[int]] = {}
+
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * (8 + HEADER_BYTES))
+
+        def section(name: str, data: bytes):
+            sections[name] = [f.tell() - 8 - HEADER_BYTES, len(data)]
+            f.write(data + b"\0" * (-len(data) % 8))
+
+        section("keys", np.asarray(keys, dtype=np.uint64).tobytes())
+        section("lengths", np.asarray(lengths, dtype=np.uint32).tobytes())
+
+        # Postings are streamed; their term info is rebased as they are written
+        start = f.tell()
+        infos = []
+        for blob, info in postings:
+            info = info.copy()
+            info[:, 0] += np.uint64(f.tell() - start)
+            infos.append(info)
+            f.write(blob)
+        sections["postings"] = [start - 8 - HEADER_BYTES, f.tell() - start]
+        f.write(b"\0" * (-(f.tell() - start) % 8))
+
+        info = np.concatenate(infos) if infos else np.zeros((0, 3), dtype=np.uint64)
+        section("info", info.tobytes())
+        section("terms", "\n".join(terms).encode("utf-8"))
+
+        header = json.dumps({
+            "version": FORMAT_VERSION,
+            "docs": len(keys),
+            "terms": len(terms),
+            "total_length": int(np.sum(lengths, dtype=np.int64)),
+            "sections": sections,
+        }).encode("utf-8")
+        if len(header) > HEADER_BYTES:
+            raise ValueError("Segment header too large")
+        f.seek(0)
+        f.write(struct.pack("<Q", HEADER_BYTES) + header)
+
+    os.replace(tmp, path)
+
+
+class Segment:
+    """Read-only view of one segment file (memory-mapped; only the vocabulary is loaded)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        self._data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        (header_length,) = struct.unpack("<Q", self._data[:8].tobytes())
+        header = json.loads(self._data[8:8 + header_length].tobytes().rstrip(b"\0"))
+        base = 8 + header_length
+
+        def section(name: str):
+            start, length = header["sections"][name]
+            return self._data[base + start:base + start + length]
+
+        self.docs = header["docs"]
+        self.total_length = header["total_length"]
+        self.keys = section("keys").view(np.uint64)
+        self.lengths = section("lengths").view(np.uint32)
+        self.info = section("info").view(np.uint64).reshape(-1, 3)
+        terms = section("terms").tobytes().decode("utf-8")
+        self.terms = terms.split("\n") if terms else []
+        self._postings = section("postings")
+
+    def _find(self, term: str) -> int:
+        i = bisect.bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else -1
+
+    def df(self, term: str) -> int:
+        i = self._find(term)
+        return int(self.info[i, 2]) if i >= 0 else 0
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        i = self._find(term)
+        if i < 0:
+            return None
+        offset, length, _ = self.info[i]
+        return decode_postings(self._postings[int(offset):int(offset + length)])
+
+    def term_range(self, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(local term index, doc, tf) of every posting of terms lo..hi-1."""
+
+        if lo >= hi:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+
+        start = int(self.info[lo, 0])
+        end = int(self.info[hi - 1, 0] + self.info[hi - 1, 1])
+        pairs = decode_varints(self._postings[start:end]).astype(np.int64).reshape(-1, 2)
+
+        df = self.info[lo:hi, 2].astype(np.int64)
+        gaps = pairs[:, 0]
+        totals = np.cumsum(gaps)
+        firsts = np.concatenate(([0], np.cumsum(df)[:-1]))
+        docs = totals - np.repeat(totals[firsts] - gaps[firsts], df)
+        return np.repeat(np.arange(lo, hi), df), docs, pairs[:, 1]
+
+
+def _build_segment(path: str, keys: Sequence[int], token_lists: Sequence[List[str]]):
+    counts = [Counter(tokens) for tokens in token_lists]
+    terms = sorted(set().union(*counts))
+    term_id = {term: i for i, term in enumerate(terms)}
+
+    term_ids = np.fromiter((term_id[term] for c in counts for term in c), dtype=np.int64)
+    docs = np.repeat(np.arange(len(counts)), [len(c) for c in counts])
+    tfs = np.fromiter((tf for c in counts for tf in c.values()), dtype=np.int64)
+
+    order = np.lexsort((docs, term_ids))
+    postings = _encode_terms(term_ids[order], docs[order], tfs[order], len(terms))
+    lengths = [len(tokens) for tokens in token_lists]
+    _write_segment(path, np.asarray(keys, dtype=np.uint64), np.asarray(lengths), terms, iter([postings]))
+
+
+def _merge_segments(path: str, segments: List[Segment]):
+    """
+    One segment with every doc of `segments`, in order (doc numbers are
+    shifted by the docs before them). The vocabulary is processed in
+    ranges of about MERGE_BATCH_POSTINGS postings, so memory stays bounded.
+    """
+
+    bases = np.cumsum([0] + [segment.docs for segment in segments[:-1]])
+    terms = list(dict.fromkeys(heapq.merge(*(segment.terms for segment in segments))))
+    term_id = {term: i for i, term in enumerate(terms)}
+    local_to_merged = [
+        np.fromiter((term_id[term] for term in segment.terms), dtype=np.int64, count=len(segment.terms))
+        for segment in segments
+    ]
+
+    total_postings = sum(int(segment.info[:, 2].sum()) for segment in segments)
+    batches = max(1, math.ceil(total_postings / MERGE_BATCH_POSTINGS))
+    step = max(1, math.ceil(len(terms) / batches))
+
+    def batches_of_postings():
+        for lo in range(0, len(terms), step):
+            hi = min(lo + step, len(terms))
+            parts = []
+            for n, segment in enumerate(segments):
+                local_lo = bisect.bisect_left(segment.terms, terms[lo])
+                local_hi = bisect.bisect_left(segment.terms, terms[hi]) if hi < len(terms) else len(segment.terms)
+                local, docs, tfs = segment.term_range(local_lo, local_hi)
+                parts.append((local_to_merged[n][local] - lo, docs + bases[n], tfs))
+
+            term_ids, docs, tfs = (np.concatenate(column) for column in zip(*parts))
+            order = np.lexsort((docs, term_ids))
+            yield _encode_terms(term_ids[order], docs[order], tfs[order], hi - lo)
+
+    _write_segment(
+        path,
+        np.concatenate([segment.keys for segment in segments]),
+        np.concatenate([segment.lengths for segment in segments]),
+        terms,
+        batches_of_postings()
+    )
+
+
+# -----------------------------
+# INDEX
+# -----------------------------
+class KeywordIndex:
+    """
+    BM25 inverted index made of immutable on-disk segments.
+
+    - add() writes each batch as a new segment (durable once it returns)
+    - segments in the same size tier are merged in a background thread
+      (KEYWORD_MERGE_FACTOR at a time), so writers never wait on a merge
+    - manifest.json lists the live segments and is swapped atomically;
+      searches read a snapshot of the segment list and never block
+    - several processes may share an index (e.g. CLI ingest while the
+      API runs): manifest changes are made under an exclusive file lock
+      (.lock) against the manifest on disk, and readers reload it when
+      it changes
+    Document keys are opaque integers chosen by the caller.
+    """
+
+    def __init__(self, path: str = KEYWORD_INDEX_PATH, merge_factor: int = KEYWORD_MERGE_FACTOR):
+        self.path = path
+        self.merge_factor = max(2, merge_factor)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(os.path.join(path, LOCK_FILE))
+        self._merge_thread: Optional[threading.Thread] = None
+        self._manifest_signature = None
+        self.manifest: Dict[str, Any] = {"version": FORMAT_VERSION, "next_segment": 1, "generation": 0, "segments": []}
+        self.segments: Tuple[Segment, ...] = ()
+
+        if os.path.isdir(path):
+            with self._file_lock.exclusive():
+                self._load()
+                self._remove_unlisted()
+
+    # -----------------------------
+    # MANIFEST
+    # -----------------------------
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        # Called with a file lock held
+        if not os.path.exists(self._manifest_path()):
+            return {"version": FORMAT_VERSION, "next_segment": 1, "generation": 0, "segments": []}
+        with open(self._manifest_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load(self):
+        # Called with a file lock held; segments already open are reused
+        self._manifest_signature = file_signature(self._manifest_path())
+        manifest = self._read_manifest()
+        # Segment numbers allocated here but not committed yet stay reserved
+        manifest["next_segment"] = max(manifest["next_segment"], self.manifest["next_segment"])
+        self.manifest = manifest
+        self.segments = self._open_segments(manifest["segments"])
+
+    def _open_segments(self, names: List[str]) -> Tuple["Segment", ...]:
+        opened = {segment.name: segment for segment in self.segments}
+        return tuple(opened.get(name) or Segment(os.path.join(self.path, name)) for name in names)
+
+    def _refresh(self):
+        """Pick up manifest.json written by another process (cheap stat when unchanged)."""
+
+        if file_signature(self._manifest_path()) == self._manifest_signature:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # a writer in this process is committing anyway
+        try:
+            with self._file_lock.shared():
+                self._load()
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def _remove(segments: List[Segment]):
+        for segment in segments:
+            try:
+                os.remove(segment.path)
+            except OSError:
+                pass  # still mapped (Windows): removed on next open
+
+    def _remove_unlisted(self):
+        """
+        Segments left behind by a crash or by a merge (Windows keeps mapped
+        files). Called with the exclusive file lock held; files of a live
+        writer process are in progress and kept.
+        """
+        live = set(self.manifest["segments"])
+        for name in os.listdir(self.path):
+            if not (name.endswith(SEGMENT_SUFFIX) or name.endswith(".tmp")) or name in live:
+                continue
+            if name == MANIFEST_FILE + ".tmp":
+                continue
+            owner = _SEGMENT_PID.match(name)
+            if owner and pid_alive(int(owner.group(1))):
+                continue
+            try:
+                os.remove(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def _new_segment_path(self) -> str:
+        # Called with the lock held; the pid keeps names unique across processes
+        number = self.manifest["next_segment"]
+        self.manifest["next_segment"] = number + 1
+        return os.path.join(self.path, f"seg_{number:08d}_{os.getpid()}{SEGMENT_SUFFIX}")
+
+    def _commit(self, update: Callable[[List[str]], Optional[List[str]]]) -> bool:
+        """
+        Apply `update` to the segment names of the manifest on disk (not
+        this process's copy, which may be stale) and write it back.
+        `update` returns None to abandon the change. Called with the lock held.
+        """
+
+        with self._file_lock.exclusive():
+            disk = self._read_manifest()
+            names = update(list(disk["segments"]))
+            if names is None:
+                self._load()
+                return False
+
+            manifest = dict(
+                disk,
+                segments=names,
+                next_segment=max(disk["next_segment"], self.manifest["next_segment"]),
+                generation=disk.get("generation", 0) + 1,
+            )
+            tmp = self._manifest_path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, self._manifest_path())
+
+            self._manifest_signature = file_signature(self._manifest_path())
+            self.segments = self._open_segments(names)
+            self.manifest = manifest
+        return True
+
+    # -----------------------------
+    # WRITE
+    # -----------------------------
+    def add(self, keys: Sequence[int], texts: Sequence[str]):
+        if len(keys) != len(texts):
+            raise ValueError("keys and texts must have the same length")
+        if not len(keys):
+            return
+
+        token_lists = [keyword_tokens(text) for text in texts]
+
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            path = self._new_segment_path()
+        _build_segment(path, keys, token_lists)
+
+        name = os.path.basename(path)
+        with self._lock:
+            self._commit(lambda names: names + [name])
+
+        inc("keyword.added")
+        self._maybe_merge()
+
+    def _tier(self, segment: Segment) -> int:
+        return int(math.log(max(segment.docs, 1), self.merge_factor))
+
+    def _merge_candidates(self) -> List[Segment]:
+        tiers: Dict[int, List[Segment]] = defaultdict(list)
+        for segment in self.segments:
+            tiers[self._tier(segment)].append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return []
+
+    def _merge_into(self, candidates: List[Segment], path: str) -> Optional[Segment]:
+        """
+        Commit a finished merge of `candidates`. Abandoned (file removed)
+        if another process already merged or dropped one of them.
+        """
+
+        names = [segment.name for segment in candidates]
+        merged = os.path.basename(path)
+
+        def update(current: List[str]) -> Optional[List[str]]:
+            if not set(names) <= set(current):
+                return None
+            return [merged] + [name for name in current if name not in names]
+
+        with self._lock:
+            committed = self._commit(update)
+        if not committed:
+            self._remove([Segment(path)])
+            inc("keyword.merge_abandoned")
+            return None
+
+        self._remove(candidates)
+        return next(segment for segment in self.segments if segment.name == merged)
+
+    def _maybe_merge(self):
+        with self._lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return  # the running merge re-checks when it is done
+            if not self._merge_candidates():
+                return
+            self._merge_thread = threading.Thread(target=self._merge_loop, name="keyword-merge", daemon=True)
+            self._merge_thread.start()
+
+    def _merge_loop(self):
+        while True:
+            self._refresh()
+            with self._lock:
+                candidates = self._merge_candidates()
+                if not candidates:
+                    return
+                path = self._new_segment_path()
+
+            start = time.perf_counter()
+            try:
+                _merge_segments(path, candidates)
+            except Exception as e:
+                logger.error(f"[KEYWORD] Merge failed | error={e}")
+                inc("keyword.merge_failed")
+                return
+
+            merged = self._merge_into(candidates, path)
+            if merged is None:
+                continue
+
+            inc("keyword.merged")
+            logger.info(
+                f"[KEYWORD] Merged {len(candidates)} segments | docs={merged.docs} "
+                f"seconds={time.perf_counter() - start:.2f}"
+            )
+
+    def wait_for_merges(self):
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
+
+    def optimize(self):
+        """Merge everything into one segment now (blocking)."""
+
+        self.wait_for_merges()
+        self._refresh()
+        with self._lock:
+            candidates = list(self.segments)
+            if len(candidates) < 2:
+                return
+            path = self._new_segment_path()
+        _merge_segments(path, candidates)
+        self._merge_into(candidates, path)
+
+    # -----------------------------
+    # READ
+    # -----------------------------
+    def __len__(self) -> int:
+        self._refresh()
+        return sum(segment.docs for segment in self.segments)
+
+    @property
+    def version(self) -> int:
+        """Changes whenever search results may change (manifest commits)."""
+        self._refresh()
+        return self.manifest.get("generation", 0)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """(document key, BM25 score) of the top_k documents, best first."""
+
+        self._refresh()
+        segments = self.segments
+        terms = list(dict.fromkeys(keyword_tokens(query)))
+        docs = sum(segment.docs for segment in segments)
+        if not terms or not docs or top_k <= 0:
+            return []
+
+        avg_length = sum(segment.total_length for segment in segments) / docs
+        idf = {}
+        for term in terms:
+            df = sum(segment.df(term) for segment in segments)
+            if df:
+                idf[term] = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+        found_scores: List[np.ndarray] = []
+        found_keys: List[np.ndarray] = []
+
+        for segment in segments:
+            matched_docs, matched_scores = [], []
+            for term, weight in idf.items():
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                term_docs, tfs = postings
+                norm = KEYWORD_BM25_K1 * (
+                    1 - KEYWORD_BM25_B + KEYWORD_BM25_B * segment.lengths[term_docs] / avg_length
+                )
+                matched_docs.append(term_docs)
+                matched_scores.append(weight * tfs * (KEYWORD_BM25_K1 + 1) / (tfs + norm))
+
+            if not matched_docs:
+                continue
+
+            hit_docs, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+            keep = np.argpartition(-scores, top_k - 1)[:top_k] if len(scores) > top_k else np.arange(len(scores))
+            found_scores.append(scores[keep])
+            found_keys.append(segment.keys[hit_docs[keep]])
+
+        inc("keyword.search")
+        if not found_scores:
+            return []
+
+        scores = np.concatenate(found_scores)
+        keys = np.concatenate(found_keys)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(int(keys[i]), float(scores[i])) for i in order]
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        segments = self.segments
+        return {
+            "path": self.path,
+            "docs": sum(segment.docs for segment in segments),
+            "segments": len(segments),
+            "terms_per_segment": [len(segment.terms) for segment in segments],
+            "bytes": sum(os.path.getsize(segment.path) for segment in segments),
+            "merging": self._merge_thread is not None and self._merge_thread.is_alive(),
+        }
+
+
+_INDEX: Optional[KeywordIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_keyword_index() -> KeywordIndex:
+    """Process-wide index, opened on first use."""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = KeywordIndex()
+        return _INDEX
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    from memory.vector_index import VECTOR_STORE_PATH, VectorStore
+
+    parser = argparse.ArgumentParser(description="BM25 keyword index")
+    parser.add_argument("--path", default=KEYWORD_INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats")
+    commands.add_parser("optimize", help="merge all segments into one")
+
+    rebuild = commands.add_parser("rebuild", help="re-index every chunk of the vector store")
+    rebuild.add_argument("--vector-store", default=VECTOR_STORE_PATH)
+    rebuild.add_argument("--batch", type=int, default=10000)
+
+    search = commands.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, default=5)
+
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        if os.path.exists(os.path.join(args.path, MANIFEST_FILE)):
+            os.remove(os.path.join(args.path, MANIFEST_FILE))
+        index = KeywordIndex(args.path)
+        keys, texts = [], []
+        for key, record in VectorStore(args.vector_store).iter_chunks():
+            keys.append(key)
+            texts.append(record["text"])
+            if len(keys) >= args.batch:
+                index.add(keys, texts)
+                keys, texts = [], []
+        index.add(keys, texts)
+        index.wait_for_merges()
+        print(json.dumps(index.stats(), indent=2))
+        return
+
+    index = KeywordIndex(args.path)
+    if args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+    elif args.command == "optimize":
+        index.optimize()
+        print(json.dumps(index.stats(), indent=2))
+    elif args.command == "search":
+        for key, score in index.search(args.query, args.top_k):
+            print(f"{score:.4f}  {key}")
+
+
+if __name__ == "__main__":
+    main()
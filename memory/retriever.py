@@ -1,9 +1,331 @@
-from typing import List
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.metrics import inc
+from memory.keyword_index import get_keyword_index
+from memory.vector_index import VECTOR_MIN_SCORE, get_vector_store
+
+load_dotenv()
+
+# Reciprocal-rank fusion constant (higher = flatter weighting of ranks)
+RETRIEVAL_RRF_K = int(os.getenv("RETRIEVAL_RRF_K", "60"))
+
+# Candidates taken from each index per requested result, before fusion
+RETRIEVAL_CANDIDATES_PER_RESULT = int(os.getenv("RETRIEVAL_CANDIDATES_PER_RESULT", "4"))
+
+# LRU of recent (normalized query, top_k) results; 0 disables
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "256"))
+
+# Background retrieval started when a request is accepted
+RETRIEVAL_PREFETCH_ENABLED = os.getenv("RETRIEVAL_PREFETCH_ENABLED", "true").lower() == "true"
+RETRIEVAL_PREFETCH_WORKERS = int(os.getenv("RETRIEVAL_PREFETCH_WORKERS", "4"))
+
+# Unclaimed prefetches are dropped after this long
+RETRIEVAL_PREFETCH_TTL_SECONDS = float(os.getenv("RETRIEVAL_PREFETCH_TTL_SECONDS", "60"))
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RETRIEVAL_RRF_K) -> List[Tuple[int, float]]:
+    """(key, fused score) best first; score = sum over rankings of 1 / (k + rank)."""
+
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def index_chunks(
+    texts: Sequence[str],
+    ids: Optional[Sequence[str]] = None,
+    metadata: Optional[Sequence[Dict[str, Any]]] = None
+) -> np.ndarray:
+    """
+    Add chunks to the vector store and the keyword index (same chunk keys).
+    If the keyword add fails after the vector add, rebuild the keyword
+    index with `python -m memory.keyword_index rebuild`.
+    """
+    keys = get_vector_store().add(texts, ids, metadata)
+    get_keyword_index().add(keys, texts)
+    return keys
+
+
+def _index_version() -> Tuple[Any, Any]:
+    return get_vector_store().version, get_keyword_index().version
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+# -----------------------------
+# QUERY RESULT CACHE
+# -----------------------------
+class QueryCache:
+    """
+    LRU of search results keyed on (normalized query, top_k).
+    Entries remember the index version they were computed at; any
+    index change (add, IVF rebuild, segment merge) empties the cache.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                inc("retrieval.cache_invalidated")
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key: Tuple[str, int], version) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            self._check_version(version)
+            records = self._entries.get(key)
+            if records is None:
+                return None
+            self._entries.move_to_end(key)
+        return [dict(record) for record in records]
+
+    def put(self, key: Tuple[str, int], version, records: List[Dict[str, Any]]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                return  # the index changed while this result was computed
+            self._entries[key] = [dict(record) for record in records]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+QUERY_CACHE = QueryCache()
+
+
+# -----------------------------
+# SEARCH
+# -----------------------------
+def _search_uncached(query: str, top_k: int) -> List[Dict[str, Any]]:
+    candidates = top_k * RETRIEVAL_CANDIDATES_PER_RESULT
+    store = get_vector_store()
+
+    vector_hits = [key for key, score in store.search_chunks(query, candidates) if score >= VECTOR_MIN_SCORE]
+    keyword_hits = [key for key, _ in get_keyword_index().search(query, candidates)]
+    fused = reciprocal_rank_fusion([vector_hits, keyword_hits])[:top_k]
+    inc("retrieval.query")
+
+    records = store.read_chunks([key for key, _ in fused])
+    for record, (key, score) in zip(records, fused):
+        record["score"] = round(score, 6)
+        record["vector_rank"] = vector_hits.index(key) + 1 if key in vector_hits else None
+        record["keyword_rank"] = keyword_hits.index(key) + 1 if key in keyword_hits else None
+    return records
+
+
+def search(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Hybrid search: vector (cosine >= VECTOR_MIN_SCORE) and BM25 candidates
+    fused by reciprocal rank. Records carry the fused `score` and the
+    per-index ranks they came from. Repeat queries are served from
+    QUERY_CACHE until either index changes.
+    """
+
+    key = (normalize_query(query), top_k)
+    version = _index_version()
+
+    records = QUERY_CACHE.get(key, version)
+    if records is not None:
+        _STATS.count("cache_hits")
+        inc("retrieval.cache_hit")
+        return records
+
+    _STATS.count("cache_misses")
+    inc("retrieval.cache_miss")
+    records = _search_uncached(query, top_k)
+    QUERY_CACHE.put(key, version, records)
+    return records
+
+
+# -----------------------------
+# PREFETCH
+# -----------------------------
+class RetrievalStats:
+    """
+    Prefetch accounting (seconds are summed over claimed prefetches):
+    - search_seconds: time the prefetched searches took
+    - waited_seconds: time callers still blocked on them
+    - hidden_seconds: search_seconds - waited_seconds (overlapped with other work)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: Dict[str, float] = {
+            "cache_hits": 0, "cache_misses": 0,
+            "prefetch_started": 0, "prefetch_claimed": 0, "prefetch_expired": 0, "prefetch_failed": 0,
+            "prefetch_cancelled": 0,
+            "search_seconds": 0.0, "waited_seconds": 0.0, "hidden_seconds": 0.0,
+        }
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.values[name] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = dict(self.values)
+        lookups = values["cache_hits"] + values["cache_misses"]
+        values["cache_hit_rate"] = round(values["cache_hits"] / lookups, 4) if lookups else None
+        values["hidden_fraction"] = (
+            round(values["hidden_seconds"] / values["search_seconds"], 4) if values["search_seconds"] else None
+        )
+        for name in ("search_seconds", "waited_seconds", "hidden_seconds"):
+            values[name] = round(values[name], 4)
+        return values
+
+
+_STATS = RetrievalStats()
+_PREFETCH_LOCK = threading.Lock()
+_PREFETCHES: Dict[Tuple[str, int], Tuple[float, Future]] = {}
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def _timed_search(query: str, top_k: int) -> Tuple[List[Dict[str, Any]], float]:
+    start = time.perf_counter()
+    records = search(query, top_k)
+    return records, time.perf_counter() - start
+
+
+def prefetch(query: str, top_k: int = 5) -> bool:
+    """
+    Start retrieval for `query` in the background, to be claimed by a
+    later retrieve() / search_prefetched() with the same query and top_k.
+    Call as soon as a request is accepted. Returns False when disabled
+    or already in flight.
+    """
+
+    if not RETRIEVAL_PREFETCH_ENABLED or not normalize_query(query):
+        return False
+
+    global _EXECUTOR
+    key = (normalize_query(query), top_k)
+    now = time.perf_counter()
+
+    with _PREFETCH_LOCK:
+        for stale in [k for k, (started, _) in _PREFETCHES.items() if now - started > RETRIEVAL_PREFETCH_TTL_SECONDS]:
+            del _PREFETCHES[stale]
+            _STATS.count("prefetch_expired")
+        if key in _PREFETCHES:
+            return False
+
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=RETRIEVAL_PREFETCH_WORKERS, thread_name_prefix="retrieval-prefetch")
+        _PREFETCHES[key] = (now, _EXECUTOR.submit(_timed_search, query, top_k))
+
+    _STATS.count("prefetch_started")
+    inc("retrieval.prefetch")
+    return True
+
+
+def _claim(query: str, top_k: int) -> Optional[Future]:
+    with _PREFETCH_LOCK:
+        entry = _PREFETCHES.pop((normalize_query(query), top_k), None)
+    return entry[1] if entry is not None else None
+
+
+def _claimed(elapsed: float, waited: float):
+    _STATS.count("prefetch_claimed")
+    _STATS.count("search_seconds", elapsed)
+    _STATS.count("waited_seconds", min(waited, elapsed))
+    _STATS.count("hidden_seconds", max(elapsed - waited, 0.0))
+
+
+def search_prefetched(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """search(), claiming a matching prefetch when one was started."""
+
+    future = _claim(query, top_k)
+    if future is None:
+        return search(query, top_k)
+
+    start = time.perf_counter()
+    try:
+        records, elapsed = future.result()
+    except Exception:
+        _STATS.count("prefetch_failed")
+        return search(query, top_k)
+
+    _claimed(elapsed, time.perf_counter() - start)
+    return records
+
+
+async def search_prefetched_async(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """search_prefetched() for asyncio callers: waits without blocking the event loop."""
+
+    future = _claim(query, top_k)
+    if future is None:
+        return await asyncio.to_thread(search, query, top_k)
+
+    start = time.perf_counter()
+    try:
+        records, elapsed = await asyncio.wrap_future(future)
+    except Exception:
+        _STATS.count("prefetch_failed")
+        return await asyncio.to_thread(search, query, top_k)
+
+    _claimed(elapsed, time.perf_counter() - start)
+    return records
+
+
+def cancel_prefetch(query: str, top_k: int = 5) -> bool:
+    """
+    Drop a prefetch that will not be claimed (e.g. the request was answered
+    from the summary store). A search not yet started is cancelled; a
+    running one finishes and still fills QUERY_CACHE.
+    """
+
+    future = _claim(query, top_k)
+    if future is None:
+        return False
+    future.cancel()
+    _STATS.count("prefetch_cancelled")
+    return True
+
+
+def retrieval_stats() -> Dict[str, Any]:
+    stats = _STATS.snapshot()
+    stats["cache_entries"] = len(QUERY_CACHE)
+    stats["prefetch_in_flight"] = len(_PREFETCHES)
+    return stats
+
 
 def retrieve(query: str, top_k: int = 5) -> List[str]:
     """
     Retrieval hook.
     MUST be called before any generation.
-    v1 returns empty list or mock docs.
+    Returns the text of the top_k chunks from hybrid (vector + BM25)
+    search; empty indexes return an empty list. Uses the result of a
+    prefetch(query) started earlier for the same request, if any.
     """
-    return []
+    return [record["text"] for record in search_prefetched(query, top_k)]
+
+
+async def retrieve_async(query: str, top_k: int = 5) -> List[str]:
+    """retrieve() for the async agent drivers (see core.llm.Offload)."""
+    return [record["text"] for record in await search_prefetched_async(query, top_k)]
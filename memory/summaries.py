@@ -0,0 +1,424 @@
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+from core.logging import logger
+from core.metrics import inc
+from memory.embeddings import tokenize
+
+load_dotenv()
+
+SUMMARY_STORE_ENABLED = os.getenv("SUMMARY_STORE_ENABLED", "true").lower() == "true"
+SUMMARY_STORE_PATH = os.getenv("SUMMARY_STORE_PATH", "memory/summaries.db")
+
+# Reuse a prior result instead of calling the LLM when one is recent and similar enough.
+# The default 1.0 requires the same set of content words (order, case and stopwords
+# may differ); below that an extra word such as "growth" can change the question.
+SUMMARY_REUSE_ENABLED = os.getenv("SUMMARY_REUSE_ENABLED", "true").lower() == "true"
+SUMMARY_REUSE_MAX_AGE_SECONDS = float(os.getenv("SUMMARY_REUSE_MAX_AGE_SECONDS", "86400"))
+SUMMARY_REUSE_MIN_SIMILARITY = float(os.getenv("SUMMARY_REUSE_MIN_SIMILARITY", "1.0"))
+
+# Background writer: rows per transaction, max wait before a partial batch is written
+SUMMARY_WRITE_BATCH = int(os.getenv("SUMMARY_WRITE_BATCH", "64"))
+SUMMARY_FLUSH_SECONDS = float(os.getenv("SUMMARY_FLUSH_SECONDS", "1.0"))
+SUMMARY_QUEUE_MAX = int(os.getenv("SUMMARY_QUEUE_MAX", "10000"))
+
+SUMMARY_MAX_CHARS = 600
+
+# FTS candidates checked per reuse lookup
+REUSE_CANDIDATES = 20
+
+# Uppercase words in tasks that are finance vocabulary, not tickers
+_NOT_TICKERS = {
+    "A", "I", "AI", "API", "CAGR", "CEO", "CFO", "DCF", "EBIT", "EBITDA", "EPS", "ESG", "ETF",
+    "EU", "EUR", "EV", "FCF", "FY", "GAAP", "GBP", "GDP", "IPO", "IRR", "JSON", "KPI", "LBO",
+    "LTM", "NAV", "NPV", "NTM", "OK", "PE", "REIT", "ROA", "ROE", "ROIC", "SEC", "TAM", "TTM",
+    "UK", "US", "USA", "USD", "WACC", "YOY", "YTD",
+}
+
+_TICKER_PATTERN = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b|\b([A-Z]{1,5}(?:\.[A-Z])?)\b")
+
+# Words ignored when comparing tasks
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "give", "how",
+    "in", "is", "it", "me", "of", "on", "or", "please", "the", "to", "what", "with", "you",
+}
+
+
+# -----------------------------
+# TASK FEATURES
+# -----------------------------
+def extract_tickers(task: str, *sources: Any) -> List[str]:
+    """Tickers in the task ($AAPL or bare AAPL) plus ticker / symbol fields of dict sources."""
+
+    found: Set[str] = set()
+    for dollar, bare in _TICKER_PATTERN.findall(task or ""):
+        symbol = (dollar or bare).upper()
+        if dollar or symbol not in _NOT_TICKERS:
+            found.add(symbol)
+
+    for source in sources:
+        if not isinstance(source, dict):
+            continue
+        for field in ("ticker", "tickers", "symbol"):
+            value = source.get(field)
+            for symbol in value if isinstance(value, list) else [value]:
+                if isinstance(symbol, str) and symbol.strip():
+                    found.add(symbol.strip().upper())
+    return sorted(found)
+
+
+def task_terms(task: str) -> Set[str]:
+    """Content words of a task (lowercased, stopwords removed)."""
+    return {token for token in tokenize(task) if token not in _STOPWORDS}
+
+
+def task_similarity(a: Set[str], b: Set[str]) -> float:
+    """
+    Jaccard similarity of two term sets; 0 when their numbers differ
+    ("growth 5%" never reuses "growth 7%").
+    """
+    if not a or not b:
+        return 0.0
+    if {t for t in a if any(c.isdigit() for c in t)} != {t for t in b if any(c.isdigit() for c in t)}:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def params_key(params: Optional[Dict[str, Any]]) -> str:
+    """
+    Digest of the non-task inputs (context, depth, ...) plus the LLM mode
+    and model that produced the result; reuse requires an exact match, so
+    a MOCK answer is never served in REAL mode or across models.
+    """
+    from core.llm import LLM_MODE, OPENAI_MODEL
+
+    payload = json.dumps(
+        [LLM_MODE, OPENAI_MODEL, params or {}], sort_keys=True, default=str, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def summarize(result: Any, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """Extractive one-paragraph summary: `path: value` for scalar fields, in order."""
+
+    parts: List[str] = []
+
+    def walk(value: Any, path: str):
+        if isinstance(value, dict):
+            for name, item in value.items():
+                walk(item, f"{path}.{name}" if path else str(name))
+        elif isinstance(value, list):
+            if all(not isinstance(item, (dict, list)) for item in value):
+                if value:
+                    parts.append(f"{path}: {', '.join(str(item) for item in value[:5])}")
+            else:
+                for item in value[:5]:
+                    walk(item, path)
+        elif value is not None and value != "":
+            parts.append(f"{path}: {value}" if path else str(value))
+
+    walk(result, "")
+    text = " | ".join(" ".join(part.split()) for part in parts)
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+# -----------------------------
+# STORE
+# -----------------------------
+class SummaryStore:
+    """
+    Agent result history (SQLite, WAL) with an FTS5 index on task, ticker and agent.
+
+    - put() only enqueues; a background thread summarizes and writes
+      batches of up to batch_size rows per transaction
+    - find_similar() returns the most similar recent result for the same
+      agent, tickers and params, used to skip repeat LLM calls
+    """
+
+    def __init__(
+        self,
+        path: str = SUMMARY_STORE_PATH,
+        batch_size: int = SUMMARY_WRITE_BATCH,
+        flush_seconds: float = SUMMARY_FLUSH_SECONDS,
+        queue_max: int = SUMMARY_QUEUE_MAX
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Tuple]" = queue.Queue(maxsize=queue_max)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = threading.Event()
+        self._batch_ready = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS summaries (
+                id INTEGER PRIMARY KEY,
+                agent TEXT NOT NULL,
+                task TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                params TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_summaries_agent_created ON summaries(agent, created_at);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+                task, ticker, agent, content='summaries', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS summaries_fts_insert AFTER INSERT ON summaries BEGIN
+                INSERT INTO summaries_fts (rowid, task, ticker, agent)
+                VALUES (new.id, new.task, new.ticker, new.agent);
+            END;
+            CREATE TRIGGER IF NOT EXISTS summaries_fts_delete AFTER DELETE ON summaries BEGIN
+                INSERT INTO summaries_fts (summaries_fts, rowid, task, ticker, agent)
+                VALUES ('delete', old.id, old.task, old.ticker, old.agent);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    # -----------------------------
+    # WRITES (batched, background)
+    # -----------------------------
+    def put(self, agent: str, task: str, result: Any, params: Optional[Dict[str, Any]] = None):
+        """Queue a successful result; never blocks the caller (full queue = dropped)."""
+
+        try:
+            self._queue.put_nowait((agent, task, result, params, time.time()))
+        except queue.Full:
+            inc("summaries.dropped")
+            return
+
+        self._pending.set()
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+        if self._writer is None or not self._writer.is_alive():
+            with self._lock:
+                if self._writer is None or not self._writer.is_alive():
+                    self._writer = threading.Thread(target=self._write_loop, name="summary-writer", daemon=True)
+                    self._writer.start()
+
+    def _write(self, items: List[Tuple]):
+        rows = []
+        for agent, task, result, params, created_at in items:
+            rows.append((
+                agent,
+                task,
+                " ".join(extract_tickers(task, params.get("context") if params else None)),
+                params_key(params),
+                summarize(result),
+                json.dumps(result, default=str, ensure_ascii=False),
+                created_at,
+            ))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO summaries (agent, task, ticker, params, summary, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        inc("summaries.batch")
+
+    def _write_loop(self):
+        while True:
+            self._pending.wait()
+            self._pending.clear()
+
+            # A partial batch waits up to flush_seconds for more rows
+            if self._queue.qsize() < self.batch_size:
+                self._batch_ready.wait(self.flush_seconds)
+            self._batch_ready.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[SUMMARIES] Write failed | error={e}")
+                inc("summaries.write_failed")
+
+    def flush(self):
+        """Write everything queued so far (batch_size rows per transaction)."""
+
+        with self._flush_lock:
+            while True:
+                items = []
+                while len(items) < self.batch_size:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not items:
+                    return
+                self._write(items)
+
+    # -----------------------------
+    # READS
+    # -----------------------------
+    def _match(self, text: str) -> Optional[str]:
+        terms = sorted(task_terms(text))
+        return " OR ".join(f'"{term}"' for term in terms) or None
+
+    def find_similar(
+        self,
+        agent: str,
+        task: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_age_seconds: float = SUMMARY_REUSE_MAX_AGE_SECONDS,
+        min_similarity: float = SUMMARY_REUSE_MIN_SIMILARITY
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Most similar prior result of `agent` newer than max_age_seconds,
+        with the same tickers and params and task similarity >= min_similarity.
+        """
+
+        match = self._match(task)
+        if match is None:
+            return None
+
+        tickers = " ".join(extract_tickers(task, params.get("context") if params else None))
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT s.id, s.task, s.ticker, s.result, s.created_at
+                FROM summaries_fts f JOIN summaries s ON s.id = f.rowid
+                WHERE summaries_fts MATCH ? AND s.agent = ? AND s.params = ? AND s.created_at >= ?
+                ORDER BY bm25(summaries_fts), s.created_at DESC
+                LIMIT ?
+                """,
+                (f"task : ({match})", agent, params_key(params), time.time() - max_age_seconds, REUSE_CANDIDATES)
+            ).fetchall()
+
+        terms = task_terms(task)
+        best = None
+        for row_id, prior_task, ticker, result, created_at in rows:
+            if ticker != tickers:
+                continue
+            similarity = task_similarity(terms, task_terms(prior_task))
+            if similarity >= min_similarity and (best is None or similarity > best[0]):
+                best = (similarity, row_id, prior_task, result, created_at)
+
+        if best is None:
+            return None
+        similarity, row_id, prior_task, result, created_at = best
+        return {
+            "id": row_id,
+            "task": prior_task,
+            "similarity": round(similarity, 3),
+            "age_seconds": round(time.time() - created_at, 1),
+            "result": json.loads(result),
+        }
+
+    def search(self, query: str, agent: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Full-text search over past tasks (and tickers), best match first."""
+
+        match = self._match(query)
+        if match is None:
+            return []
+
+        sql = (
+            "SELECT s.id, s.agent, s.task, s.ticker, s.summary, s.created_at "
+            "FROM summaries_fts f JOIN summaries s ON s.id = f.rowid WHERE summaries_fts MATCH ?"
+        )
+        args: List[Any] = [match]
+        if agent:
+            sql += " AND s.agent = ?"
+            args.append(agent)
+        sql += " ORDER BY bm25(summaries_fts) LIMIT ?"
+        args.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [
+            {"id": row[0], "agent": row[1], "task": row[2], "ticker": row[3], "summary": row[4], "created_at": row[5]}
+            for row in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        return {
+            "entries": count,
+            "queued": self._queue.qsize(),
+            "reuse_enabled": SUMMARY_REUSE_ENABLED,
+            "reuse_max_age_seconds": SUMMARY_REUSE_MAX_AGE_SECONDS,
+            "reuse_min_similarity": SUMMARY_REUSE_MIN_SIMILARITY,
+        }
+
+
+_STORE: Optional[SummaryStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_summary_store() -> SummaryStore:
+    """Process-wide store, opened on first use; queued rows are flushed at exit."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = SummaryStore()
+            atexit.register(_STORE.flush)
+        return _STORE
+
+
+def find_reusable(agent: str, task: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Reuse hook, called before an agent's first LLM call.
+    Returns a find_similar() match, or None (disabled, no match, or store error).
+    """
+
+    if not (SUMMARY_STORE_ENABLED and SUMMARY_REUSE_ENABLED):
+        return None
+
+    try:
+        match = get_summary_store().find_similar(agent, task, params)
+    except Exception as e:
+        logger.error(f"[SUMMARIES] Reuse lookup failed | agent={agent} | error={e}")
+        inc("summaries.reuse_error")
+        return None
+
+    inc("summaries.reuse_hit" if match is not None else "summaries.reuse_miss")
+    return match
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Agent result summary store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    search = sub.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--agent")
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    store = get_summary_store()
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == "search":
+        print(json.dumps(store.search(args.query, args.agent, args.limit), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,553 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.file_lock import FileLock, file_signature
+from core.logging import logger
+from core.metrics import inc
+from memory.embeddings import HashingEmbedder
+
+load_dotenv()
+
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "memory/vector_store")
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "256"))
+
+# Below this many rows search is always exact (brute force over the memmap)
+VECTOR_EXACT_THRESHOLD = int(os.getenv("VECTOR_EXACT_THRESHOLD", "20000"))
+
+# IVF: inverted lists per index (0 = sqrt(rows)) and lists scanned per query;
+# more probes = better recall, slower queries (see `bench`)
+VECTOR_IVF_NLIST = int(os.getenv("VECTOR_IVF_NLIST", "0"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+
+# Cosine similarity below which a hit is not worth putting in a prompt
+VECTOR_MIN_SCORE = float(os.getenv("VECTOR_MIN_SCORE", "0.1"))
+
+FORMAT_VERSION = 1
+SCAN_BLOCK_ROWS = 65536
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 32
+KMEANS_SEED = 0
+
+CHUNKS_FILE = "chunks.jsonl"  # one JSON record per row: id, text, meta (append-only)
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores (unordered)."""
+    if len(scores) <= k:
+        return np.arange(len(scores))
+    return np.argpartition(-scores, k - 1)[:k]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every row, a block at a time."""
+
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    block = max(1, (1 << 25) // max(len(centroids), 1))  # ~128MB of scores per block
+    for start in range(0, len(vectors), block):
+        rows = np.asarray(vectors[start:start + block])
+        assignments[start:start + block] = np.argmax(rows @ centroids.T, axis=1)
+    return assignments
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means on a sample of the rows."""
+
+    count = len(vectors)
+    sample_size = min(count, nlist * KMEANS_SAMPLES_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(count, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+
+        # Re-seed lists that lost all their members
+        empty = np.bincount(assignments, minlength=nlist) == 0
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalize(sums)
+
+    return centroids
+
+
+class _View:
+    """Immutable snapshot of the store that searches read from."""
+
+    def __init__(self, count: int, indexed: int, vectors, offsets, centroids, lists):
+        self.count = count
+        self.indexed = indexed
+        self.vectors = vectors
+        self.offsets = offsets
+        self.centroids = centroids
+        self.lists = lists
+
+
+class VectorStore:
+    """
+    Embedding index persisted to a directory (default memory/vector_store).
+
+    - vectors.<gen>.f32: float32 matrix (rows x dim), memory-mapped,
+      never loaded whole
+    - chunks.jsonl + chunks.<gen>.offsets: id / text / meta of each row
+      (the ID sidecar; offsets are the byte position of each row's line)
+    - meta.json: dim, rows, embedder, index layout; written last, so a
+      crash mid-write leaves the previous state readable
+    - build_index(): IVF index - rows are reordered so each inverted list
+      is one contiguous slice (centroids.<gen>.f32, lists.<gen>.u64)
+
+    Below VECTOR_EXACT_THRESHOLD rows, or without an index, search is
+    exact. Rows added after the last build_index are scanned exactly on
+    top of the probed lists. Searches never take the lock: they read an
+    immutable snapshot, which add / build_index swap atomically.
+
+    Several processes may share a store (e.g. CLI ingest while the API
+    runs): writers hold an exclusive file lock (.lock) and re-read
+    meta.json under it; readers reload when meta.json changes on disk.
+    """
+
+    def __init__(self, path: str = VECTOR_STORE_PATH, embedder: Optional[Any] = None):
+        self.path = path
+        self.embedder = embedder or HashingEmbedder(VECTOR_DIM)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self._file(LOCK_FILE))
+        self._meta_signature = None
+        self._load()
+
+    # -----------------------------
+    # FILES
+    # -----------------------------
+    def _file(self, name: str, generation: Optional[int] = None) -> str:
+        if generation is not None:
+            stem, ext = name.rsplit(".", 1)
+            name = f"{stem}.{generation}.{ext}"
+        return os.path.join(self.path, name)
+
+    def _layout_files(self, generation: int) -> Dict[str, str]:
+        return {
+            "vectors": self._file("vectors.f32", generation),
+            "offsets": self._file("chunks.offsets", generation),
+            "centroids": self._file("centroids.f32", generation),
+            "lists": self._file("lists.u64", generation),
+        }
+
+    def _load(self):
+        meta_path = self._file(META_FILE)
+        self._meta_signature = file_signature(meta_path)
+
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta["embedder"] != self.embedder.name:
+                raise ValueError(
+                    f"Vector store at {self.path} was built with {self.meta['embedder']}, "
+                    f"not {self.embedder.name}; rebuild it or change VECTOR_DIM"
+                )
+        else:
+            self.meta = {
+                "version": FORMAT_VERSION,
+                "embedder": self.embedder.name,
+                "dim": self.embedder.dim,
+                "count": 0,
+                "indexed": 0,
+                "nlist": 0,
+                "chunks_bytes": 0,
+                "generation": 0,
+            }
+        self._open()
+
+    def _open(self):
+        meta = self.meta
+        files = self._layout_files(meta["generation"])
+        count, dim, nlist = meta["count"], meta["dim"], meta["nlist"]
+        vectors = offsets = centroids = lists = None
+
+        if count:
+            # Shapes come from meta.json: bytes past them (an interrupted append) are ignored
+            vectors = np.memmap(files["vectors"], dtype=np.float32, mode="r", shape=(count, dim))
+            offsets = np.memmap(files["offsets"], dtype=np.uint64, mode="r", shape=(count,))
+        if nlist:
+            centroids = np.fromfile(files["centroids"], dtype=np.float32).reshape(nlist, dim)
+            lists = np.fromfile(files["lists"], dtype=np.uint64)
+
+        self._view = _View(count, meta["indexed"], vectors, offsets, centroids, lists)
+
+    def _write_meta(self, meta: Dict[str, Any]):
+        tmp = self._file(META_FILE) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, self._file(META_FILE))
+        self._meta_signature = file_signature(self._file(META_FILE))
+        self.meta = meta
+        self._open()
+
+    def _refresh(self):
+        """Pick up meta.json written by another process (cheap stat when unchanged)."""
+
+        if file_signature(self._file(META_FILE)) == self._meta_signature:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # a writer in this process is reloading it anyway
+        try:
+            with self._file_lock.shared():
+                self._reload_if_changed()
+        finally:
+            self._lock.release()
+
+    def _reload_if_changed(self):
+        # Called with the lock and a file lock held
+        if file_signature(self._file(META_FILE)) != self._meta_signature:
+            self._load()
+
+    @staticmethod
+    def _append(path: str, size: int, data: bytes):
+        with open(path, "ab") as f:
+            f.truncate(size)  # drop leftovers of an interrupted append
+            f.write(data)
+
+    # -----------------------------
+    # WRITE
+    # -----------------------------
+    def add(
+        self,
+        texts: Sequence[str],
+        ids: Optional[Sequence[str]] = None,
+        metadata: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> np.ndarray:
+        """
+        Embed and append chunks (ids default to the sha256 of the text).
+        Returns their chunk keys (see add_vectors).
+        """
+
+        ids = list(ids) if ids is not None else [
+            hashlib.sha256(text.encode("utf-8")).hexdigest() for text in texts
+        ]
+        records = [
+            {"id": ids[i], "text": text, **({"meta": metadata[i]} if metadata else {})}
+            for i, text in enumerate(texts)
+        ]
+        return self.add_vectors(self.embedder.embed(texts), records)
+
+    def add_vectors(self, vectors: np.ndarray, records: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """
+        Append pre-computed (L2-normalized) vectors with their records.
+        Returns the chunk keys: byte offsets of the records in chunks.jsonl,
+        which (unlike row numbers) survive build_index.
+        """
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape != (len(records), self.embedder.dim):
+            raise ValueError(f"Expected {len(records)} x {self.embedder.dim} vectors, got {vectors.shape}")
+        if not records:
+            return np.zeros(0, dtype=np.uint64)
+
+        lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record in records]
+
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()  # another process may have appended since
+            meta = dict(self.meta)
+            files = self._layout_files(meta["generation"])
+            count, dim = meta["count"], meta["dim"]
+
+            offsets = meta["chunks_bytes"] + np.concatenate(
+                ([0], np.cumsum([len(line) for line in lines[:-1]]))
+            ).astype(np.uint64)
+
+            self._append(self._file(CHUNKS_FILE), meta["chunks_bytes"], b"".join(lines))
+            self._append(files["vectors"], count * dim * 4, vectors.tobytes())
+            self._append(files["offsets"], count * 8, offsets.tobytes())
+
+            meta["count"] = count + len(records)
+            meta["chunks_bytes"] += sum(len(line) for line in lines)
+            self._write_meta(meta)
+
+        inc("vector.added")
+        return offsets
+
+    def build_index(self, nlist: Optional[int] = None) -> Dict[str, Any]:
+        """
+        (Re)build the IVF index over every row.
+        Writes a new file generation; searches keep using the old one
+        until meta.json switches over.
+        """
+
+        with self._lock, self._file_lock.exclusive():
+            self._reload_if_changed()
+            view, meta = self._view, dict(self.meta)
+            if view.count == 0:
+                return self.stats()
+
+            start = time.perf_counter()
+            nlist = nlist or VECTOR_IVF_NLIST or int(math.sqrt(view.count))
+            nlist = max(1, min(nlist, view.count))
+
+            centroids = _kmeans(view.vectors, nlist, np.random.default_rng(KMEANS_SEED))
+            assignments = _assign(view.vectors, centroids)
+            order = np.argsort(assignments, kind="stable")
+            lists = np.zeros(nlist + 1, dtype=np.uint64)
+            lists[1:] = np.cumsum(np.bincount(assignments, minlength=nlist))
+
+            generation = meta["generation"] + 1
+            files = self._layout_files(generation)
+
+            # Rows in list order, one block at a time
+            out = np.memmap(files["vectors"], dtype=np.float32, mode="w+", shape=(view.count, meta["dim"]))
+            for block in range(0, view.count, SCAN_BLOCK_ROWS):
+                rows = order[block:block + SCAN_BLOCK_ROWS]
+                out[block:block + len(rows)] = view.vectors[rows]
+            out.flush()
+            del out
+
+            np.asarray(view.offsets)[order].tofile(files["offsets"])
+            centroids.astype(np.float32).tofile(files["centroids"])
+            lists.tofile(files["lists"])
+
+            old_files = self._layout_files(meta["generation"])
+            meta.update(generation=generation, nlist=nlist, indexed=view.count)
+            self._write_meta(meta)
+
+            for path in old_files.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # missing, or still mapped (Windows)
+
+            elapsed = time.perf_counter() - start
+
+        inc("vector.index_built")
+        logger.info(f"[VECTOR] Built IVF index | rows={view.count} nlist={nlist} seconds={elapsed:.2f}")
+        return self.stats()
+
+    # -----------------------------
+    # READ
+    # -----------------------------
+    @property
+    def version(self) -> Tuple[int, int]:
+        """Changes whenever search results may change: (index generation, rows)."""
+        self._refresh()
+        return self.meta["generation"], self._view.count
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self._view.count
+
+    def search_vector(
+        self,
+        query: np.ndarray,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Tuple[int, float]]:
+        """(row, cosine score) of the top_k rows, best first."""
+        self._refresh()
+        return self._search(self._view, query, top_k, nprobe, exact)
+
+    def _search(
+        self,
+        view: _View,
+        query: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int],
+        exact: bool
+    ) -> List[Tuple[int, float]]:
+        if view.count == 0 or top_k <= 0:
+            return []
+
+        query = np.asarray(query, dtype=np.float32)
+        found_scores: List[np.ndarray] = []
+        found_rows: List[np.ndarray] = []
+
+        def scan(start: int, end: int):
+            for block in range(start, end, SCAN_BLOCK_ROWS):
+                stop = min(block + SCAN_BLOCK_ROWS, end)
+                scores = view.vectors[block:stop] @ query
+                keep = _top(scores, top_k)
+                found_scores.append(scores[keep])
+                found_rows.append(keep + block)
+
+        if view.centroids is not None and not exact and view.count >= VECTOR_EXACT_THRESHOLD:
+            probes = _top(view.centroids @ query, min(nprobe or VECTOR_IVF_NPROBE, len(view.centroids)))
+            for probe in probes:
+                scan(int(view.lists[probe]), int(view.lists[probe + 1]))
+            scan(view.indexed, view.count)
+            inc("vector.search.ivf")
+        else:
+            scan(0, view.count)
+            inc("vector.search.exact")
+
+        if not found_scores:
+            return []
+
+        scores = np.concatenate(found_scores)
+        rows = np.concatenate(found_rows)
+        keep = _top(scores, top_k)
+        keep = keep[np.argsort(-scores[keep], kind="stable")]
+        return [(int(rows[i]), float(scores[i])) for i in keep]
+
+    def search_chunks(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Tuple[int, float]]:
+        """(chunk key, cosine score) of the top_k chunks for a text query."""
+
+        self._refresh()
+        view = self._view
+        hits = self._search(view, self.embedder.embed_one(query), top_k, nprobe, exact)
+        return [(int(view.offsets[row]), score) for row, score in hits]
+
+    def read_chunks(self, keys: Sequence[int]) -> List[Dict[str, Any]]:
+        """Sidecar records for chunk keys (reads just those lines)."""
+
+        results = []
+        if not len(keys):
+            return results
+        with open(self._file(CHUNKS_FILE), "rb") as f:
+            for key in keys:
+                f.seek(int(key))
+                results.append(json.loads(f.readline()))
+        return results
+
+    def iter_chunks(self, start: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """(chunk key, record) of every chunk from key `start` on, in insertion order."""
+
+        self._refresh()
+        end = self.meta["chunks_bytes"]
+        if start >= end:
+            return
+        with open(self._file(CHUNKS_FILE), "rb") as f:
+            f.seek(start)
+            key = start
+            while key < end:
+                line = f.readline()
+                yield key, json.loads(line)
+                key += len(line)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        nprobe: Optional[int] = None,
+        exact: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Top_k records for a text query, each with its `score`."""
+
+        hits = self.search_chunks(query, top_k, nprobe, exact)
+        records = self.read_chunks([key for key, _ in hits])
+        for record, (_, score) in zip(records, hits):
+            record["score"] = round(score, 4)
+        return records
+
+    def stats(self) -> Dict[str, Any]:
+        self._refresh()
+        meta = self.meta
+        return {
+            "path": self.path,
+            "embedder": meta["embedder"],
+            "rows": meta["count"],
+            "indexed_rows": meta["indexed"],
+            "nlist": meta["nlist"],
+            "nprobe": VECTOR_IVF_NPROBE,
+            "exact_threshold": VECTOR_EXACT_THRESHOLD,
+            "generation": meta["generation"],
+        }
+
+
+_STORE: Optional[VectorStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Process-wide store, opened on first use."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = VectorStore()
+        return _STORE
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+def _bench(store: VectorStore, queries: int, top_k: int, nprobes: List[int]):
+    """Recall@k and latency of IVF search against exact search, per nprobe."""
+
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(store), min(queries, len(store)), replace=False)
+    # Queries near existing rows, like real lookups
+    probes = _normalize(
+        np.asarray(store._view.vectors[np.sort(rows)])
+        + rng.normal(0, 0.05, (len(rows), store.embedder.dim)).astype(np.float32)
+    )
+
+    truth = []
+    start = time.perf_counter()
+    for query in probes:
+        truth.append({row for row, _ in store.search_vector(query, top_k, exact=True)})
+    print(f"exact       recall=1.000 avg_ms={(time.perf_counter() - start) * 1000 / len(probes):.2f}")
+
+    for nprobe in nprobes:
+        hits = 0
+        start = time.perf_counter()
+        for query, expected in zip(probes, truth):
+            found = {row for row, _ in store.search_vector(query, top_k, nprobe=nprobe)}
+            hits += len(found & expected)
+        elapsed = (time.perf_counter() - start) * 1000 / len(probes)
+        print(f"nprobe={nprobe:<4} recall={hits / (len(probes) * top_k):.3f} avg_ms={elapsed:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vector store")
+    parser.add_argument("--path", default=VECTOR_STORE_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats")
+
+    index = commands.add_parser("index", help="(re)build the IVF index")
+    index.add_argument("--nlist", type=int, default=None)
+
+    search = commands.add_parser("search")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, default=5)
+    search.add_argument("--nprobe", type=int, default=None)
+    search.add_argument("--exact", action="store_true")
+
+    bench = commands.add_parser("bench", help="recall / latency per nprobe")
+    bench.add_argument("--queries", type=int, default=100)
+    bench.add_argument("--top-k", type=int, default=10)
+    bench.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+
+    args = parser.parse_args()
+    store = VectorStore(args.path)
+
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == "index":
+        print(json.dumps(store.build_index(args.nlist), indent=2))
+    elif args.command == "search":
+        for hit in store.search(args.query, args.top_k, args.nprobe, args.exact):
+            print(f"{hit['score']:.4f}  {hit['id'][:12]}  {hit['text'][:100]!r}")
+    elif args.command == "bench":
+        _bench(store, args.queries, args.top_k, args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Multiple -> (numerator field, denominator field)
+MULTIPLES: Dict[str, Tuple[str, str]] = {
+    "ev_ebitda": ("enterprise_value", "ebitda"),
+    "pe": ("market_cap", "net_income"),
+    "ev_sales": ("enterprise_value", "revenue"),
+}
+
+FUNDAMENTAL_FIELDS = ("enterprise_value", "market_cap", "ebitda", "net_income", "revenue")
+
+DEFAULT_PERCENTILES = (25, 50, 75)
+
+# Pseudo-sector holding every peer
+ALL_SECTORS = "*"
+
+
+def _check_level(level: float):
+    if isinstance(level, bool) or not isinstance(level, (int, float)) or not 0 <= level <= 100:
+        raise ValueError(f"Percentile levels must be between 0 and 100, got {level!r}")
+
+
+def _percentile(values: List[float], level: float) -> Optional[float]:
+    """Linear-interpolated percentile of an already sorted list (O(1))."""
+    _check_level(level)
+    if not values:
+        return None
+    position = (len(values) - 1) * level / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class PeerIndex:
+    """
+    Peer universe for comparable-companies valuation.
+
+    - fundamentals live in compact float64 columns (one row per ticker)
+    - per-(sector, multiple) distributions are kept as sorted lists, so
+      any percentile is an O(1) lookup
+    - upsert/remove touch only the affected ticker's entries
+      (O(log n) search + list insert), never a full rescan
+
+    Multiples with a non-positive denominator (e.g. negative EBITDA)
+    are excluded from the distributions.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self._tickers: List[str] = []
+        self._sectors: List[str] = []
+        self._columns = {field: np.full(capacity, np.nan) for field in FUNDAMENTAL_FIELDS}
+        self._distributions: Dict[Tuple[str, str], List[float]] = {}
+
+    # -----------------------------
+    # INTERNALS
+    # -----------------------------
+    def _multiples(self, row: int) -> Dict[str, float]:
+        values = {}
+        for name, (numerator, denominator) in MULTIPLES.items():
+            top = self._columns[numerator][row]
+            bottom = self._columns[denominator][row]
+            if np.isfinite(top) and np.isfinite(bottom) and bottom > 0:
+                values[name] = float(top / bottom)
+        return values
+
+    def _index_row(self, row: int, add: bool):
+        for name, value in self._multiples(row).items():
+            for sector in {self._sectors[row], ALL_SECTORS}:
+                values = self._distributions.setdefault((sector, name), [])
+                if add:
+                    insort(values, value)
+                else:
+                    del values[bisect_left(values, value)]
+
+    def _grow(self):
+        for field, column in self._columns.items():
+            grown = np.full(column.shape[0] * 2, np.nan)
+            grown[:column.shape[0]] = column
+            self._columns[field] = grown
+
+    # -----------------------------
+    # UPDATES
+    # -----------------------------
+    @staticmethod
+    def _prepare(peer: Dict[str, Any]) -> Tuple[str, str, Dict[str, float]]:
+        """
+        (ticker, sector, fundamentals as floats) for one peer; raises
+        ValueError before anything is written.
+        enterprise_value defaults to market_cap + net_debt when omitted.
+        """
+
+        ticker = peer.get("ticker")
+        if not isinstance(ticker, str) or not ticker.strip():
+            raise ValueError(f"Peer is missing a ticker: {peer}")
+
+        values: Dict[str, float] = {}
+        for field in FUNDAMENTAL_FIELDS + ("net_debt",):
+            value = peer.get(field)
+            try:
+                values[field] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{ticker}: {field} must be a number, got {value!r}")
+
+        if np.isnan(values["enterprise_value"]) and not np.isnan(values["market_cap"]):
+            net_debt = 0.0 if np.isnan(values["net_debt"]) else values["net_debt"]
+            values["enterprise_value"] = values["market_cap"] + net_debt
+        del values["net_debt"]
+        return ticker, peer.get("sector") or ALL_SECTORS, values
+
+    def _upsert(self, ticker: str, sector: str, values: Dict[str, float]):
+        row = self._rows.get(ticker)
+
+        if row is None:
+            row = len(self._tickers)
+            if row == self._columns["revenue"].shape[0]:
+                self._grow()
+            self._rows[ticker] = row
+            self._tickers.append(ticker)
+            self._sectors.append(sector)
+        else:
+            self._index_row(row, add=False)
+            self._sectors[row] = sector
+
+        for field, value in values.items():
+            self._columns[field][row] = value
+
+        self._index_row(row, add=True)
+
+    def upsert(self, ticker: str, sector: str, fundamentals: Dict[str, Any]):
+        """Insert or update one peer."""
+        self.update([{**fundamentals, "ticker": ticker, "sector": sector}])
+
+    def update(self, upsert: List[Dict[str, Any]], remove: Optional[List[str]] = None) -> List[str]:
+        """
+        Apply upserts, then removals, as one all-or-nothing change: every
+        peer is validated first, and readers never see a partial update.
+        Returns the tickers actually removed.
+        """
+
+        prepared = [self._prepare(peer) for peer in upsert]
+
+        with self._lock:
+            for ticker, sector, values in prepared:
+                self._upsert(ticker, sector, values)
+            return [ticker for ticker in (remove or []) if self._remove(ticker)]
+
+    def remove(self, ticker: str) -> bool:
+        """Remove one peer (swap-with-last keeps the columns dense)."""
+        with self._lock:
+            return self._remove(ticker)
+
+    def _remove(self, ticker: str) -> bool:
+        row = self._rows.pop(ticker, None)
+        if row is None:
+            return False
+
+        self._index_row(row, add=False)
+        last = len(self._tickers) - 1
+
+        if row != last:
+            moved = self._tickers[last]
+            self._tickers[row] = moved
+            self._sectors[row] = self._sectors[last]
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._rows[moved] = row
+
+        self._tickers.pop()
+        self._sectors.pop()
+        for column in self._columns.values():
+            column[last] = np.nan
+        return True
+
+    # -----------------------------
+    # QUERIES
+    # -----------------------------
+    # Reads take the same lock as updates, so they never see a list mid-insort
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tickers)
+
+    def sectors(self) -> List[str]:
+        with self._lock:
+            return sorted(set(self._sectors))
+
+    def distribution(
+        self,
+        sector: str,
+        percentiles: Tuple[float, ...] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Dict[str, Any]]:
+        """Percentiles of every multiple for one sector (or ALL_SECTORS)."""
+
+        for level in percentiles:
+            _check_level(level)  # also for sectors with no peers
+
+        summary = {}
+        with self._lock:
+            for name in MULTIPLES:
+                values = self._distributions.get((sector, name), [])
+                summary[name] = {
+                    "count": len(values),
+                    "percentiles": {str(level): _percentile(values, level) for level in percentiles},
+                }
+        return summary
+
+    def implied_valuation(
+        self,
+        target: Dict[str, Any],
+        sector: str,
+        percentiles: Tuple[float, ...] = DEFAULT_PERCENTILES
+    ) -> Dict[str, Any]:
+        """
+        Implied EV, equity value and value per share for a target from
+        the sector's multiple distributions.
+
+        target: ebitda, net_income, revenue, net_debt, shares_outstanding
+        """
+
+        net_debt = target.get("net_debt") or 0.0
+        shares = target.get("shares_outstanding")
+        distributions = self.distribution(sector, percentiles)
+        implied: Dict[str, Any] = {}
+
+        for name, (numerator, denominator) in MULTIPLES.items():
+            metric = target.get(denominator)
+            if metric is None:
+                continue
+
+            implied[name] = {}
+            for level, multiple in distributions[name]["percentiles"].items():
+                if multiple is None:
+                    implied[name][level] = None
+                    continue
+
+                if numerator == "market_cap":
+                    equity_value = multiple * metric
+                    enterprise_value = equity_value + net_debt
+                else:
+                    enterprise_value = multiple * metric
+                    equity_value = enterprise_value - net_debt
+
+                implied[name][level] = {
+                    "multiple": round(multiple, 4),
+                    "enterprise_value": round(enterprise_value, 2),
+                    "equity_value": round(equity_value, 2),
+                    "value_per_share": round(equity_value / shares, 2) if shares else None,
+                }
+
+        return {
+            "sector": sector,
+            "peer_counts": {name: distributions[name]["count"] for name in MULTIPLES},
+            "implied": implied,
+        }
+
+
+_PEER_INDEX = PeerIndex()
+
+
+def get_peer_index() -> PeerIndex:
+    """Process-wide peer index used by the API."""
+    return _PEER_INDEX
+
+
+def run_comps(
+    peers: List[Dict[str, Any]],
+    target: Dict[str, Any],
+    sector: str = ALL_SECTORS,
+    percentiles: Tuple[float, ...] = DEFAULT_PERCENTILES
+) -> Dict[str, Any]:
+    """
+    One-shot comps valuation against an ad-hoc peer list
+    (builds a throwaway PeerIndex).
+    """
+
+    index = PeerIndex(capacity=max(len(peers), 1))
+    index.update(peers)
+    return index.implied_valuation(target, sector, percentiles)
@@ -0,0 +1,265 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools.dcf_calculator import OUTPUT_FORMATS, calculate_dcf, format_projections, normalize_inputs
+
+
+# Unrounded batch outputs agree with calculate_dcf to within this relative
+# tolerance. The per-year operations are applied in the same order as the
+# scalar engine (sequential compounding, left-to-right summation), so in
+# practice values are bit-identical; the only source of drift is a vectorized
+# `pow` that may differ from libm by 1 ulp. Rounded (2dp) outputs can
+# therefore only differ on an exact half-cent tie. Enforced by check_parity.
+BATCH_RTOL = 1e-12
+
+PARITY_FIELDS = ("enterprise_value", "equity_value", "value_per_share")
+
+
+def dcf_arrays(
+    revenue,
+    revenue_growth,
+    ebit_margin,
+    tax_rate,
+    capex_pct,
+    nwc_pct,
+    wacc,
+    terminal_growth,
+    net_debt=None,
+    shares_outstanding=None,
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized DCF core over N input sets.
+    - revenue_growth: (N, years) array
+    - every other parameter: scalar or (N,) array
+    - net_debt / shares_outstanding: NaN (or None) where missing
+    - rows with wacc <= terminal_growth come back as NaN
+
+    Returns unrounded arrays; per-year arrays are (N, years).
+    """
+
+    growth = np.atleast_2d(np.asarray(revenue_growth, dtype=float))
+    n, years = growth.shape
+
+    def col(value):
+        if value is None:
+            value = np.nan
+        return np.broadcast_to(np.asarray(value, dtype=float), (n,))
+
+    wacc = col(wacc)
+    terminal_growth = col(terminal_growth)
+
+    # -----------------------------
+    # 1. PROJECTIONS
+    # -----------------------------
+    revenue_path = np.empty((n, years))
+    current_revenue = col(revenue).copy()
+
+    for year in range(years):
+        current_revenue *= (1 + growth[:, year])
+        revenue_path[:, year] = current_revenue
+
+    ebit = revenue_path * col(ebit_margin)[:, None]
+    nopat = ebit * (1 - col(tax_rate))[:, None]
+    capex = revenue_path * col(capex_pct)[:, None]
+    delta_nwc = revenue_path * col(nwc_pct)[:, None]
+    fcff = nopat - capex - delta_nwc
+
+    # -----------------------------
+    # 2. DISCOUNTING
+    # -----------------------------
+    periods = np.arange(1, years + 1, dtype=float)
+    discount = (1 + wacc)[:, None] ** periods
+    discounted_fcff = fcff / discount
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal_value = (fcff[:, -1] * (1 + terminal_growth)) / (wacc - terminal_growth)
+    terminal_value = np.where(wacc > terminal_growth, terminal_value, np.nan)
+    discounted_terminal = terminal_value / discount[:, -1]
+
+    # Sequential sum, matching Python's sum() in calculate_dcf
+    pv_fcff = np.zeros(n)
+    for year in range(years):
+        pv_fcff = pv_fcff + discounted_fcff[:, year]
+
+    enterprise_value = pv_fcff + discounted_terminal
+
+    # -----------------------------
+    # 3. EQUITY BRIDGE
+    # -----------------------------
+    equity_value = enterprise_value - col(net_debt)
+    value_per_share = equity_value / col(shares_outstanding)
+
+    return {
+        "revenue": revenue_path,
+        "ebit": ebit,
+        "nopat": nopat,
+        "fcff": fcff,
+        "discounted_fcff": discounted_fcff,
+        "terminal_value": terminal_value,
+        "discounted_terminal": discounted_terminal,
+        "enterprise_value": enterprise_value,
+        "equity_value": equity_value,
+        "value_per_share": value_per_share,
+    }
+
+
+def _round(value: float, round_output: bool = True) -> Optional[float]:
+    if value is None or value != value:  # NaN
+        return None
+    return round(value, 2) if round_output else value
+
+
+def calculate_dcf_batch(
+    inputs_list: List[Dict[str, Any]],
+    include_projections: bool = True,
+    output_format: str = "rows",
+    round_output: bool = True
+) -> Dict[str, Any]:
+    """
+    Values N DCF input sets in one vectorized pass.
+
+    - Input dicts use the calculate_dcf schema
+    - output_format / round_output behave as in calculate_dcf
+    - Rows are grouped by horizon (`years`) and broadcast per group
+    - Invalid rows are reported in `errors` and return None,
+      they never fail the whole batch
+    - Results match calculate_dcf to within BATCH_RTOL (see check_parity)
+    """
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format: {output_format}")
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(inputs_list)
+    errors: List[Dict[str, Any]] = []
+
+    # -----------------------------
+    # 1. VALIDATE + GROUP BY HORIZON
+    # -----------------------------
+    groups: Dict[int, List[int]] = {}
+    parsed: Dict[int, Dict[str, Any]] = {}
+
+    for index, inputs in enumerate(inputs_list):
+        try:
+            parsed[index] = normalize_inputs(inputs)
+        except Exception as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        groups.setdefault(parsed[index]["years"], []).append(index)
+
+    # -----------------------------
+    # 2. VECTORIZED VALUATION
+    # -----------------------------
+    for indices in groups.values():
+        rows = [parsed[i] for i in indices]
+
+        def column(key):
+            return np.array(
+                [np.nan if row[key] is None else row[key] for row in rows],
+                dtype=float
+            )
+
+        out = dcf_arrays(
+            revenue=column("revenue"),
+            revenue_growth=np.array([row["revenue_growth"] for row in rows], dtype=float),
+            ebit_margin=column("ebit_margin"),
+            tax_rate=column("tax_rate"),
+            capex_pct=column("capex_pct"),
+            nwc_pct=column("nwc_pct"),
+            wacc=column("wacc"),
+            terminal_growth=column("terminal_growth"),
+            net_debt=column("net_debt"),
+            shares_outstanding=column("shares_outstanding"),
+        )
+
+        # -----------------------------
+        # 3. SHAPE LIKE calculate_dcf
+        # -----------------------------
+        # Python floats + round() (not np.round) keep rounding identical
+        revenue = out["revenue"].tolist()
+        ebit = out["ebit"].tolist()
+        nopat = out["nopat"].tolist()
+        fcff = out["fcff"].tolist()
+        enterprise_value = out["enterprise_value"].tolist()
+        equity_value = out["equity_value"].tolist()
+        value_per_share = out["value_per_share"].tolist()
+
+        for position, index in enumerate(indices):
+            result: Dict[str, Any] = {}
+
+            if include_projections:
+                result["projections"] = format_projections(
+                    revenue[position],
+                    ebit[position],
+                    nopat[position],
+                    fcff[position],
+                    output_format,
+                    round_output
+                )
+
+            result["enterprise_value"] = _round(enterprise_value[position], round_output)
+            result["equity_value"] = _round(equity_value[position], round_output)
+            result["value_per_share"] = _round(value_per_share[position], round_output)
+            results[index] = result
+
+    return {
+        "results": results,
+        "errors": errors,
+        "count": len(inputs_list),
+        "valued": len(inputs_list) - len(errors),
+    }
+
+
+def check_parity(inputs_list: List[Dict[str, Any]], rtol: float = BATCH_RTOL) -> float:
+    """
+    Values every input set with both engines (unrounded) and raises
+    AssertionError if any output differs by more than rtol (relative).
+    Returns the largest relative difference seen.
+    """
+
+    batch = calculate_dcf_batch(inputs_list, include_projections=False, round_output=False)
+    worst = 0.0
+
+    for index, (inputs, result) in enumerate(zip(inputs_list, batch["results"])):
+        try:
+            scalar = calculate_dcf(inputs, round_output=False)
+        except ValueError:
+            assert result is None, f"Row {index}: batch valued an input set calculate_dcf rejects"
+            continue
+        assert result is not None, f"Row {index}: batch rejected an input set calculate_dcf values"
+
+        for field in PARITY_FIELDS:
+            expected, actual = scalar[field], result[field]
+            if expected is None:
+                assert actual is None, f"Row {index}: {field} should be None, got {actual}"
+                continue
+            difference = abs(actual - expected) / max(abs(expected), 1e-300)
+            assert difference <= rtol, (
+                f"Row {index}: {field} batch={actual!r} scalar={expected!r} "
+                f"(relative difference {difference:.3g} > {rtol:g})"
+            )
+            worst = max(worst, difference)
+
+    return worst
+
+
+if __name__ == "__main__":
+    # Parity smoke check on random input sets
+    rng = np.random.default_rng(0)
+    samples = [
+        {
+            "revenue": float(rng.uniform(1e6, 1e11)),
+            "revenue_growth": rng.uniform(-0.1, 0.3, size=years).tolist(),
+            "years": years,
+            "ebit_margin": float(rng.uniform(0.0, 0.4)),
+            "tax_rate": float(rng.uniform(0.1, 0.35)),
+            "capex_pct": float(rng.uniform(0.0, 0.1)),
+            "nwc_pct": float(rng.uniform(0.0, 0.05)),
+            "wacc": float(rng.uniform(0.05, 0.14)),
+            "terminal_growth": float(rng.uniform(0.0, 0.04)),
+            "net_debt": float(rng.uniform(-1e9, 1e10)),
+            "shares_outstanding": float(rng.uniform(1e6, 1e10)),
+        }
+        for years in rng.integers(3, 11, size=2000).tolist()
+    ]
+    print(f"max relative difference: {check_parity(samples):.3g} (rtol {BATCH_RTOL:g})")
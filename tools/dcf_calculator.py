@@ -1,17 +1,228 @@
-from typing import Dict, List, Union
+import numbers
+from typing import Dict, List, Optional, Union
 
+# Response layouts for projections / scenario results
+OUTPUT_FORMATS = ("rows", "columnar")
 
-def calculate_dcf(inputs: Dict) -> Dict:
+# Model parameter defaults (shared with the batch engine)
+DCF_DEFAULTS = {
+    "years": 5,
+    "revenue_growth": 0.05,
+    "ebit_margin": 0.25,
+    "tax_rate": 0.25,
+    "capex_pct": 0.05,
+    "nwc_pct": 0.02,
+    "wacc": 0.09,
+    "terminal_growth": 0.025,
+}
+
+
+def calculate_dcf(
+    inputs: Dict,
+    return_gradients: bool = False,
+    output_format: str = "rows",
+    round_output: bool = True
+) -> Dict:
     """
     Deterministic DCF calculator.
     - No LLMs
     - No external dependencies
     - Scalar-safe (API friendly)
+    - return_gradients: also return exact partial derivatives of
+      enterprise value and value per share (see dcf_gradients)
+    - output_format: "rows" (list of per-year dicts) or "columnar"
+      (one list per field)
+    - round_output: False returns unrounded floats
     """
 
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format: {output_format}")
+
+    # -----------------------------
+    # 1. INPUTS (DEFAULTS + VALIDATION)
+    # -----------------------------
+    params = normalize_inputs(inputs)
+
+    years = params["years"]
+    revenue_growth = params["revenue_growth"]
+    ebit_margin = params["ebit_margin"]
+    tax_rate = params["tax_rate"]
+    capex_pct = params["capex_pct"]
+    nwc_pct = params["nwc_pct"]
+    wacc = params["wacc"]
+    terminal_growth = params["terminal_growth"]
+    net_debt = params["net_debt"]
+    shares_outstanding = params["shares_outstanding"]
+
+    # -----------------------------
+    # 2. PROJECTIONS
+    # -----------------------------
+    revenue_path = project_revenue(params["revenue"], revenue_growth)
+    operating = project_operating_lines(revenue_path, ebit_margin, tax_rate)
+    fcff_list = project_fcff(revenue_path, operating["nopat"], capex_pct, nwc_pct)
+
+    projections = format_projections(
+        revenue_path,
+        operating["ebit"],
+        operating["nopat"],
+        fcff_list,
+        output_format,
+        round_output
+    )
+
+    # -----------------------------
+    # 3. DISCOUNT CASH FLOWS
+    # -----------------------------
+    discounted_fcff = discount_fcff(fcff_list, wacc)
+    discounted_terminal = discount_terminal_value(fcff_list, wacc, terminal_growth)
+
+    bridge = equity_bridge(discounted_fcff, discounted_terminal, net_debt, shares_outstanding)
+
+    # -----------------------------
+    # 4. FINAL OUTPUT
+    # -----------------------------
+    result = {
+        "projections": projections,
+        "enterprise_value": maybe_round(bridge["enterprise_value"], round_output),
+        "equity_value": maybe_round(bridge["equity_value"], round_output),
+        "value_per_share": maybe_round(bridge["value_per_share"], round_output)
+    }
+
+    if return_gradients:
+        result["gradients"] = dcf_gradients(params, revenue_path, fcff_list, discounted_fcff, bridge)
+
+    return result
+
+
+def maybe_round(value: Optional[float], round_output: bool = True) -> Optional[float]:
+    """Round to cents unless unrounded output was requested."""
+    if value is None or not round_output:
+        return value
+    return round(value, 2)
+
+
+def format_projections(
+    revenue: List[float],
+    ebit: List[float],
+    nopat: List[float],
+    fcff: List[float],
+    output_format: str = "rows",
+    round_output: bool = True
+) -> Union[List[Dict], Dict[str, List]]:
+    """
+    Lay out per-year projections.
+    - rows: [{"year", "revenue", "ebit", "nopat", "fcff"}, ...]
+    - columnar: {"year": [...], "revenue": [...], ...}
+    """
+
+    columns = {
+        "year": list(range(1, len(revenue) + 1)),
+        "revenue": [maybe_round(value, round_output) for value in revenue],
+        "ebit": [maybe_round(value, round_output) for value in ebit],
+        "nopat": [maybe_round(value, round_output) for value in nopat],
+        "fcff": [maybe_round(value, round_output) for value in fcff],
+    }
+
+    if output_format == "columnar":
+        return columns
+
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def dcf_gradients(
+    params: Dict,
+    revenue_path: List[float],
+    fcff_list: List[float],
+    discounted_fcff: List[float],
+    bridge: Dict[str, Optional[float]]
+) -> Dict[str, Dict]:
+    """
+    Closed-form partial derivatives of enterprise value and value per
+    share with respect to every DCF input, from one evaluation's stages.
+
+    FCFF_t = R_t * k with k = m(1 - tax) - capex_pct - nwc_pct, and
+    EV = sum_t FCFF_t D_t + FCFF_T (1 + g) / (wacc - g) * D_T,
+    D_t = (1 + wacc)^-(t+1). Unrounded; revenue_growth is per year.
+    """
+
+    ebit_margin = params["ebit_margin"]
+    tax_rate = params["tax_rate"]
+    wacc = params["wacc"]
+    terminal_growth = params["terminal_growth"]
+    net_debt = params["net_debt"]
+    shares_outstanding = params["shares_outstanding"]
+    years = len(fcff_list)
+
+    spread = wacc - terminal_growth
+    terminal_pv = (
+        fcff_list[-1] * (1 + terminal_growth) / spread / ((1 + wacc) ** years)
+    )
+
+    # PV of one unit of FCFF margin (k) across the horizon + terminal
+    revenue_pv = sum(
+        revenue_path[t] / ((1 + wacc) ** (t + 1)) for t in range(years)
+    ) + revenue_path[-1] * (1 + terminal_growth) / spread / ((1 + wacc) ** years)
+
+    # Same, per unit of base revenue (revenue path is linear in it)
+    fcff_margin = ebit_margin * (1 - tax_rate) - params["capex_pct"] - params["nwc_pct"]
+    unit_revenue_pv = 0.0
+    growth_factor = 1.0
+    for t in range(years):
+        growth_factor *= (1 + params["revenue_growth"][t])
+        unit_revenue_pv += growth_factor / ((1 + wacc) ** (t + 1))
+    unit_revenue_pv += growth_factor * (1 + terminal_growth) / spread / ((1 + wacc) ** years)
+
+    # d/dg_s hits every year from s onward (and the terminal value)
+    growth_grads: List[float] = []
+    tail = terminal_pv
+    for t in reversed(range(years)):
+        tail += discounted_fcff[t]
+        growth_grads.append(tail / (1 + params["revenue_growth"][t]))
+    growth_grads.reverse()
+
+    ev_grads = {
+        "revenue": fcff_margin * unit_revenue_pv,
+        "revenue_growth": growth_grads,
+        "ebit_margin": (1 - tax_rate) * revenue_pv,
+        "tax_rate": -ebit_margin * revenue_pv,
+        "capex_pct": -revenue_pv,
+        "nwc_pct": -revenue_pv,
+        "wacc": (
+            -sum((t + 1) * discounted_fcff[t] for t in range(years)) / (1 + wacc)
+            - terminal_pv * (1 / spread + years / (1 + wacc))
+        ),
+        "terminal_growth": terminal_pv * (1 + wacc) / ((1 + terminal_growth) * spread),
+        "net_debt": 0.0,
+        "shares_outstanding": 0.0,
+    }
+
+    gradients: Dict[str, Dict] = {"enterprise_value": ev_grads}
+
     # -----------------------------
-    # 1. REQUIRED INPUTS (SAFE)
+    # Chain through the equity bridge
     # -----------------------------
+    if net_debt is not None and shares_outstanding is not None:
+        vps_grads = {
+            key: [value / shares_outstanding for value in grad] if isinstance(grad, list)
+            else grad / shares_outstanding
+            for key, grad in ev_grads.items()
+        }
+        vps_grads["net_debt"] = -1 / shares_outstanding
+        vps_grads["shares_outstanding"] = -bridge["equity_value"] / shares_outstanding ** 2
+        gradients["value_per_share"] = vps_grads
+
+    return gradients
+
+
+def normalize_inputs(inputs: Dict, check_discount: bool = True) -> Dict:
+    """
+    Resolve defaults and validate one DCF input set.
+    Shared by the scalar, staged and batch engines so they reject
+    the same inputs with the same messages.
+    - check_discount: False skips the wacc > terminal_growth check, for
+      callers that override both (e.g. the sensitivity grid)
+    """
+
     revenue = inputs.get("revenue") or inputs.get("base_revenue")
     if revenue is None:
         raise ValueError("Missing required input: revenue")
@@ -22,63 +233,104 @@ def calculate_dcf(inputs: Dict) -> Dict:
     if shares_outstanding is None and net_debt is None:
         raise ValueError("At least one of shares_outstanding or net_debt is required")
 
-    # -----------------------------
-    # 2. MODEL PARAMETERS
-    # -----------------------------
-    years = inputs.get("years", 5)
+    params = {key: inputs.get(key, default) for key, default in DCF_DEFAULTS.items()}
+    years = params["years"]
 
-    revenue_growth = inputs.get("revenue_growth", 0.05)
-    ebit_margin = inputs.get("ebit_margin", 0.25)
-    tax_rate = inputs.get("tax_rate", 0.25)
-    capex_pct = inputs.get("capex_pct", 0.05)
-    nwc_pct = inputs.get("nwc_pct", 0.02)
-    wacc = inputs.get("wacc", 0.09)
-    terminal_growth = inputs.get("terminal_growth", 0.025)
+    if not _is_number(years) or not float(years).is_integer() or years < 1:
+        raise ValueError("years must be a positive integer")
+    years = params["years"] = int(years)
 
-    # -----------------------------
-    # 3. NORMALIZE SCALARS → LISTS
-    # -----------------------------
-    if isinstance(revenue_growth, (int, float)):
-        revenue_growth = [revenue_growth] * years
+    # Scalars → lists
+    if _is_number(params["revenue_growth"]):
+        params["revenue_growth"] = [params["revenue_growth"]] * years
 
-    if len(revenue_growth) != years:
+    if not isinstance(params["revenue_growth"], (list, tuple)):
+        raise ValueError("revenue_growth must be a number or a list of numbers")
+    if len(params["revenue_growth"]) != years:
         raise ValueError("revenue_growth length must equal number of years")
+    if not all(_is_number(growth) for growth in params["revenue_growth"]):
+        raise ValueError("revenue_growth must be a number or a list of numbers")
 
-    # -----------------------------
-    # 4. PROJECTIONS
-    # -----------------------------
-    projections: List[Dict[str, Union[int, float]]] = []
-    fcff_list: List[float] = []
+    # Strings are rejected, not coerced, so every engine values the same inputs
+    for key in ("ebit_margin", "tax_rate", "capex_pct", "nwc_pct", "wacc", "terminal_growth"):
+        if not _is_number(params[key]):
+            raise ValueError(f"{key} must be a number")
+    for key, value in (("net_debt", net_debt), ("shares_outstanding", shares_outstanding)):
+        if value is not None and not _is_number(value):
+            raise ValueError(f"{key} must be a number")
 
+    if check_discount and params["wacc"] <= params["terminal_growth"]:
+        raise ValueError("WACC must be greater than terminal growth rate")
+
+    params["revenue"] = float(revenue)
+    params["net_debt"] = net_debt
+    params["shares_outstanding"] = shares_outstanding
+    return params
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+# -----------------------------
+# DCF STAGES
+# -----------------------------
+# calculate_dcf is composed of these pure stages so callers (e.g. the
+# scenario analyzer) can cache and reuse individual stages.
+
+def project_revenue(revenue: float, revenue_growth: List[float]) -> List[float]:
+    """Revenue path: compounds base revenue by each year's growth."""
+    revenue_path: List[float] = []
     current_revenue = float(revenue)
 
-    for year in range(years):
-        current_revenue *= (1 + revenue_growth[year])
+    for growth in revenue_growth:
+        current_revenue *= (1 + growth)
+        revenue_path.append(current_revenue)
+
+    return revenue_path
+
+
+def project_operating_lines(
+    revenue_path: List[float],
+    ebit_margin: float,
+    tax_rate: float
+) -> Dict[str, List[float]]:
+    """Operating lines: EBIT and NOPAT per year."""
+    ebit = [current_revenue * ebit_margin for current_revenue in revenue_path]
+    nopat = [value * (1 - tax_rate) for value in ebit]
+    return {"ebit": ebit, "nopat": nopat}
+
 
-        ebit = current_revenue * ebit_margin
-        nopat = ebit * (1 - tax_rate)
+def project_fcff(
+    revenue_path: List[float],
+    nopat: List[float],
+    capex_pct: float,
+    nwc_pct: float
+) -> List[float]:
+    """FCFF per year: NOPAT - CapEx - ΔNWC."""
+    fcff_list: List[float] = []
+
+    for current_revenue, year_nopat in zip(revenue_path, nopat):
         capex = current_revenue * capex_pct
         delta_nwc = current_revenue * nwc_pct
+        fcff_list.append(year_nopat - capex - delta_nwc)
 
-        fcff = nopat - capex - delta_nwc
-        fcff_list.append(fcff)
+    return fcff_list
 
-        projections.append({
-            "year": year + 1,
-            "revenue": round(current_revenue, 2),
-            "ebit": round(ebit, 2),
-            "nopat": round(nopat, 2),
-            "fcff": round(fcff, 2)
-        })
 
-    # -----------------------------
-    # 5. DISCOUNT CASH FLOWS
-    # -----------------------------
-    discounted_fcff = [
-        fcff_list[t] / ((1 + wacc) ** (t + 1)) for t in range(years)
+def discount_fcff(fcff_list: List[float], wacc: float) -> List[float]:
+    """Present value of each projected FCFF."""
+    return [
+        fcff_list[t] / ((1 + wacc) ** (t + 1)) for t in range(len(fcff_list))
     ]
 
-    # Terminal value (Gordon Growth)
+
+def discount_terminal_value(
+    fcff_list: List[float],
+    wacc: float,
+    terminal_growth: float
+) -> float:
+    """Present value of the Gordon Growth terminal value."""
     if wacc <= terminal_growth:
         raise ValueError("WACC must be greater than terminal growth rate")
 
@@ -86,8 +338,16 @@ def calculate_dcf(inputs: Dict) -> Dict:
         fcff_list[-1] * (1 + terminal_growth)
     ) / (wacc - terminal_growth)
 
-    discounted_terminal = terminal_value / ((1 + wacc) ** years)
+    return terminal_value / ((1 + wacc) ** len(fcff_list))
 
+
+def equity_bridge(
+    discounted_fcff: List[float],
+    discounted_terminal: float,
+    net_debt: Optional[float],
+    shares_outstanding: Optional[float]
+) -> Dict[str, Optional[float]]:
+    """Enterprise value -> equity value -> value per share."""
     enterprise_value = sum(discounted_fcff) + discounted_terminal
 
     equity_value = None
@@ -98,12 +358,8 @@ def calculate_dcf(inputs: Dict) -> Dict:
     if equity_value is not None and shares_outstanding is not None:
         value_per_share = equity_value / shares_outstanding
 
-    # -----------------------------
-    # 6. FINAL OUTPUT
-    # -----------------------------
     return {
-        "projections": projections,
-        "enterprise_value": round(enterprise_value, 2),
-        "equity_value": round(equity_value, 2),
-        "value_per_share": round(value_per_share, 2)
+        "enterprise_value": enterprise_value,
+        "equity_value": equity_value,
+        "value_per_share": value_per_share,
     }
@@ -1,35 +1,132 @@
 import csv
 import io
-from typing import Dict, Any
+import json
+import zlib
+from typing import Dict, Any, Iterable, Iterator, List
 
+# Rows buffered per yielded chunk when streaming
+STREAM_BATCH_ROWS = 256
 
-def export_dcf_to_csv(dcf_result: Dict[str, Any]) -> str:
+
+def iter_csv_rows(rows: Iterable[List[Any]], batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[str]:
     """
-    Export DCF calculation result to CSV.
-    Returns CSV as string.
+    Encode rows as CSV text, yielding a chunk every `batch_rows` rows.
+    Memory stays bounded by one batch regardless of the result size.
     """
 
     output = io.StringIO()
     writer = csv.writer(output)
+    pending = 0
+
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+
+        if pending >= batch_rows:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            pending = 0
+
+    if pending:
+        yield output.getvalue()
+
+
+def iter_ndjson(records: Iterable[Dict[str, Any]], batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[str]:
+    """Encode records as newline-delimited JSON, one batch per chunk."""
 
-    # ---- Header
-    writer.writerow(["DCF PROJECTIONS"])
+    lines: List[str] = []
+    for record in records:
+        lines.append(json.dumps(record, separators=(",", ":")))
 
-    # ---- Projection table
-    projections = dcf_result.get("projections", [])
+        if len(lines) >= batch_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
 
-    if projections:
-        writer.writerow([])
-        writer.writerow(projections[0].keys())
+    if lines:
+        yield "\n".join(lines) + "\n"
 
+
+def iter_gzip(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Gzip a text stream incrementally (valid .gz output)."""
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _projection_rows(projections) -> Iterator[List[Any]]:
+    """Header + rows for row or columnar projections."""
+
+    if isinstance(projections, dict):
+        if projections:
+            yield list(projections.keys())
+            for row in zip(*projections.values()):
+                yield list(row)
+
+    elif projections:
+        yield list(projections[0].keys())
         for row in projections:
-            writer.writerow(row.values())
+            yield list(row.values())
+
+
+def iter_dcf_csv(dcf_result: Dict[str, Any]) -> Iterator[str]:
+    """
+    Stream a DCF calculation result as CSV.
+    Accepts row ("rows") or columnar ("columnar") projections.
+    """
+
+    def rows():
+        # ---- Header
+        yield ["DCF PROJECTIONS"]
+
+        # ---- Projection table
+        table = _projection_rows(dcf_result.get("projections", []))
+        header = next(table, None)
+        if header is not None:
+            yield []
+            yield header
+            yield from table
+
+        # ---- Summary
+        yield []
+        yield ["SUMMARY"]
+        yield ["Enterprise Value", dcf_result.get("enterprise_value")]
+        yield ["Equity Value", dcf_result.get("equity_value")]
+        yield ["Value Per Share", dcf_result.get("value_per_share")]
+
+    return iter_csv_rows(rows())
+
+
+def iter_dcf_records(dcf_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    DCF result as flat records for NDJSON export:
+    one {"type": "projection", ...} per year, then one {"type": "summary"}.
+    """
 
-    # ---- Summary
-    writer.writerow([])
-    writer.writerow(["SUMMARY"])
-    writer.writerow(["Enterprise Value", dcf_result.get("enterprise_value")])
-    writer.writerow(["Equity Value", dcf_result.get("equity_value")])
-    writer.writerow(["Value Per Share", dcf_result.get("value_per_share")])
+    table = _projection_rows(dcf_result.get("projections", []))
+    header = next(table, None)
+    if header is not None:
+        for row in table:
+            yield {"type": "projection", **dict(zip(header, row))}
+
+    yield {
+        "type": "summary",
+        "enterprise_value": dcf_result.get("enterprise_value"),
+        "equity_value": dcf_result.get("equity_value"),
+        "value_per_share": dcf_result.get("value_per_share"),
+    }
+
+
+def export_dcf_to_csv(dcf_result: Dict[str, Any]) -> str:
+    """
+    Export DCF calculation result to CSV.
+    Returns CSV as string.
+
+    Accepts row ("rows") or columnar ("columnar") projections.
+    """
 
-    return output.getvalue()
+    return "".join(iter_dcf_csv(dcf_result))
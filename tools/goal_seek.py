@@ -0,0 +1,383 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.dcf_batch import dcf_arrays
+from tools.dcf_calculator import calculate_dcf, normalize_inputs
+
+
+# Input -> default search bracket. wacc / terminal_growth brackets are
+# further clipped per row so the Gordon Growth denominator stays positive.
+SOLVABLE_INPUTS: Dict[str, Tuple[float, float]] = {
+    "revenue_growth": (-0.5, 1.0),
+    "ebit_margin": (-1.0, 1.0),
+    "tax_rate": (0.0, 1.0),
+    "capex_pct": (-1.0, 1.0),
+    "nwc_pct": (-1.0, 1.0),
+    "wacc": (0.0, 1.0),
+    "terminal_growth": (-0.5, 1.0),
+    # Solved in closed form (the metric is affine in them, or in 1 / shares)
+    "revenue": (0.0, np.inf),
+    "net_debt": (-np.inf, np.inf),
+    "shares_outstanding": (0.0, np.inf),
+}
+
+CLOSED_FORM_INPUTS = ("revenue", "net_debt", "shares_outstanding")
+
+# Metrics each bridge input can move (enterprise value depends on neither)
+BRIDGE_METRICS = {
+    "net_debt": ("equity_value", "value_per_share"),
+    "shares_outstanding": ("value_per_share",),
+}
+
+TARGET_METRICS = ("enterprise_value", "equity_value", "value_per_share")
+
+# Keeps wacc - terminal_growth away from zero while searching
+SPREAD_FLOOR = 1e-4
+
+
+def _evaluate(
+    params: Dict[str, np.ndarray],
+    solve_for: str,
+    x: np.ndarray,
+    metric: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Target metric for each row with `solve_for` set to x (unrounded), and
+    its exact derivative d metric / d x (vectorized dcf_gradients).
+    """
+
+    values = dict(params)
+    if solve_for == "revenue_growth":
+        values["revenue_growth"] = np.repeat(x[:, None], params["revenue_growth"].shape[1], axis=1)
+    else:
+        values[solve_for] = x
+    out = dcf_arrays(**values)
+
+    wacc, growth = values["wacc"], values["terminal_growth"]
+    years = out["fcff"].shape[1]
+    spread = wacc - growth
+    discount = (1 + wacc)[:, None] ** -np.arange(1, years + 1, dtype=float)
+    terminal_pv = out["discounted_terminal"]
+
+    # PV of one unit of FCFF margin across the horizon + terminal
+    revenue_pv = (out["revenue"] * discount).sum(axis=1) + (
+        out["revenue"][:, -1] * (1 + growth) / spread * discount[:, -1]
+    )
+
+    if solve_for == "revenue_growth":
+        # A flat growth rate moves every year: sum of the per-year gradients
+        tails = terminal_pv[:, None] + np.cumsum(out["discounted_fcff"][:, ::-1], axis=1)[:, ::-1]
+        slope = tails.sum(axis=1) / (1 + x)
+    elif solve_for == "ebit_margin":
+        slope = (1 - values["tax_rate"]) * revenue_pv
+    elif solve_for == "tax_rate":
+        slope = -values["ebit_margin"] * revenue_pv
+    elif solve_for in ("capex_pct", "nwc_pct"):
+        slope = -revenue_pv
+    elif solve_for == "wacc":
+        periods = np.arange(1, years + 1, dtype=float)
+        slope = (
+            -(periods * out["discounted_fcff"]).sum(axis=1) / (1 + wacc)
+            - terminal_pv * (1 / spread + years / (1 + wacc))
+        )
+    elif solve_for == "terminal_growth":
+        slope = terminal_pv * (1 + wacc) / ((1 + growth) * spread)
+    else:
+        raise ValueError(f"No Newton slope for '{solve_for}' (solved in closed form)")
+
+    # Chain through the equity bridge
+    if metric == "value_per_share":
+        slope = slope / values["shares_outstanding"]
+
+    return out[metric], slope
+
+
+def _solve_closed_form(
+    params: Dict[str, np.ndarray],
+    solve_for: str,
+    targets: np.ndarray,
+    metric: str,
+    low: float,
+    high: float
+) -> Dict[str, np.ndarray]:
+    """
+    Exact solution for inputs the metric is affine in (revenue, net_debt)
+    or inversely proportional to (shares_outstanding).
+    """
+
+    n = targets.shape[0]
+    if solve_for == "shares_outstanding":
+        # value_per_share = equity / shares
+        equity = dcf_arrays(**params)["equity_value"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = equity / targets
+    else:
+        # metric(x) = a * x + b
+        b = dcf_arrays(**{**params, solve_for: np.zeros(n)})[metric]
+        a = dcf_arrays(**{**params, solve_for: np.ones(n)})[metric] - b
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = (targets - b) / a
+
+    solved = np.isfinite(x) & (x > low) & (x < high)
+    x = np.where(solved, x, np.nan)
+    achieved = dcf_arrays(**{**params, solve_for: x})[metric]
+
+    return {
+        "x": x,
+        "achieved": achieved,
+        "iterations": np.zeros(n, dtype=int),
+        "converged": solved,
+        "bracketed": solved,
+    }
+
+
+def _solve_group(
+    params: Dict[str, np.ndarray],
+    solve_for: str,
+    targets: np.ndarray,
+    metric: str,
+    lo: np.ndarray,
+    hi: np.ndarray,
+    x0: np.ndarray,
+    tol: float,
+    max_iter: int
+) -> Dict[str, np.ndarray]:
+    """
+    Safeguarded Newton on N independent rows at once.
+
+    Each row keeps a sign-changing bracket; a Newton step that leaves the
+    bracket (or has no usable slope) falls back to bisection. Slopes are
+    closed-form (see _evaluate), not finite differences. Rows stop
+    updating once converged.
+    """
+
+    def f(x):
+        value, slope = _evaluate(params, solve_for, x, metric)
+        return value - targets, slope
+
+    n = targets.shape[0]
+    f_lo, f_hi = f(lo)[0], f(hi)[0]
+    bracketed = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+
+    x = np.where((x0 > lo) & (x0 < hi), x0, 0.5 * (lo + hi))
+    fx, slope = f(x)
+    scale = np.maximum(1.0, np.abs(targets))
+    converged = bracketed & (np.abs(fx) <= tol * scale)
+    active = bracketed & ~converged
+    iterations = np.zeros(n, dtype=int)
+
+    for _ in range(max_iter):
+        if not active.any():
+            break
+
+        iterations += active
+
+        # Newton step on the analytic slope (one DCF evaluation per iteration)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = x - fx / slope
+
+        use_newton = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        candidate = np.where(use_newton, newton, 0.5 * (lo + hi))
+        x = np.where(active, candidate, x)
+
+        f_new, slope_new = f(x)
+        fx = np.where(active, f_new, fx)
+        slope = np.where(active, slope_new, slope)
+
+        # Shrink brackets around the root
+        left = active & (np.sign(fx) == np.sign(f_lo))
+        right = active & ~left
+        lo, f_lo = np.where(left, x, lo), np.where(left, fx, f_lo)
+        hi, f_hi = np.where(right, x, hi), np.where(right, fx, f_hi)
+
+        done = active & ((np.abs(fx) <= tol * scale) | (hi - lo <= 1e-12))
+        converged |= done
+        active &= ~done
+
+    return {
+        "x": x,
+        "achieved": fx + targets,
+        "iterations": iterations,
+        "converged": converged,
+        "bracketed": bracketed,
+    }
+
+
+def _solve_newton(
+    params: Dict[str, np.ndarray],
+    solve_for: str,
+    targets: np.ndarray,
+    metric: str,
+    low: float,
+    high: float,
+    tol: float,
+    max_iter: int
+) -> Dict[str, np.ndarray]:
+    """Per-row brackets and starting points, then _solve_group."""
+
+    n = targets.shape[0]
+    lo, hi = np.full(n, float(low)), np.full(n, float(high))
+    if solve_for == "wacc":
+        lo = np.maximum(lo, params["terminal_growth"] + SPREAD_FLOOR)
+    if solve_for == "terminal_growth":
+        hi = np.minimum(hi, params["wacc"] - SPREAD_FLOOR)
+
+    if solve_for == "revenue_growth":
+        x0 = params["revenue_growth"].mean(axis=1)
+    else:
+        x0 = params[solve_for]
+
+    return _solve_group(params, solve_for, targets, metric, lo, hi, x0, tol, max_iter)
+
+
+def solve_implied_batch(
+    inputs_list: List[Dict[str, Any]],
+    targets: List[float],
+    solve_for: str,
+    target_metric: str = "value_per_share",
+    bounds: Optional[Tuple[float, float]] = None,
+    tol: float = 1e-8,
+    max_iter: int = 50
+) -> Dict[str, Any]:
+    """
+    Reverse DCF for N input sets in one vectorized call.
+
+    Finds the value of `solve_for` (any single DCF input except `years`)
+    that makes `target_metric` equal each row's target. A solved
+    revenue_growth is applied flat to every year; revenue, net_debt and
+    shares_outstanding are solved exactly (0 iterations). net_debt and
+    shares_outstanding cannot move enterprise_value (nor shares equity_value).
+
+    Each row reports value, iterations and status:
+    converged | max_iter | no_bracket | error
+    """
+
+    if solve_for not in SOLVABLE_INPUTS:
+        raise ValueError(
+            f"Cannot solve for '{solve_for}'. Supported: {list(SOLVABLE_INPUTS)} "
+            "(years is an integer horizon, not solvable)"
+        )
+    if target_metric not in TARGET_METRICS:
+        raise ValueError(f"Unsupported target metric: {target_metric}")
+    if len(inputs_list) != len(targets):
+        raise ValueError("inputs and targets must have the same length")
+    if solve_for in BRIDGE_METRICS and target_metric not in BRIDGE_METRICS[solve_for]:
+        raise ValueError(
+            f"{target_metric} does not depend on {solve_for}; "
+            f"solve it against {' or '.join(BRIDGE_METRICS[solve_for])}"
+        )
+
+    results: List[Dict[str, Any]] = [None] * len(inputs_list)
+    groups: Dict[int, List[int]] = {}
+    parsed: Dict[int, Dict[str, Any]] = {}
+
+    # -----------------------------
+    # 1. VALIDATE + GROUP BY HORIZON
+    # -----------------------------
+    for index, inputs in enumerate(inputs_list):
+        try:
+            # The input being solved for is replaced, so it is not validated
+            params = normalize_inputs(inputs, check_discount=solve_for not in ("wacc", "terminal_growth"))
+            if target_metric != "enterprise_value" and params["net_debt"] is None and solve_for != "net_debt":
+                raise ValueError(f"net_debt is required to solve for {target_metric}")
+            if (
+                target_metric == "value_per_share"
+                and params["shares_outstanding"] is None
+                and solve_for != "shares_outstanding"
+            ):
+                raise ValueError("shares_outstanding is required to solve for value_per_share")
+        except Exception as e:
+            results[index] = {"value": None, "iterations": 0, "status": "error", "error": str(e)}
+            continue
+
+        parsed[index] = params
+        groups.setdefault(params["years"], []).append(index)
+
+    # -----------------------------
+    # 2. SOLVE EACH GROUP
+    # -----------------------------
+    low, high = bounds or SOLVABLE_INPUTS[solve_for]
+
+    for indices in groups.values():
+        rows = [parsed[i] for i in indices]
+
+        def column(key):
+            return np.array(
+                [np.nan if row[key] is None else row[key] for row in rows],
+                dtype=float
+            )
+
+        params = {
+            "revenue": column("revenue"),
+            "revenue_growth": np.array([row["revenue_growth"] for row in rows], dtype=float),
+            "ebit_margin": column("ebit_margin"),
+            "tax_rate": column("tax_rate"),
+            "capex_pct": column("capex_pct"),
+            "nwc_pct": column("nwc_pct"),
+            "wacc": column("wacc"),
+            "terminal_growth": column("terminal_growth"),
+            "net_debt": column("net_debt"),
+            "shares_outstanding": column("shares_outstanding"),
+        }
+
+        group_targets = np.array([targets[i] for i in indices], dtype=float)
+        if solve_for in CLOSED_FORM_INPUTS:
+            out = _solve_closed_form(params, solve_for, group_targets, target_metric, low, high)
+        else:
+            out = _solve_newton(params, solve_for, group_targets, target_metric, low, high, tol, max_iter)
+
+        for position, index in enumerate(indices):
+            if not out["bracketed"][position]:
+                status = "no_bracket"
+            elif out["converged"][position]:
+                status = "converged"
+            else:
+                status = "max_iter"
+
+            solved = status != "no_bracket"
+            results[index] = {
+                "value": float(out["x"][position]) if solved else None,
+                "achieved": float(out["achieved"][position]) if solved else None,
+                "iterations": int(out["iterations"][position]),
+                "status": status,
+            }
+
+    return {
+        "solve_for": solve_for,
+        "target_metric": target_metric,
+        "results": results,
+        "converged": sum(1 for result in results if result["status"] == "converged"),
+        "count": len(results),
+    }
+
+
+def solve_implied_input(
+    inputs: Dict[str, Any],
+    target: float,
+    solve_for: str,
+    target_metric: str = "value_per_share",
+    bounds: Optional[Tuple[float, float]] = None,
+    tol: float = 1e-8,
+    max_iter: int = 50
+) -> Dict[str, Any]:
+    """
+    Reverse DCF for a single input set.
+
+    e.g. "what revenue growth is the market pricing in at $X per share?"
+    On convergence the solved input is re-run through calculate_dcf and
+    the full valuation is returned alongside the solution.
+    """
+
+    result = solve_implied_batch(
+        [inputs], [target], solve_for, target_metric, bounds, tol, max_iter
+    )["results"][0]
+
+    if result["status"] == "error":
+        raise ValueError(result["error"])
+
+    result = {"solve_for": solve_for, "target_metric": target_metric, "target": target, **result}
+    if result["status"] == "converged":
+        result["valuation"] = calculate_dcf({**inputs, solve_for: result["value"]})
+
+    return result
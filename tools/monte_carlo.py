@@ -0,0 +1,339 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools.dcf_batch import dcf_arrays
+from tools.dcf_calculator import normalize_inputs
+
+
+# Inputs that may be given as distributions
+STOCHASTIC_INPUTS = (
+    "revenue_growth",
+    "ebit_margin",
+    "wacc",
+    "terminal_growth",
+    "capex_pct",
+    "nwc_pct",
+)
+
+MAX_PATHS = 2_000_000
+DEFAULT_MAX_MEMORY_MB = 64
+DEFAULT_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+# Percentiles are within this relative error of the exact (all-paths) ones
+SUMMARY_RELATIVE_ACCURACY = 0.0005
+
+# |value| below this counts as zero in the percentile sketch
+ZERO_THRESHOLD = 1e-12
+
+
+def _norm_cdf(z: np.ndarray) -> np.ndarray:
+    """
+    Standard normal CDF (Abramowitz & Stegun 7.1.26, |error| < 1.5e-7).
+    Only used to map correlated normals onto non-normal marginals.
+    """
+
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+def _sample_marginal(name: str, spec: Dict[str, Any], z: np.ndarray) -> np.ndarray:
+    """
+    Map standard normal draws onto the requested marginal distribution.
+
+    Supported:
+    - {"dist": "normal", "mean", "std"}
+    - {"dist": "lognormal", "mu", "sigma"}  (parameters of log(x))
+    - {"dist": "uniform", "low", "high"}
+    - {"dist": "triangular", "low", "mode", "high"}
+    - optional "min" / "max" clip on any of the above
+    """
+
+    dist = spec.get("dist", "normal")
+
+    if dist == "normal":
+        values = spec["mean"] + spec["std"] * z
+
+    elif dist == "lognormal":
+        values = np.exp(spec["mu"] + spec["sigma"] * z)
+
+    elif dist == "uniform":
+        low, high = spec["low"], spec["high"]
+        values = low + (high - low) * _norm_cdf(z)
+
+    elif dist == "triangular":
+        low, mode, high = spec["low"], spec["mode"], spec["high"]
+        if not low <= mode <= high or low == high:
+            raise ValueError(f"Invalid triangular bounds for '{name}'")
+        u = _norm_cdf(z)
+        split = (mode - low) / (high - low)
+        values = np.where(
+            u < split,
+            low + np.sqrt(u * (high - low) * (mode - low)),
+            high - np.sqrt((1 - u) * (high - low) * (high - mode))
+        )
+
+    else:
+        raise ValueError(f"Unsupported distribution '{dist}' for '{name}'")
+
+    if "min" in spec or "max" in spec:
+        values = np.clip(values, spec.get("min"), spec.get("max"))
+
+    return values
+
+
+def _cholesky(variables: List[str], correlation: Optional[Dict[str, Any]]) -> np.ndarray:
+    """
+    Build the lower-triangular factor for the stochastic variables.
+    Variables not named in `correlation` are independent.
+    """
+
+    k = len(variables)
+    matrix = np.eye(k)
+
+    if correlation:
+        names = correlation["variables"]
+        given = np.asarray(correlation["matrix"], dtype=float)
+
+        if given.shape != (len(names), len(names)):
+            raise ValueError("correlation matrix shape must match correlation variables")
+        if not np.allclose(given, given.T) or not np.allclose(np.diag(given), 1.0):
+            raise ValueError("correlation matrix must be symmetric with a unit diagonal")
+
+        for i, a in enumerate(names):
+            for j, b in enumerate(names):
+                if a not in variables or b not in variables:
+                    raise ValueError(f"Correlated variable has no distribution: {a if a not in variables else b}")
+                matrix[variables.index(a), variables.index(b)] = given[i, j]
+
+    try:
+        return np.linalg.cholesky(matrix)
+    except np.linalg.LinAlgError:
+        raise ValueError("correlation matrix must be positive definite")
+
+
+class _Buckets:
+    """Dense counts for a contiguous range of integer bucket keys, grown on demand."""
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, keys: np.ndarray):
+        if keys.size == 0:
+            return
+        low, high = int(keys.min()), int(keys.max())
+        if self.counts.size == 0:
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+        elif low < self.offset or high >= self.offset + self.counts.size:
+            new_offset = min(low, self.offset)
+            counts = np.zeros(max(high + 1, self.offset + self.counts.size) - new_offset, dtype=np.int64)
+            counts[self.offset - new_offset:self.offset - new_offset + self.counts.size] = self.counts
+            self.offset, self.counts = new_offset, counts
+        self.counts += np.bincount(keys - self.offset, minlength=self.counts.size)
+
+
+class StreamingDistribution:
+    """
+    Fixed-memory summary of a stream of values (added chunk by chunk).
+
+    - count / mean / variance merged per chunk (Chan et al.), running min / max
+    - quantile sketch: values bucketed by log(|value|) (DDSketch), so any
+      percentile is within `relative_accuracy` of the exact one, however
+      heavy the tails
+    Memory depends on the dynamic range of the values, not their count:
+    at most a few MB even for values spanning 1e-12 .. 1e300.
+    """
+
+    def __init__(self, relative_accuracy: float = SUMMARY_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive = _Buckets()
+        self.negative = _Buckets()
+        self.zeros = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values: np.ndarray):
+        if values.size == 0:
+            return
+
+        # Moments
+        n = values.size
+        mean = float(values.mean())
+        m2 = float(np.square(values - mean).sum())
+        delta = mean - self.mean
+        total = self.count + n
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        # Sketch
+        magnitude = np.abs(values)
+        nonzero = magnitude > ZERO_THRESHOLD
+        self.zeros += int(n - nonzero.sum())
+        keys = np.ceil(np.log(magnitude[nonzero]) / self.log_gamma).astype(np.int64)
+        positive = values[nonzero] > 0
+        self.positive.add(keys[positive])
+        self.negative.add(keys[~positive])
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / self.count)) if self.count else float("nan")
+
+    def _ordered(self):
+        """(representative value, count) of every bucket, ascending."""
+        negative = -2 * self.gamma ** (np.arange(self.negative.counts.size) + self.negative.offset) / (self.gamma + 1)
+        positive = 2 * self.gamma ** (np.arange(self.positive.counts.size) + self.positive.offset) / (self.gamma + 1)
+        values = np.concatenate([negative[::-1], [0.0], positive])
+        counts = np.concatenate([self.negative.counts[::-1], [self.zeros], self.positive.counts])
+        return values, counts
+
+    def percentiles(self, levels: List[float]) -> List[float]:
+        values, counts = self._ordered()
+        cumulative = np.cumsum(counts)
+        ranks = np.asarray(levels, dtype=float) / 100 * (self.count - 1)
+        index = np.searchsorted(cumulative, ranks, side="right")
+        result = np.clip(values[np.minimum(index, values.size - 1)], self.min, self.max)
+        # The extremes are tracked exactly
+        result[ranks <= 0] = self.min
+        result[ranks >= self.count - 1] = self.max
+        return result.tolist()
+
+    def histogram(self, bins: int) -> Dict[str, List]:
+        """`bins` equal bins over [min, max], filled from the sketch buckets."""
+        values, counts = self._ordered()
+        edges = np.linspace(self.min, self.max, bins + 1)
+        index = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+        return {
+            "counts": np.bincount(index, weights=counts, minlength=bins).astype(np.int64).tolist(),
+            "bin_edges": [round(float(edge), 4) for edge in edges],
+        }
+
+
+def run_monte_carlo(
+    base_inputs: Dict[str, Any],
+    distributions: Dict[str, Dict[str, Any]],
+    paths: int = 100_000,
+    seed: Optional[int] = None,
+    correlation: Optional[Dict[str, Any]] = None,
+    percentiles: Optional[List[float]] = None,
+    bins: int = 50,
+    max_memory_mb: float = DEFAULT_MAX_MEMORY_MB,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo DCF valuation.
+
+    - base_inputs: full DCF input set (fixed inputs)
+    - distributions: input name -> distribution spec (see _sample_marginal)
+    - correlation: {"variables": [...], "matrix": [[...]]} (Gaussian copula)
+    - a sampled revenue_growth applies to every projection year
+
+    Paths are valued in vectorized chunks sized so the working set stays
+    under `max_memory_mb`; each chunk is folded into a StreamingDistribution,
+    so no per-path values are kept and memory does not grow with `paths`.
+    Same seed + max_memory_mb -> same result.
+    """
+
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f"paths must be between 1 and {MAX_PATHS}")
+    if isinstance(bins, bool) or not isinstance(bins, int) or bins < 1:
+        raise ValueError("bins must be a positive integer")
+
+    levels = list(percentiles or DEFAULT_PERCENTILES)
+    if not all(isinstance(level, (int, float)) and 0 <= level <= 100 for level in levels):
+        raise ValueError("percentiles must be numbers between 0 and 100")
+
+    unknown = set(distributions) - set(STOCHASTIC_INPUTS)
+    if unknown:
+        raise ValueError(f"Unsupported stochastic inputs: {sorted(unknown)}")
+
+    base = normalize_inputs(base_inputs)
+    if base["shares_outstanding"] is None or base["net_debt"] is None:
+        raise ValueError("Monte Carlo requires shares_outstanding and net_debt")
+
+    variables = [name for name in STOCHASTIC_INPUTS if name in distributions]
+    chol = _cholesky(variables, correlation)
+    rng = np.random.default_rng(seed)
+    years = base["years"]
+
+    # -----------------------------
+    # 1. CHUNK SIZE FROM MEMORY CEILING
+    # -----------------------------
+    # ~10 (paths, years) float64 work arrays + ~20 per-path vectors
+    bytes_per_path = 8 * (10 * years + 20 + len(variables))
+    chunk_size = max(1, int(max_memory_mb * 1024 * 1024) // bytes_per_path)
+
+    summary = StreamingDistribution()
+    ev_sum = 0.0
+
+    # -----------------------------
+    # 2. SIMULATE
+    # -----------------------------
+    for start in range(0, paths, chunk_size):
+        n = min(chunk_size, paths - start)
+        params = {name: base[name] for name in STOCHASTIC_INPUTS}
+
+        if variables:
+            z = rng.standard_normal((n, len(variables))) @ chol.T
+            for i, name in enumerate(variables):
+                params[name] = _sample_marginal(name, distributions[name], z[:, i])
+
+        growth = params["revenue_growth"]
+        if "revenue_growth" in variables:
+            growth = np.repeat(growth[:, None], years, axis=1)
+        else:
+            growth = np.broadcast_to(np.asarray(growth, dtype=float), (n, years))
+
+        out = dcf_arrays(
+            revenue=base["revenue"],
+            revenue_growth=growth,
+            ebit_margin=params["ebit_margin"],
+            tax_rate=base["tax_rate"],
+            capex_pct=params["capex_pct"],
+            nwc_pct=params["nwc_pct"],
+            wacc=params["wacc"],
+            terminal_growth=params["terminal_growth"],
+            net_debt=base["net_debt"],
+            shares_outstanding=base["shares_outstanding"],
+        )
+
+        # Paths where sampled wacc <= terminal_growth have no terminal value
+        value_per_share = out["value_per_share"]
+        summary.add(value_per_share[np.isfinite(value_per_share)])
+        ev_sum += float(np.nansum(out["enterprise_value"]))
+
+    # -----------------------------
+    # 3. SUMMARIZE
+    # -----------------------------
+    if summary.count == 0:
+        raise ValueError("No valid paths: sampled WACC never exceeded terminal growth")
+
+    return {
+        "paths": paths,
+        "valid_paths": summary.count,
+        "invalid_paths": paths - summary.count,
+        "seed": seed,
+        "chunk_size": chunk_size,
+        "value_per_share": {
+            "mean": round(summary.mean, 2),
+            "std": round(summary.std, 2),
+            "min": round(summary.min, 2),
+            "max": round(summary.max, 2),
+            "percentiles": {
+                str(level): round(float(value), 2)
+                for level, value in zip(levels, summary.percentiles(levels))
+            },
+            "histogram": summary.histogram(bins),
+        },
+        "enterprise_value_mean": round(ev_sum / summary.count, 2),
+    }
@@ -1,47 +1,179 @@
-from typing import Dict, Any
-from copy import deepcopy
-from tools.dcf_calculator import calculate_dcf
+from typing import Dict, Any, List, Tuple
+from tools.dcf_calculator import (
+    OUTPUT_FORMATS,
+    maybe_round,
+    normalize_inputs,
+    project_revenue,
+    project_operating_lines,
+    project_fcff,
+    discount_fcff,
+    discount_terminal_value,
+    equity_bridge,
+)
+
+
+# Stage -> (input keys it reads, upstream stages), in evaluation order.
+# A scenario recomputes a stage only if one of these changed.
+DCF_STAGES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "revenue_path": (("revenue", "revenue_growth"), ()),
+    "operating_lines": (("ebit_margin", "tax_rate"), ("revenue_path",)),
+    "fcff": (("capex_pct", "nwc_pct"), ("revenue_path", "operating_lines")),
+    "discounting": (("wacc",), ("fcff",)),
+    "terminal_value": (("wacc", "terminal_growth"), ("fcff",)),
+    "equity_bridge": (("net_debt", "shares_outstanding"), ("discounting", "terminal_value")),
+}
+
+
+def _freeze(value: Any) -> Any:
+    """Hashable form of an input value (lists -> tuples)."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class StagedDCF:
+    """
+    DCF split into cached stages.
+
+    Each stage is memoized on its own inputs plus the cache keys of its
+    upstream stages, so an evaluation only recomputes stages downstream of
+    what actually changed. One instance is shared across a scenario book.
+    """
+
+    def __init__(self):
+        self._cache: Dict[Tuple, Any] = {}
+
+    def _compute(self, stage: str, params: Dict[str, Any], upstream: Dict[str, Any]) -> Any:
+        if stage == "revenue_path":
+            return project_revenue(params["revenue"], params["revenue_growth"])
+
+        if stage == "operating_lines":
+            return project_operating_lines(
+                upstream["revenue_path"], params["ebit_margin"], params["tax_rate"]
+            )
+
+        if stage == "fcff":
+            return project_fcff(
+                upstream["revenue_path"],
+                upstream["operating_lines"]["nopat"],
+                params["capex_pct"],
+                params["nwc_pct"]
+            )
+
+        if stage == "discounting":
+            return discount_fcff(upstream["fcff"], params["wacc"])
+
+        if stage == "terminal_value":
+            return discount_terminal_value(
+                upstream["fcff"], params["wacc"], params["terminal_growth"]
+            )
+
+        if stage == "equity_bridge":
+            return equity_bridge(
+                upstream["discounting"],
+                upstream["terminal_value"],
+                params["net_debt"],
+                params["shares_outstanding"]
+            )
+
+        raise ValueError(f"Unknown DCF stage: {stage}")
+
+    def evaluate(self, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Evaluate one input set.
+        Returns (stage outputs, names of stages served from cache).
+        """
+
+        params = normalize_inputs(inputs)
+        outputs: Dict[str, Any] = {}
+        keys: Dict[str, Tuple] = {}
+        reused: List[str] = []
+
+        for stage, (input_keys, upstream_stages) in DCF_STAGES.items():
+            key = (
+                stage,
+                tuple(_freeze(params[name]) for name in input_keys),
+                tuple(keys[name] for name in upstream_stages),
+            )
+            keys[stage] = key
+
+            if key in self._cache:
+                reused.append(stage)
+            else:
+                upstream = {name: outputs[name] for name in upstream_stages}
+                self._cache[key] = self._compute(stage, params, upstream)
+
+            outputs[stage] = self._cache[key]
+
+        return outputs, reused
+
+
+def _summarize(outputs: Dict[str, Any], reused: List[str], round_output: bool) -> Dict[str, Any]:
+    bridge = outputs["equity_bridge"]
+    return {
+        "enterprise_value": maybe_round(bridge["enterprise_value"], round_output),
+        "equity_value": maybe_round(bridge["equity_value"], round_output),
+        "value_per_share": maybe_round(bridge["value_per_share"], round_output),
+        "reused_stages": reused,
+    }
+
+
+def to_columnar(results: Dict[str, Dict[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    scenario -> metrics dict  =>  {"scenario": [...], <metric>: [...]}
+    """
+
+    columns: Dict[str, List[Any]] = {"scenario": list(results)}
+    for metrics in results.values():
+        for key in metrics:
+            columns.setdefault(key, [])
+    for key in list(columns)[1:]:
+        columns[key] = [metrics.get(key) for metrics in results.values()]
+    return columns
 
 
 def run_scenario_analysis(
     base_inputs: Dict[str, Any],
-    scenarios: Dict[str, Dict[str, Any]]
+    scenarios: Dict[str, Dict[str, Any]],
+    output_format: str = "rows",
+    round_output: bool = True
 ) -> Dict[str, Any]:
     """
     Runs DCF valuation across multiple scenarios.
 
     - base_inputs: full DCF input set
     - scenarios: dict of scenario_name -> input overrides
+    - output_format: "rows" (scenario -> metrics) or "columnar"
+      ({"scenario": [...], "enterprise_value": [...], ...})
+    - round_output: False returns unrounded floats
+
+    Stages are cached across the whole book (see StagedDCF), so a scenario
+    that only overrides e.g. net_debt reuses every projection and discounting
+    stage. Each scenario reports which stages were reused.
     """
 
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format: {output_format}")
+
     results = {}
+    engine = StagedDCF()
 
     # -----------------------------
     # Base case
     # -----------------------------
-    base_result = calculate_dcf(base_inputs)
-    results["base"] = {
-        "enterprise_value": base_result["enterprise_value"],
-        "equity_value": base_result["equity_value"],
-        "value_per_share": base_result["value_per_share"],
-    }
+    results["base"] = _summarize(*engine.evaluate(base_inputs), round_output)
 
     # -----------------------------
     # Scenario cases
     # -----------------------------
     for scenario_name, overrides in scenarios.items():
-        scenario_inputs = deepcopy(base_inputs)
-
-        # Apply overrides
-        for key, value in overrides.items():
-            scenario_inputs[key] = value
-
-        scenario_result = calculate_dcf(scenario_inputs)
+        # Stages never mutate inputs, so a shallow merge is enough
+        scenario_inputs = {**base_inputs, **overrides}
+        results[scenario_name] = _summarize(*engine.evaluate(scenario_inputs), round_output)
 
-        results[scenario_name] = {
-            "enterprise_value": scenario_result["enterprise_value"],
-            "equity_value": scenario_result["equity_value"],
-            "value_per_share": scenario_result["value_per_share"],
-        }
+    if output_format == "columnar":
+        return to_columnar(results)
 
     return results
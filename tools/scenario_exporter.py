@@ -1,6 +1,48 @@
-import csv
-import io
-from typing import Dict, Any
+from typing import Dict, Any, Iterator
+
+from tools.exporter import iter_csv_rows
+
+SCENARIO_COLUMNS = ["enterprise_value", "equity_value", "value_per_share"]
+
+# Grids in a run_sensitivity_grid result that can be exported
+SENSITIVITY_METRICS = ("enterprise_value", "equity_value", "value_per_share")
+
+
+def _scenario_rows(scenario_result: Dict[str, Any]) -> Iterator[tuple]:
+    """
+    (scenario, metrics) pairs from either layout:
+    {"base": {...}, ...} or {"scenario": [...], "enterprise_value": [...], ...}
+    """
+
+    if isinstance(scenario_result.get("scenario"), list):
+        columns = {key: values for key, values in scenario_result.items() if key != "scenario"}
+        for i, scenario in enumerate(scenario_result["scenario"]):
+            yield scenario, {key: values[i] for key, values in columns.items()}
+    else:
+        yield from scenario_result.items()
+
+
+def iter_scenario_csv(scenario_result: Dict[str, Any]) -> Iterator[str]:
+    """
+    Stream scenario analysis output as CSV (see export_scenario_to_csv).
+    """
+
+    def rows():
+        # Header
+        yield ["scenario"] + SCENARIO_COLUMNS
+
+        # Rows
+        for scenario, metrics in _scenario_rows(scenario_result):
+            yield [scenario] + [metrics.get(column) for column in SCENARIO_COLUMNS]
+
+    return iter_csv_rows(rows())
+
+
+def iter_scenario_records(scenario_result: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """One flat record per scenario, for NDJSON export."""
+
+    for scenario, metrics in _scenario_rows(scenario_result):
+        yield {"scenario": scenario, **{column: metrics.get(column) for column in SCENARIO_COLUMNS}}
 
 
 def export_scenario_to_csv(scenario_result: Dict[str, Any]) -> str:
@@ -13,26 +55,52 @@ def export_scenario_to_csv(scenario_result: Dict[str, Any]) -> str:
         "bull": {...},
         "bear": {...}
     }
+    or the columnar layout:
+    {
+        "scenario": ["base", "bull", "bear"],
+        "enterprise_value": [...],
+        ...
+    }
     """
 
-    output = io.StringIO()
-    writer = csv.writer(output)
+    return "".join(iter_scenario_csv(scenario_result))
 
-    # Header
-    writer.writerow([
-        "scenario",
-        "enterprise_value",
-        "equity_value",
-        "value_per_share"
-    ])
 
-    # Rows
-    for scenario, metrics in scenario_result.items():
-        writer.writerow([
-            scenario,
-            metrics.get("enterprise_value"),
-            metrics.get("equity_value"),
-            metrics.get("value_per_share")
-        ])
+def iter_sensitivity_csv(
+    sensitivity_result: Dict[str, Any],
+    metric: str = "value_per_share"
+) -> Iterator[str]:
+    """
+    Stream a WACC x terminal-growth sensitivity table as CSV.
+
+    Rows are WACC values, columns are terminal growth values.
+    Invalid cells (WACC <= terminal growth) are left empty.
+    """
+
+    # Validated before streaming starts, so errors never surface mid-response
+    if metric not in SENSITIVITY_METRICS:
+        raise ValueError(f"Unknown sensitivity metric: {metric} (expected one of {', '.join(SENSITIVITY_METRICS)})")
+    grid = sensitivity_result.get(metric)
+    if grid is None:
+        raise ValueError(f"Sensitivity result has no '{metric}' grid")
+
+    def rows():
+        # Header
+        yield [f"wacc \\ terminal_growth ({metric})"] + sensitivity_result["terminal_growth"]
+
+        # Rows
+        for wacc, row in zip(sensitivity_result["wacc"], grid):
+            yield [wacc] + ["" if value is None else value for value in row]
+
+    return iter_csv_rows(rows())
+
+
+def export_sensitivity_to_csv(
+    sensitivity_result: Dict[str, Any],
+    metric: str = "value_per_share"
+) -> str:
+    """
+    Convert a sensitivity grid into a CSV string.
+    """
 
-    return output.getvalue()
+    return "".join(iter_sensitivity_csv(sensitivity_result, metric))
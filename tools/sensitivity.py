@@ -0,0 +1,155 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from tools.dcf_batch import dcf_arrays
+from tools.dcf_calculator import calculate_dcf, normalize_inputs
+
+
+def _to_grid(values: np.ndarray) -> List[List[Optional[float]]]:
+    """Round a 2D array for JSON, mapping NaN (invalid cells) to None."""
+    return [
+        [None if value != value else round(value, 2) for value in row]
+        for row in values.tolist()
+    ]
+
+
+def run_sensitivity_grid(
+    base_inputs: Dict[str, Any],
+    wacc_values: List[float],
+    terminal_growth_values: List[float]
+) -> Dict[str, Any]:
+    """
+    WACC x terminal-growth sensitivity table.
+
+    Projections do not depend on WACC or terminal growth, so FCFF is
+    computed once and the whole M x K grid is evaluated in closed form
+    with one broadcast pass. Cells where wacc <= terminal_growth are None.
+    """
+
+    if not wacc_values or not terminal_growth_values:
+        raise ValueError("wacc_values and terminal_growth_values must be non-empty")
+
+    # The base wacc / terminal_growth are replaced by the grid, so only
+    # the other inputs are validated; invalid cells come back as None
+    base = normalize_inputs(base_inputs, check_discount=False)
+    years = base["years"]
+
+    # -----------------------------
+    # 1. PROJECTIONS (ONCE)
+    # -----------------------------
+    fcff = dcf_arrays(
+        revenue=base["revenue"],
+        revenue_growth=[base["revenue_growth"]],
+        ebit_margin=base["ebit_margin"],
+        tax_rate=base["tax_rate"],
+        capex_pct=base["capex_pct"],
+        nwc_pct=base["nwc_pct"],
+        wacc=base["wacc"],
+        terminal_growth=base["terminal_growth"],
+    )["fcff"][0]
+
+    # -----------------------------
+    # 2. GRID (M x K)
+    # -----------------------------
+    wacc = np.asarray(wacc_values, dtype=float)[:, None]
+    growth = np.asarray(terminal_growth_values, dtype=float)[None, :]
+
+    discount = (1 + wacc) ** np.arange(1, years + 1, dtype=float)
+    pv_fcff = np.zeros((wacc.shape[0], 1))
+    for year in range(years):
+        pv_fcff = pv_fcff + fcff[year] / discount[:, year:year + 1]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terminal_value = (fcff[-1] * (1 + growth)) / (wacc - growth)
+    terminal_value = np.where(wacc > growth, terminal_value, np.nan)
+
+    enterprise_value = pv_fcff + terminal_value / discount[:, -1:]
+
+    # -----------------------------
+    # 3. EQUITY BRIDGE
+    # -----------------------------
+    net_debt = np.nan if base["net_debt"] is None else base["net_debt"]
+    shares = np.nan if base["shares_outstanding"] is None else base["shares_outstanding"]
+    equity_value = enterprise_value - net_debt
+    value_per_share = equity_value / shares
+
+    return {
+        "wacc": [float(value) for value in wacc_values],
+        "terminal_growth": [float(value) for value in terminal_growth_values],
+        "enterprise_value": _to_grid(enterprise_value),
+        "equity_value": _to_grid(equity_value),
+        "value_per_share": _to_grid(value_per_share),
+    }
+
+
+# Inputs shown on a tornado chart
+TORNADO_INPUTS = (
+    "revenue",
+    "revenue_growth",
+    "ebit_margin",
+    "tax_rate",
+    "capex_pct",
+    "nwc_pct",
+    "wacc",
+    "terminal_growth",
+    "net_debt",
+    "shares_outstanding",
+)
+
+
+def build_tornado(
+    base_inputs: Dict[str, Any],
+    shocks: Optional[Dict[str, float]] = None,
+    relative_shock: float = 0.10,
+    metric: str = "value_per_share"
+) -> Dict[str, Any]:
+    """
+    Tornado report from one gradient evaluation.
+
+    - shocks: input -> absolute +/- bump (default: relative_shock x base value)
+    - a revenue_growth shock shifts every projection year
+
+    Impacts are first-order (gradient x shock), so one DCF evaluation
+    replaces 2 x (number of inputs) perturbed runs.
+    """
+
+    valuation = calculate_dcf(base_inputs, return_gradients=True)
+    gradients = valuation["gradients"].get(metric)
+    if gradients is None:
+        raise ValueError(f"Gradients unavailable for metric: {metric}")
+
+    params = normalize_inputs(base_inputs)
+    shocks = shocks or {}
+    bars = []
+
+    for name in TORNADO_INPUTS:
+        base_value = params[name]
+        if base_value is None:
+            continue
+
+        gradient = gradients[name]
+        if name == "revenue_growth":
+            base_value = sum(base_value) / len(base_value)
+            gradient = sum(gradient)
+
+        shock = shocks.get(name, abs(base_value) * relative_shock)
+        impact = gradient * shock
+
+        bars.append({
+            "input": name,
+            "base": base_value,
+            "shock": shock,
+            "low": round(valuation[metric] - abs(impact), 2),
+            "high": round(valuation[metric] + abs(impact), 2),
+            "impact": round(abs(impact), 2),
+            "gradient": gradient,
+        })
+
+    bars.sort(key=lambda bar: bar["impact"], reverse=True)
+
+    return {
+        "metric": metric,
+        "base_value": valuation[metric],
+        "bars": bars,
+    }
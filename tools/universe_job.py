@@ -0,0 +1,351 @@
+import argparse
+import csv
+import itertools
+import json
+import mmap
+import os
+import resource
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from dotenv import load_dotenv
+
+from tools.dcf_batch import dcf_arrays
+from tools.dcf_calculator import DCF_DEFAULTS
+from core.logging import logger
+from core.paths import resolve_under
+
+load_dotenv()
+
+DEFAULT_CHUNK_ROWS = 10_000
+
+# API callers may only read and write universe files under this directory
+UNIVERSE_DATA_DIR = os.getenv("UNIVERSE_DATA_DIR", "data/universe")
+
+# Numeric input columns; any that are missing fall back to DCF_DEFAULTS.
+# revenue_growth is a single (flat) rate per row in the universe file.
+INPUT_COLUMNS = (
+    "revenue",
+    "shares_outstanding",
+    "net_debt",
+    "years",
+    "revenue_growth",
+    "ebit_margin",
+    "tax_rate",
+    "capex_pct",
+    "nwc_pct",
+    "wacc",
+    "terminal_growth",
+)
+
+OUTPUT_COLUMNS = ("ticker", "enterprise_value", "equity_value", "value_per_share", "status")
+
+TICKER_DTYPE = "U16"
+
+
+# -----------------------------
+# READERS (memory-mapped, chunked)
+# -----------------------------
+def _to_float(name: str, values: List[str], errors: List[Optional[str]]) -> np.ndarray:
+    """Parse one column; an unparsable cell becomes NaN and sets that row's error."""
+
+    parsed = np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        if not value.strip():
+            continue
+        try:
+            parsed[i] = float(value)
+        except ValueError:
+            if errors[i] is None:
+                errors[i] = f"Invalid number in column {name}: {value!r}"
+    return parsed
+
+
+def _data_lines(mm: mmap.mmap) -> Iterator[bytes]:
+    """Data lines after the header; blank lines are skipped (shared by reader and row count)."""
+
+    while True:
+        line = mm.readline()
+        if not line:
+            return
+        if line.strip():
+            yield line
+
+
+def _iter_csv_chunks(path: str, chunk_rows: int) -> Iterator[Dict[str, Any]]:
+    """
+    Yield column chunks from a CSV file read through mmap.
+    `_errors` holds a per-row message for rows that cannot be valued as
+    read (wrong field count, unparsable number); those rows are not
+    filled in with defaults.
+    """
+
+    if os.path.getsize(path) == 0:
+        return
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header = next(csv.reader([mm.readline().decode("utf-8")]))
+        lines = _data_lines(mm)
+
+        while True:
+            batch = [line.decode("utf-8") for line in itertools.islice(lines, chunk_rows)]
+            if not batch:
+                return
+
+            rows = list(csv.reader(batch))
+            errors: List[Optional[str]] = [None] * len(rows)
+            for i, row in enumerate(rows):
+                if len(row) != len(header):
+                    errors[i] = f"Row has {len(row)} fields, expected {len(header)}"
+                    rows[i] = (row + [""] * len(header))[:len(header)]
+
+            columns = dict(zip(header, zip(*rows)))
+
+            chunk: Dict[str, Any] = {"_rows": len(rows), "_errors": errors}
+            if "ticker" in columns:
+                chunk["ticker"] = list(columns["ticker"])
+            for name in INPUT_COLUMNS:
+                if name in columns:
+                    chunk[name] = _to_float(name, list(columns[name]), errors)
+            yield chunk
+
+
+def _iter_npy_chunks(path: str, chunk_rows: int) -> Iterator[Dict[str, Any]]:
+    """Yield column chunks from a directory of <column>.npy files (mmap)."""
+
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+        for name in ("ticker",) + INPUT_COLUMNS
+        if os.path.exists(os.path.join(path, f"{name}.npy"))
+    }
+    if "revenue" not in arrays:
+        raise ValueError("Universe file has no revenue column")
+
+    total = arrays["revenue"].shape[0]
+    for start in range(0, total, chunk_rows):
+        stop = min(start + chunk_rows, total)
+        chunk: Dict[str, Any] = {"_rows": stop - start}
+        for name, array in arrays.items():
+            chunk[name] = np.array(array[start:stop], dtype=None if name == "ticker" else float)
+        yield chunk
+
+
+def _count_csv_rows(path: str) -> int:
+    """Count data rows without loading the file (same rules as _iter_csv_chunks)."""
+
+    if os.path.getsize(path) == 0:
+        return 0
+
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        mm.readline()  # header
+        return sum(1 for _ in _data_lines(mm))
+
+
+# -----------------------------
+# WRITERS (columnar, chunked)
+# -----------------------------
+class _CsvWriter:
+    def __init__(self, path: str, total_rows: int):
+        self._fh = open(path, "w", newline="")
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, out: Dict[str, Any]):
+        for row in zip(*(out[name] for name in OUTPUT_COLUMNS)):
+            self._writer.writerow(["" if isinstance(value, float) and value != value else value for value in row])
+
+    def close(self):
+        self._fh.close()
+
+
+class _NpyWriter:
+    """One memory-mapped .npy file per output column, filled chunk by chunk."""
+
+    def __init__(self, path: str, total_rows: int):
+        os.makedirs(path, exist_ok=True)
+        self._offset = 0
+        self._columns = {
+            name: np.lib.format.open_memmap(
+                os.path.join(path, f"{name}.npy"),
+                mode="w+",
+                dtype=TICKER_DTYPE if name == "ticker" else ("U64" if name == "status" else float),
+                shape=(total_rows,)
+            )
+            for name in OUTPUT_COLUMNS
+        }
+
+    def write(self, out: Dict[str, Any]):
+        n = len(out["ticker"])
+        for name, column in self._columns.items():
+            column[self._offset:self._offset + n] = out[name]
+        self._offset += n
+
+    def close(self):
+        for column in self._columns.values():
+            column.flush()
+        self._columns = {}
+
+
+# -----------------------------
+# VALUATION
+# -----------------------------
+def _value_chunk(chunk: Dict[str, Any], row_offset: int) -> Dict[str, Any]:
+    """Value one column chunk; invalid rows get NaN values and a status."""
+
+    n = chunk["_rows"]
+
+    def column(name):
+        default = DCF_DEFAULTS.get(name, np.nan)
+        values = chunk.get(name)
+        if values is None:
+            return np.full(n, default, dtype=float)
+        return np.where(np.isnan(values), default, values)
+
+    params = {name: column(name) for name in INPUT_COLUMNS}
+    tickers = chunk.get("ticker")
+    if tickers is None:
+        tickers = [str(row_offset + i) for i in range(n)]
+
+    status = np.full(n, "ok", dtype=object)
+    status[params["wacc"] <= params["terminal_growth"]] = "WACC must be greater than terminal growth rate"
+    status[np.isnan(params["shares_outstanding"]) & np.isnan(params["net_debt"])] = (
+        "At least one of shares_outstanding or net_debt is required"
+    )
+    status[~(params["years"] >= 1) | (params["years"] % 1 != 0)] = "years must be a positive integer"
+    status[np.isnan(params["revenue"])] = "Missing required input: revenue"
+    for i, error in enumerate(chunk.get("_errors") or ()):
+        if error is not None:
+            status[i] = error
+
+    out = {
+        "ticker": list(tickers),
+        "enterprise_value": np.full(n, np.nan),
+        "equity_value": np.full(n, np.nan),
+        "value_per_share": np.full(n, np.nan),
+    }
+
+    valid = status == "ok"
+    for years in np.unique(params["years"][valid]):
+        rows = valid & (params["years"] == years)
+        growth = np.repeat(params["revenue_growth"][rows][:, None], int(years), axis=1)
+
+        values = dcf_arrays(
+            revenue=params["revenue"][rows],
+            revenue_growth=growth,
+            ebit_margin=params["ebit_margin"][rows],
+            tax_rate=params["tax_rate"][rows],
+            capex_pct=params["capex_pct"][rows],
+            nwc_pct=params["nwc_pct"][rows],
+            wacc=params["wacc"][rows],
+            terminal_growth=params["terminal_growth"][rows],
+            net_debt=params["net_debt"][rows],
+            shares_outstanding=params["shares_outstanding"][rows],
+        )
+
+        for name in ("enterprise_value", "equity_value", "value_per_share"):
+            out[name][rows] = values[name]
+
+    out["status"] = status.tolist()
+    return out
+
+
+def resolve_job_paths(input_path: str, output_path: str, root: str = UNIVERSE_DATA_DIR):
+    """(input, output) resolved under `root`; ValueError if either escapes it."""
+    return resolve_under(root, input_path), resolve_under(root, output_path)
+
+
+def run_universe_job(
+    input_path: str,
+    output_path: str,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Dict[str, Any]:
+    """
+    Value a whole coverage universe from a columnar fundamentals file.
+
+    - input_path: CSV file, or a directory of <column>.npy files
+    - output_path: *.csv, or a directory that receives <column>.npy files
+    - one row per ticker; see INPUT_COLUMNS (missing columns use defaults)
+
+    Input is memory-mapped and valued `chunk_rows` at a time, so peak
+    memory depends on the chunk size, not the universe size. Output values
+    are unrounded. Returns a throughput report.
+    """
+
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be positive")
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Universe file not found: {input_path}")
+
+    start_time = time.time()
+    from_npy = os.path.isdir(input_path)
+    to_csv = output_path.lower().endswith(".csv")
+
+    # -----------------------------
+    # 1. OPEN READER + WRITER
+    # -----------------------------
+    if from_npy:
+        chunks = _iter_npy_chunks(input_path, chunk_rows)
+        total_rows = np.load(os.path.join(input_path, "revenue.npy"), mmap_mode="r").shape[0]
+    else:
+        chunks = _iter_csv_chunks(input_path, chunk_rows)
+        total_rows = 0 if to_csv else _count_csv_rows(input_path)
+
+    writer = (_CsvWriter if to_csv else _NpyWriter)(output_path, total_rows)
+
+    # -----------------------------
+    # 2. VALUE CHUNK BY CHUNK
+    # -----------------------------
+    rows = 0
+    valued = 0
+    chunk_count = 0
+
+    try:
+        for chunk in chunks:
+            out = _value_chunk(chunk, rows)
+            writer.write(out)
+
+            rows += chunk["_rows"]
+            valued += sum(1 for status in out["status"] if status == "ok")
+            chunk_count += 1
+    finally:
+        writer.close()
+
+    # -----------------------------
+    # 3. THROUGHPUT REPORT
+    # -----------------------------
+    elapsed = time.time() - start_time
+    report = {
+        "input_path": input_path,
+        "output_path": output_path,
+        "rows": rows,
+        "valued": valued,
+        "failed": rows - valued,
+        "chunks": chunk_count,
+        "chunk_rows": chunk_rows,
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+    logger.info(
+        f"[UNIVERSE] Done | rows={rows} | valued={valued} | "
+        f"latency={report['elapsed_seconds']}s | rows_per_second={report['rows_per_second']}"
+    )
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Value a coverage universe with the DCF engine")
+    parser.add_argument("input_path", help="CSV file or directory of <column>.npy files")
+    parser.add_argument("output_path", help="*.csv or output directory for <column>.npy files")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    report = run_universe_job(args.input_path, args.output_path, args.chunk_rows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()